@@ -7,31 +7,130 @@ to B_\text{problem} inside math.
 
 Usage:
   python convert_i_to_display_math.py input.md output.md
+  python convert_i_to_display_math.py input.md output.md --profile trace.json   # see scripts/profiling.py
 """
 
+import argparse
 import re
 import sys
+from dataclasses import replace
 from pathlib import Path
+from typing import Iterable, List, Optional
+
+# The shared tokenizer and notation rules live next to the other content scripts.
+sys.path.insert(0, str(Path(__file__).resolve().parent / "scripts"))
+from math_rules import RuleSet, load_rules  # noqa: E402
+from md_stream import CODE, FENCE, MAX_SPAN_LINES, Line, Transform, transform_text  # noqa: E402
+from profiling import add_profile_arg, profiled, profiling, span, stage  # noqa: E402
+
+# Allow <i ...> with attributes, and match across newlines. A span can't contain
+# another opening tag and attributes stop at the next "<", so a run of unclosed
+# "<i>" scans the text once instead of once per tag (see scripts/regex_stress.py).
+# A bare "<i" is fine inside a span: <i>0<i<n</i>.
+I_TAG_RE = re.compile(r"<i\b[^<>]*>((?:(?!<i\b[^<>]*>).)*?)</i>", re.DOTALL | re.IGNORECASE)
+I_OPEN_RE = re.compile(r"<i\b[^<>]*>", re.IGNORECASE)
+
+
+_default_rules: Optional[RuleSet] = None
+
+
+def default_rules() -> RuleSet:
+    """The notation rules from scripts/math_rules.txt, compiled once per process."""
+    global _default_rules
+    if _default_rules is None:
+        _default_rules = RuleSet(load_rules())
+    return _default_rules
 
 
 def normalize_b_problem(expr: str) -> str:
     """
     Inside a math expression, normalize common variants of B_problem to B_\\text{problem}.
     This is a best-effort, mechanical normalization.
+
+    The variants (and any other notation rules) live in scripts/math_rules.txt and
+    are applied in a single scan; see scripts/math_rules.py.
     """
-    # B_problem  -> B_\text{problem}
-    expr = re.sub(r"\bB_problem\b", r"B_\\text{problem}", expr)
+    return default_rules().apply(expr)
 
-    # B_{problem} -> B_\text{problem}
-    expr = re.sub(r"\bB_\{problem\}\b", r"B_\\text{problem}", expr)
 
-    # B_{\\text{problem}} -> B_\text{problem}
-    expr = re.sub(r"\bB_\{\\text\{problem\}\}\b", r"B_\\text{problem}", expr)
+class ITagsToMath(Transform):
+    """
+    Streaming <i>...</i> -> $...$ transform. Lines are passed through untouched
+    unless they contain an <i> tag; a tag left open at the end of a line is
+    buffered until its closing </i>, so multi-line spans still convert as one.
+    Fenced code is left alone.
+    """
 
-    # B_{\\mathrm{problem}} -> B_\text{problem} (just in case)
-    expr = re.sub(r"\bB_\{\\mathrm\{problem\}\}\b", r"B_\\text{problem}", expr)
+    name = "math"
+
+    def __init__(self, rules: Optional[RuleSet] = None) -> None:
+        self.converted = 0
+        # Per-rule hit counters accumulate on the RuleSet (`rules.hits`), which is
+        # shared by every transform using it; `rule_hits` counts this one's.
+        self.rules = rules if rules is not None else default_rules()
+        self._hits_before = self.rules.total_hits()
+        self._buf: List[Line] = []
+        # The buffered lines joined (without the last eol), and the offset in it
+        # up to which every <i> span is already closed.
+        self._text = ""
+        self._scanned = 0
+
+    @property
+    def rule_hits(self) -> int:
+        """Notation rule hits in the text this transform has converted."""
+        return self.rules.total_hits() - self._hits_before
+
+    def _repl(self, m: re.Match) -> str:
+        self.converted += 1
+        inner = m.group(1)
+        inner = self.rules.apply(inner)
+        return f"${inner}$"
 
-    return expr
+    def _flush(self, force: bool = False) -> List[Line]:
+        buf = self._buf
+        if not buf:
+            return []
+        text = self._text
+        if not force:
+            # Keep buffering while an opening tag is still unclosed. Spans can't
+            # cross the next opening tag, so matches before `_scanned` don't change as
+            # lines are appended and the scan resumes there.
+            last_end = self._scanned
+            for m in I_TAG_RE.finditer(text, last_end):
+                last_end = m.end()
+            if I_OPEN_RE.search(text, last_end):
+                self._scanned = last_end
+                return []
+        self._buf, self._text, self._scanned = [], "", 0
+        with stage("substitute", len(text)):
+            new = I_TAG_RE.sub(self._repl, text)
+        if new == text:
+            return buf
+        return [replace(buf[0].retext(new), eol=buf[-1].eol)]
+
+    def _append(self, line: Line) -> None:
+        self._text = self._text + self._buf[-1].eol + line.text if self._buf else line.text
+        self._buf.append(line)
+
+    def feed(self, line: Line) -> Iterable[Line]:
+        if line.kind in (FENCE, CODE):
+            yield from self._flush(force=True)
+            yield line
+            return
+        if not self._buf:
+            if "<i" not in line.text.lower():
+                yield line
+                return
+        elif "</i" not in line.text.lower():
+            self._append(line)
+            if len(self._buf) >= MAX_SPAN_LINES:
+                yield from self._flush(force=True)
+            return
+        self._append(line)
+        yield from self._flush(force=len(self._buf) >= MAX_SPAN_LINES)
+
+    def finish(self) -> Iterable[Line]:
+        return self._flush(force=True)
 
 
 def convert_i_tags_to_display_math(text: str) -> str:
@@ -39,32 +138,31 @@ def convert_i_tags_to_display_math(text: str) -> str:
     Replace every <i>...</i> with $$ ... $$ (display math), preserving inner content.
     Also normalize B_problem -> B_\\text{problem} within the replaced content.
     """
-    # Allow <i ...> with attributes, and match across newlines
-    pattern = re.compile(r"<i\b[^>]*>(.*?)</i>", re.DOTALL | re.IGNORECASE)
-
-    def repl(m: re.Match) -> str:
-        inner = m.group(1)
-        inner = normalize_b_problem(inner)
-        return f"${inner}$"
-
-    return pattern.sub(repl, text)
+    return transform_text(text, [ITagsToMath()])
 
 
 def main() -> int:
-    if len(sys.argv) != 3:
-        print("Usage: python convert_i_to_display_math.py input.md output.md", file=sys.stderr)
-        return 2
+    ap = argparse.ArgumentParser(prog="convert_i_to_display_math.py")
+    ap.add_argument("input", type=Path)
+    ap.add_argument("output", type=Path)
+    add_profile_arg(ap)
+    args = ap.parse_args()
 
-    in_path = Path(sys.argv[1])
-    out_path = Path(sys.argv[2])
+    in_path = args.input
+    out_path = args.output
 
     if not in_path.exists():
         print(f"Error: input file not found: {in_path}", file=sys.stderr)
         return 1
 
-    text = in_path.read_text(encoding="utf-8")
-    converted = convert_i_tags_to_display_math(text)
-    out_path.write_text(converted, encoding="utf-8")
+    with profiling(args.profile):
+        with span("read", path=str(in_path)) as sp:
+            text = in_path.read_text(encoding="utf-8")
+            sp.bytes = len(text)
+        with span("transform", len(text), path=str(in_path)):
+            converted = transform_text(text, profiled([ITagsToMath()], in_path))
+        with span("write", len(converted), path=str(out_path)):
+            out_path.write_text(converted, encoding="utf-8")
     return 0
 
 
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Report static assets that nothing references, and optionally prune them from docs/.
+
+SvelteKit copies all of static/ into the build output (docs/), whether or not a
+page uses it. This script:
+  - indexes every asset reference in the site sources (markdown, Svelte
+    components, src/app.html, plus the .ts/.js/.css next to them) and in the
+    built pages/bundles under docs/ (html/js/css);
+  - resolves each reference to a path under static/ (the served root), handling
+    "/assets/...", "assets/...", "%sveltekit.assets%/...", the GitHub Pages base
+    path and percent-encoding;
+  - prints unreferenced files with their size (wasted bytes per deploy), build
+    files that no longer exist in static/ (stale), and references that point at
+    nothing (broken).
+
+Files under a `variants/` directory (written by optimize_images.py) count as
+referenced when their source image is.
+
+With --prune, unreferenced and stale files are deleted from docs/ only; static/
+is never touched. Pages (*.html), SvelteKit's _app/ and dotfiles are kept.
+
+Usage:
+  python scripts/asset_report.py
+  python scripts/asset_report.py --prune
+"""
+
+from __future__ import annotations
+
+import argparse
+import pathlib
+import posixpath
+import re
+import sys
+import urllib.parse
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Set
+
+REPO_ROOT = pathlib.Path(__file__).resolve().parent.parent
+STATIC_DIR = REPO_ROOT / "static"
+BUILD_DIR = REPO_ROOT / "docs"
+SRC_DIR = REPO_ROOT / "src"
+SVELTE_CONFIG = REPO_ROOT / "svelte.config.js"
+
+SOURCE_SUFFIXES = {".md", ".svelte", ".html", ".ts", ".js", ".css"}
+BUILD_SUFFIXES = {".html", ".js", ".css"}
+BUILD_KEEP_DIRS = {"_app"}
+VARIANTS_DIRNAME = "variants"
+
+# Anything that looks like a relative or absolute file path with an extension.
+REF_RE = re.compile(r"(?P<path>(?:%sveltekit\.assets%)?[\w./%~+-]*[\w%~+-]\.[A-Za-z0-9]{2,5})(?![\w/])")
+BASE_RE = re.compile(r"""base:\s*[^,\n]*?["'](?P<base>/[^"']+)["']""")
+VARIANT_RE = re.compile(r"^(?P<stem>.+)-\d+w$")
+
+
+@dataclass
+class AssetIndex:
+    # static-relative path -> source files referencing it
+    refs: Dict[str, Set[str]] = field(default_factory=dict)
+    # reference strings that look like assets but resolve to nothing
+    broken: Dict[str, Set[str]] = field(default_factory=dict)
+
+
+def read_base_path(config: pathlib.Path = SVELTE_CONFIG) -> str:
+    try:
+        m = BASE_RE.search(config.read_text(encoding="utf-8"))
+    except OSError:
+        return ""
+    return m.group("base").rstrip("/") if m else ""
+
+
+def iter_files(root: pathlib.Path, suffixes: Set[str]) -> Iterable[pathlib.Path]:
+    if not root.exists():
+        return
+    for p in sorted(root.rglob("*")):
+        if p.is_file() and p.suffix in suffixes:
+            yield p
+
+
+def normalize_ref(raw: str, base: str, page_dir: Optional[str] = None) -> Optional[str]:
+    """Map a reference string to a static-relative path, or None if it is clearly not one.
+
+    `page_dir` is the location of a built page relative to the build root; the
+    built html uses page-relative urls ("../assets/...") that resolve against it.
+    """
+    ref = raw.replace("%sveltekit.assets%", "")
+    if "://" in ref or ref.startswith("//"):
+        return None
+    ref = urllib.parse.unquote(ref)
+    if base and ref.startswith(base + "/"):
+        ref = ref[len(base) :]
+    if page_dir is not None and ref.startswith(("./", "../")):
+        ref = posixpath.normpath(posixpath.join(page_dir, ref))
+    while ref.startswith(("./", "/")):
+        ref = ref[2:] if ref.startswith("./") else ref[1:]
+    if not ref or ref.startswith("../"):
+        return None
+    return ref
+
+
+def build_index(
+    sources: Iterable[pathlib.Path],
+    static_files: Set[str],
+    base: str,
+    build_root: Optional[pathlib.Path] = None,
+) -> AssetIndex:
+    index = AssetIndex()
+    top_dirs = {f.split("/", 1)[0] for f in static_files if "/" in f}
+    for src in sources:
+        rel_src = str(src.relative_to(REPO_ROOT)) if src.is_relative_to(REPO_ROOT) else str(src)
+        page_dir = None
+        if build_root is not None and src.suffix == ".html" and src.is_relative_to(build_root):
+            page_dir = src.parent.relative_to(build_root).as_posix()
+        text = src.read_text(encoding="utf-8", errors="replace")
+        for m in REF_RE.finditer(text):
+            ref = normalize_ref(m.group("path"), base, page_dir)
+            if ref is None:
+                continue
+            if ref in static_files:
+                index.refs.setdefault(ref, set()).add(rel_src)
+            elif ref.split("/", 1)[0] in top_dirs and "/" in ref:
+                # Only paths under a served directory (assets/, fonts/, ...) can be broken assets;
+                # everything else is a module import, a package name, a domain, ...
+                index.broken.setdefault(ref, set()).add(rel_src)
+    return index
+
+
+def variant_parent(rel: str, static_files: Set[str]) -> Optional[str]:
+    p = pathlib.PurePosixPath(rel)
+    if p.parent.name != VARIANTS_DIRNAME:
+        return None
+    m = VARIANT_RE.match(p.stem)
+    if not m:
+        return None
+    for cand in sorted(static_files):
+        c = pathlib.PurePosixPath(cand)
+        if c.parent == p.parent.parent and c.stem == m.group("stem"):
+            return cand
+    return None
+
+
+def list_static(root: pathlib.Path) -> Dict[str, int]:
+    out: Dict[str, int] = {}
+    if not root.exists():
+        return out
+    for p in sorted(root.rglob("*")):
+        if p.is_file() and not p.name.startswith("."):
+            out[p.relative_to(root).as_posix()] = p.stat().st_size
+    return out
+
+
+def list_build_assets(root: pathlib.Path) -> Dict[str, int]:
+    """Files in the build output that came from static/ (i.e. not pages, bundles, dotfiles or .gz sidecars)."""
+    out: Dict[str, int] = {}
+    if not root.exists():
+        return out
+    for p in sorted(root.rglob("*")):
+        if not p.is_file() or p.name.startswith(".") or p.suffix == ".html":
+            continue
+        rel = p.relative_to(root)
+        if rel.parts[0] in BUILD_KEEP_DIRS:
+            continue
+        # precompress.py's sidecars go (and are cleaned up) with their source file.
+        if p.suffix == ".gz" and p.with_suffix("").is_file():
+            continue
+        out[rel.as_posix()] = p.stat().st_size
+    return out
+
+
+def human(n: int) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if n < 1024 or unit == "GB":
+            return f"{n:.1f} {unit}" if unit != "B" else f"{n} B"
+        n /= 1024  # type: ignore[assignment]
+    return f"{n} B"
+
+
+def main(argv: List[str]) -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--static-dir", type=pathlib.Path, default=STATIC_DIR, help="Served static root (default: static)")
+    ap.add_argument("--build-dir", type=pathlib.Path, default=BUILD_DIR, help="Build output (default: docs)")
+    ap.add_argument("--src-dir", type=pathlib.Path, default=SRC_DIR, help="Site sources (default: src)")
+    ap.add_argument("--prune", action="store_true", help="Delete unreferenced and stale files from the build output")
+    ap.add_argument("--verbose", action="store_true", help="Also list referenced files and who references them")
+    args = ap.parse_args(argv)
+
+    if not args.static_dir.exists():
+        print(f"ERROR: not found: {args.static_dir}", file=sys.stderr)
+        return 2
+
+    base = read_base_path()
+    static_sizes = list_static(args.static_dir)
+    static_files = set(static_sizes)
+    build_sizes = list_build_assets(args.build_dir)
+
+    sources = list(iter_files(args.src_dir, SOURCE_SUFFIXES))
+    sources += list(iter_files(args.build_dir, BUILD_SUFFIXES))
+    index = build_index(sources, static_files, base, args.build_dir)
+
+    referenced: Set[str] = set(index.refs)
+    for rel in static_files:
+        parent = variant_parent(rel, static_files)
+        if parent is not None and parent in index.refs:
+            referenced.add(rel)
+    unreferenced = sorted(static_files - referenced)
+    stale = sorted(set(build_sizes) - static_files)
+
+    if args.verbose:
+        print("Referenced:")
+        for rel in sorted(referenced):
+            who = ", ".join(sorted(index.refs.get(rel, {"(variant)"})))
+            print(f"  {rel} ({human(static_sizes[rel])}) <- {who}")
+        print()
+
+    print(f"Unreferenced in {args.static_dir.name}/ ({len(unreferenced)} files):")
+    for rel in unreferenced:
+        in_build = " [in build]" if rel in build_sizes else ""
+        print(f"  {rel}: {human(static_sizes[rel])}{in_build}")
+    if stale:
+        print(f"\nStale in {args.build_dir.name}/ (no longer in {args.static_dir.name}/):")
+        for rel in stale:
+            print(f"  {rel}: {human(build_sizes[rel])}")
+    if index.broken:
+        print("\nBroken references (no such file):")
+        for ref, who in sorted(index.broken.items()):
+            print(f"  {ref} <- {', '.join(sorted(who))}")
+
+    wasted_static = sum(static_sizes[r] for r in unreferenced)
+    prunable = [r for r in unreferenced if r in build_sizes] + stale
+    wasted_build = sum(build_sizes[r] for r in prunable)
+    print(
+        f"\nSummary: static={human(sum(static_sizes.values()))} "
+        f"unreferenced={human(wasted_static)} ({len(unreferenced)} files); "
+        f"build wasted={human(wasted_build)} ({len(prunable)} files); broken refs={len(index.broken)}"
+    )
+
+    if args.prune:
+        for rel in prunable:
+            (args.build_dir / rel).unlink()
+            (args.build_dir / f"{rel}.gz").unlink(missing_ok=True)
+        # Drop directories the prune emptied.
+        for d in sorted({(args.build_dir / r).parent for r in prunable}, key=lambda p: len(p.parts), reverse=True):
+            while d != args.build_dir and d.is_dir() and not any(d.iterdir()):
+                d.rmdir()
+                d = d.parent
+        print(f"Pruned {len(prunable)} files ({human(wasted_build)}) from {args.build_dir}")
+    elif prunable:
+        print("\nRe-run with --prune to delete these from the build output.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
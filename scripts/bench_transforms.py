@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+"""
+Benchmark the markdown transforms on a synthetic corpus and on pathological inputs.
+
+Measured entry points (the public functions of each script):
+  captions   figure_captions_to_image_titles.process_markdown_text
+  footnotes  external_links_to_references.convert_file   (dry run, reads a temp file)
+  strip      strip_image_paths_and_check_md.strip_image_paths
+  lint       strip_image_paths_and_check_md.iter_issues
+  math       replace_math.convert_i_tags_to_display_math
+
+Inputs are generated deterministically (--seed):
+  post        a realistic post scaled up: thousands of figures + captions, external
+              links, footnote definitions, inline/display math, <i> spans, fenced code
+  long_line   one ~100 KB paragraph full of link/image/math openers that never close
+  unclosed    thousands of lines that open "![", "<i>" or "[" and never close them
+  data_uri    a few multi-megabyte base64 image lines
+  captions    back-to-back image/caption pairs with long, almost-matching captions
+  dollars     dense "$" runs and unterminated display math
+
+For every (transform, input) pair it reports the best wall time over --repeat runs
+as MB/s and lines/s, plus the peak Python heap (tracemalloc, separate untimed run).
+
+Results can be written as JSON (--output) and compared against an earlier run
+(--compare): the check fails (exit code 1) if any pair's MB/s dropped by more
+than --threshold (a fraction, default 0.25).
+
+Usage:
+  python scripts/bench_transforms.py
+  python scripts/bench_transforms.py --output .cache/bench/base.json
+  python scripts/bench_transforms.py --compare .cache/bench/base.json --threshold 0.2
+"""
+
+from __future__ import annotations
+
+import argparse
+import base64
+import gc
+import json
+import os
+import pathlib
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from external_links_to_references import convert_file
+from figure_captions_to_image_titles import process_markdown_text
+from strip_image_paths_and_check_md import iter_issues, strip_image_paths
+
+# replace_math.py lives at the repo root.
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+from replace_math import convert_i_tags_to_display_math  # noqa: E402
+
+RESULTS_VERSION = 1
+DEFAULT_THRESHOLD = 0.25
+
+WORDS = (
+    "pretraining checkpoint policy reward rollout model token sample gradient "
+    "distribution sharpening expansion budget baseline evaluation accuracy"
+).split()
+
+
+# --- corpus generation ----------------------------------------------------------
+
+
+def _prose(rng: random.Random, n: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(n))
+
+
+def gen_post(rng: random.Random, sections: int) -> str:
+    out: List[str] = ["# Synthetic post", ""]
+    for i in range(1, sections + 1):
+        out.append(f"## Section {i}")
+        out.append("")
+        out.append(
+            f"{_prose(rng, 12)} [{_prose(rng, 2)}](https://example{i % 97}.com/p/{i}) "
+            f"with $x_{{{i}}}^2 + \\alpha$ and <i>a_{i} + b</i>, see [^fn-{i}]."
+        )
+        out.append(f"{_prose(rng, 20)} `inline code` {_prose(rng, 6)}.")
+        out.append("")
+        out.append(f"![Figure {i} alt text](assets/figures/fig_{i}.png)")
+        out.append("")
+        bold = "**" if i % 2 else ""
+        out.append(f"{bold}Figure {i}:{bold} {_prose(rng, 15)} with $\\mathcal{{M}}_{{{i}}}$.")
+        out.append("")
+        if i % 3 == 0:
+            out.append("$$")
+            out.append(f"\\sum_{{k=1}}^{{{i}}} k = \\frac{{n(n+1)}}{{2}}")
+            out.append("$$")
+            out.append("")
+        if i % 4 == 0:
+            out.append("```python")
+            out.append('x = "[not a link](https://nope.example.com)"  # <i>not math</i>')
+            out.append("![not an image](inside/a/fence.png)")
+            out.append("```")
+            out.append("")
+        if i % 25 == 0:
+            out.append('A\u00a0line with\u2009KaTeX-unfriendly\u200bspaces and a broken ![img](x.png "a" "b").')
+            out.append("")
+    for i in range(1, sections + 1):
+        out.append(f"[^fn-{i}]: Reference {i}. {_prose(rng, 6)} https://ref{i}.org/paper/{i}")
+    return "\n".join(out) + "\n"
+
+
+def gen_long_line(rng: random.Random, size: int) -> str:
+    pieces = ["[label](", "![alt", "<i>", "$x", "](", "\"t", _prose(rng, 3), " "]
+    parts: List[str] = []
+    n = 0
+    while n < size:
+        p = rng.choice(pieces)
+        parts.append(p)
+        n += len(p)
+    return "".join(parts) + "\n"
+
+
+def gen_unclosed(rng: random.Random, lines: int) -> str:
+    openers = ("![alt text that never", "<i>open tag", "[label](https://never.example.com", "**Figure 3: almost")
+    return "".join(f"{rng.choice(openers)} {_prose(rng, 8)}\n" for _ in range(lines))
+
+
+def gen_data_uri(rng: random.Random, blobs: int, blob_bytes: int) -> str:
+    out: List[str] = []
+    for i in range(blobs):
+        payload = base64.b64encode(rng.randbytes(blob_bytes)).decode("ascii")
+        out.append(f"{_prose(rng, 10)}\n\n![](data:image/png;base64,{payload})\n\n")
+    return "".join(out)
+
+
+def gen_captions(rng: random.Random, figures: int) -> str:
+    out: List[str] = []
+    for i in range(1, figures + 1):
+        out.append(f"![alt {i}](/assets/figures/f{i}.png)\n\n")
+        # Long body with a near-miss bold close, which makes the lazy body + backref work hard.
+        out.append(f"**Figure {i}: {_prose(rng, 60)} * {_prose(rng, 60)}*\n\n")
+    return "".join(out)
+
+
+def gen_dollars(rng: random.Random, lines: int) -> str:
+    out: List[str] = []
+    for _ in range(lines):
+        out.append("$" * rng.randint(1, 6) + f" {_prose(rng, 6)} " + "$" * rng.randint(0, 3) + "\n")
+    out.append("$$\n" + "".join(f"{_prose(rng, 8)}\n" for _ in range(200)))
+    return "".join(out)
+
+
+def build_corpus(seed: int, scale: float) -> Dict[str, str]:
+    rng = random.Random(seed)
+
+    def n(x: int) -> int:
+        return max(1, int(x * scale))
+
+    return {
+        "post": gen_post(rng, n(3000)),
+        "long_line": gen_long_line(rng, n(100_000)),
+        "unclosed": gen_unclosed(rng, n(5000)),
+        "data_uri": gen_data_uri(rng, 3, n(1_500_000)),
+        "captions": gen_captions(rng, n(2000)),
+        "dollars": gen_dollars(rng, n(10000)),
+    }
+
+
+# --- measurement ----------------------------------------------------------------
+
+
+@dataclass
+class Result:
+    transform: str
+    case: str
+    bytes: int
+    lines: int
+    seconds: float
+    mb_per_s: float
+    lines_per_s: float
+    peak_mem_bytes: int
+
+
+def make_benchmarks(tmp: pathlib.Path) -> Dict[str, Callable[[str], Callable[[], object]]]:
+    """transform name -> setup(text) returning a zero-arg callable to time."""
+
+    def footnotes(text: str) -> Callable[[], object]:
+        p = tmp / "bench.md"
+        p.write_text(text, encoding="utf-8")
+        return lambda: convert_file(p, in_place=False)
+
+    def lint(text: str) -> Callable[[], object]:
+        lines = text.splitlines(keepends=True)
+        return lambda: iter_issues(lines)
+
+    return {
+        "captions": lambda text: lambda: process_markdown_text(text),
+        "footnotes": footnotes,
+        "strip": lambda text: lambda: strip_image_paths(text),
+        "lint": lint,
+        "math": lambda text: lambda: convert_i_tags_to_display_math(text),
+    }
+
+
+def measure(fn: Callable[[], object], repeat: int) -> Tuple[float, int]:
+    best = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return best, peak
+
+
+def run_benchmarks(
+    corpus: Dict[str, str],
+    transforms: Sequence[str],
+    repeat: int,
+) -> List[Result]:
+    results: List[Result] = []
+    with tempfile.TemporaryDirectory() as d:
+        benches = make_benchmarks(pathlib.Path(d))
+        for case, text in corpus.items():
+            size = len(text.encode("utf-8"))
+            lines = text.count("\n")
+            for name in transforms:
+                seconds, peak = measure(benches[name](text), repeat)
+                seconds = max(seconds, 1e-9)
+                r = Result(
+                    transform=name,
+                    case=case,
+                    bytes=size,
+                    lines=lines,
+                    seconds=seconds,
+                    mb_per_s=size / seconds / 1e6,
+                    lines_per_s=lines / seconds,
+                    peak_mem_bytes=peak,
+                )
+                results.append(r)
+                print(
+                    f"{name:<10} {case:<10} {r.mb_per_s:9.2f} MB/s {r.lines_per_s:12.0f} lines/s "
+                    f"{r.seconds * 1000:9.1f} ms  peak {r.peak_mem_bytes / 1e6:8.1f} MB",
+                    flush=True,
+                )
+    return results
+
+
+def compare(results: List[Result], baseline: dict, threshold: float) -> List[str]:
+    """Return one message per (transform, case) whose throughput regressed past the threshold."""
+    old = {(r["transform"], r["case"]): r for r in baseline.get("results", [])}
+    failures: List[str] = []
+    for r in results:
+        b = old.get((r.transform, r.case))
+        if b is None or b["mb_per_s"] <= 0:
+            continue
+        ratio = r.mb_per_s / b["mb_per_s"]
+        if ratio < 1.0 - threshold:
+            failures.append(
+                f"{r.transform}/{r.case}: {b['mb_per_s']:.2f} -> {r.mb_per_s:.2f} MB/s ({(ratio - 1) * 100:+.0f}%)"
+            )
+    return failures
+
+
+def main(argv: List[str]) -> int:
+    benches = list(make_benchmarks(pathlib.Path(".")))
+    ap = argparse.ArgumentParser()
+    ap.add_argument(
+        "--transforms",
+        type=str,
+        default=",".join(benches),
+        help=f"Comma-separated subset of: {', '.join(benches)}",
+    )
+    ap.add_argument("--cases", type=str, default=None, help="Comma-separated subset of the generated inputs")
+    ap.add_argument("--scale", type=float, default=1.0, help="Corpus size multiplier (default: 1.0)")
+    ap.add_argument("--seed", type=int, default=0, help="Corpus RNG seed (default: 0)")
+    ap.add_argument("--repeat", type=int, default=3, help="Timed runs per pair; the best is kept (default: 3)")
+    ap.add_argument("--output", type=pathlib.Path, default=None, help="Write results as JSON")
+    ap.add_argument("--compare", type=pathlib.Path, default=None, help="Baseline JSON from an earlier --output")
+    ap.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help=f"Allowed MB/s drop vs --compare, as a fraction (default: {DEFAULT_THRESHOLD})",
+    )
+    args = ap.parse_args(argv)
+
+    transforms = [t.strip() for t in args.transforms.split(",") if t.strip()]
+    unknown = [t for t in transforms if t not in benches]
+    if unknown:
+        print(f"ERROR: unknown transform(s): {', '.join(unknown)}", file=sys.stderr)
+        return 2
+
+    baseline: Optional[dict] = None
+    if args.compare is not None:
+        try:
+            baseline = json.loads(args.compare.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            print(f"ERROR: cannot read baseline {args.compare}: {e}", file=sys.stderr)
+            return 2
+
+        if (baseline.get("seed"), baseline.get("scale")) != (args.seed, args.scale):
+            print(
+                f"ERROR: baseline used --seed {baseline.get('seed')} --scale {baseline.get('scale')}; "
+                "throughput is only comparable on the same corpus",
+                file=sys.stderr,
+            )
+            return 2
+
+    corpus = build_corpus(args.seed, args.scale)
+    if args.cases:
+        wanted = [c.strip() for c in args.cases.split(",") if c.strip()]
+        missing = [c for c in wanted if c not in corpus]
+        if missing:
+            print(f"ERROR: unknown case(s): {', '.join(missing)}", file=sys.stderr)
+            return 2
+        corpus = {c: corpus[c] for c in wanted}
+
+    results = run_benchmarks(corpus, transforms, args.repeat)
+
+    if args.output is not None:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        payload = {
+            "version": RESULTS_VERSION,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "seed": args.seed,
+            "scale": args.scale,
+            "repeat": args.repeat,
+            "results": [asdict(r) for r in results],
+        }
+        args.output.write_text(json.dumps(payload, indent=2) + "\n", encoding="utf-8")
+        print(f"\nWrote {args.output}")
+
+    if baseline is not None:
+        failures = compare(results, baseline, args.threshold)
+        if failures:
+            print(f"\nThroughput regressions (> {args.threshold:.0%}):")
+            for f in failures:
+                print(f"  {f}")
+            return 1
+        print(f"\nNo throughput regressions beyond {args.threshold:.0%} vs {args.compare}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
@@ -0,0 +1,527 @@
+#!/usr/bin/env python3
+"""
+Cached content build: run the markdown transforms as a stage graph, skipping work
+whose inputs haven't changed.
+
+Stages (each one is a `md_stream.Transform` from the corresponding script):
+
+  strip      strip_image_paths_and_check_md.py   (output goes to <input>.noimg.md)
+  captions   figure_captions_to_image_titles.py  (after: strip)
+  footnotes  external_links_to_references.py     (after: strip, captions)
+  math       replace_math.py                     (after: strip, captions, footnotes)
+
+For every file and stage we record, in an on-disk manifest, the hash of the stage
+input, a "tool version" (hash of the script that implements the stage plus the
+shared tokenizer, and the stage options) and the hash of the stage output.
+Stage outputs are kept as content-addressed blobs, so:
+
+  - a file whose size/mtime (or, failing that, content hash) matches the manifest
+    is skipped without being tokenized at all;
+  - otherwise, stages whose input+tool key is unchanged are skipped, and the
+    remaining stages run fused in a single `md_stream.run` pass, with a tap after
+    each stage recording its output for the next build.
+
+--since REF restricts the build to markdown files that git reports as changed
+since REF (plus untracked files). The targets are still walked, but only the
+changed files are stat'ed against the manifest, hashed or transformed.
+
+--watch keeps the process running next to `npm run dev`: it polls the targets'
+size/mtime every --interval seconds and rebuilds a file once it has been quiet
+for --debounce seconds (a burst of saves is one rebuild). Modules and compiled
+regexes stay loaded, so a rebuild costs milliseconds; outputs are replaced
+atomically, so Vite sees one change per file. Restart it after editing the
+scripts or rule files.
+
+Like the individual scripts, the build is a dry run unless --in-place is given;
+when the strip stage is enabled the result always goes to <input>.noimg.md.
+
+Usage:
+  python scripts/build_content.py                       # src/maintext + src/projects, dry run
+  python scripts/build_content.py --in-place --since HEAD
+  python scripts/build_content.py --stages strip,captions src/maintext
+  python scripts/build_content.py --in-place --watch
+  python scripts/build_content.py --force --profile /tmp/trace.json   # timings, see profiling.py
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import pathlib
+import subprocess
+import sys
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import external_links_to_references
+import figure_captions_to_image_titles
+import math_rules
+import md_stream
+import strip_image_paths_and_check_md
+from md_stream import Line, Transform, atomic_output, run, tokenize_text
+from profiling import add_profile_arg, profiled, profiling, span
+
+# replace_math.py lives at the repo root.
+REPO_ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+import replace_math  # noqa: E402
+
+DEFAULT_TARGETS = ("src/maintext", "src/projects")
+DEFAULT_CACHE_DIR = REPO_ROOT / ".cache" / "content-build"
+MANIFEST_VERSION = 1
+NOIMG_SUFFIX = ".noimg.md"
+
+
+@dataclass(frozen=True)
+class Stage:
+    name: str
+    module: object
+    factory: Callable[[argparse.Namespace], Transform]
+    # Stages that must run before this one when both are selected.
+    after: Tuple[str, ...] = ()
+    # Options that change the stage output; part of the cache key.
+    options: Callable[[argparse.Namespace], str] = lambda args: ""
+    # Other files the stage reads (helper modules, rule files); part of the cache key.
+    data: Tuple[pathlib.Path, ...] = ()
+
+
+STAGES: Dict[str, Stage] = {
+    s.name: s
+    for s in (
+        Stage(
+            "strip",
+            strip_image_paths_and_check_md,
+            lambda args: strip_image_paths_and_check_md.StripImagePaths(
+                placeholder=args.placeholder,
+                math_only=args.normalize_math_only,
+            ),
+            options=lambda args: f"placeholder={args.placeholder},math_only={args.normalize_math_only}",
+        ),
+        Stage(
+            "captions",
+            figure_captions_to_image_titles,
+            lambda args: figure_captions_to_image_titles.CaptionsToTitles(
+                normalize_asset_paths=args.normalize_asset_paths,
+                normalize_existing_titles=args.normalize_existing_titles,
+            ),
+            after=("strip",),
+            options=lambda args: (
+                f"normalize_asset_paths={args.normalize_asset_paths},"
+                f"normalize_existing_titles={args.normalize_existing_titles}"
+            ),
+        ),
+        Stage(
+            "footnotes",
+            external_links_to_references,
+            lambda args: external_links_to_references.ExternalLinksToFootnotes(),
+            after=("strip", "captions"),
+        ),
+        Stage(
+            "math",
+            replace_math,
+            lambda args: replace_math.ITagsToMath(),
+            after=("strip", "captions", "footnotes"),
+            data=(pathlib.Path(math_rules.__file__), math_rules.DEFAULT_RULES_PATH),
+        ),
+    )
+}
+
+
+def resolve_stages(names: Sequence[str]) -> List[Stage]:
+    """Order the selected stages so every stage runs after the ones it lists in `after`."""
+    unknown = [n for n in names if n not in STAGES]
+    if unknown:
+        raise SystemExit(f"Unknown stage(s): {', '.join(unknown)} (known: {', '.join(STAGES)})")
+
+    selected = list(dict.fromkeys(names))
+    ordered: List[Stage] = []
+    done: Set[str] = set()
+    while len(ordered) < len(selected):
+        progressed = False
+        for n in selected:
+            if n in done:
+                continue
+            if all(dep in done or dep not in selected for dep in STAGES[n].after):
+                ordered.append(STAGES[n])
+                done.add(n)
+                progressed = True
+        if not progressed:
+            raise SystemExit("Stage graph has a cycle")
+    return ordered
+
+
+def sha256_text(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+_tool_versions: Dict[str, str] = {}
+
+
+def tool_version(stage: Stage, args: argparse.Namespace) -> str:
+    """Hash of the stage implementation, the shared tokenizer, the stage's data files and options."""
+    name = stage.name
+    if name not in _tool_versions:
+        h = hashlib.sha256()
+        for path in (pathlib.Path(stage.module.__file__), pathlib.Path(md_stream.__file__), *stage.data):
+            h.update(path.read_bytes())
+        _tool_versions[name] = h.hexdigest()[:16]
+    opts = stage.options(args)
+    return f"{_tool_versions[name]}:{opts}" if opts else _tool_versions[name]
+
+
+class Tap(Transform):
+    """Pass-through transform that records what flows past it (one stage's output)."""
+
+    name = "tap"
+
+    def __init__(self) -> None:
+        self.parts: List[str] = []
+
+    def feed(self, line: Line) -> Iterable[Line]:
+        self.parts.append(line.text + line.eol)
+        yield line
+
+    def text(self) -> str:
+        return "".join(self.parts)
+
+
+class BlobStore:
+    """Content-addressed store for intermediate stage outputs."""
+
+    def __init__(self, root: pathlib.Path) -> None:
+        self.root = root
+
+    def _path(self, digest: str) -> pathlib.Path:
+        return self.root / digest[:2] / digest[2:]
+
+    def has(self, digest: str) -> bool:
+        return self._path(digest).exists()
+
+    def get(self, digest: str) -> str:
+        return self._path(digest).read_text(encoding="utf-8")
+
+    def put(self, digest: str, text: str) -> None:
+        p = self._path(digest)
+        if p.exists():
+            return
+        p.parent.mkdir(parents=True, exist_ok=True)
+        tmp = p.with_suffix(".tmp")
+        tmp.write_text(text, encoding="utf-8")
+        os.replace(tmp, p)
+
+
+def load_manifest(path: pathlib.Path) -> Dict[str, dict]:
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    if data.get("version") != MANIFEST_VERSION:
+        return {}
+    return data.get("files", {})
+
+
+def save_manifest(path: pathlib.Path, files: Dict[str, dict]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps({"version": MANIFEST_VERSION, "files": files}, indent=1, sort_keys=True), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def iter_sources(targets: Iterable[pathlib.Path]) -> Iterable[pathlib.Path]:
+    for target in targets:
+        for p in external_links_to_references.iter_md_files(target):
+            if p.name.endswith(NOIMG_SUFFIX):
+                continue
+            yield p
+
+
+def git_changed_files(ref: str) -> Set[pathlib.Path]:
+    """Files changed between REF and the working tree, plus untracked files."""
+
+    def git(*cmd: str) -> List[str]:
+        out = subprocess.run(
+            ["git", *cmd], cwd=REPO_ROOT, check=True, capture_output=True, text=True
+        ).stdout
+        return [ln for ln in out.splitlines() if ln]
+
+    names = git("diff", "--name-only", ref, "--") + git("ls-files", "--others", "--exclude-standard")
+    return {(REPO_ROOT / n).resolve() for n in names}
+
+
+@dataclass
+class FileResult:
+    path: pathlib.Path
+    out_path: pathlib.Path
+    ran: List[str]
+    skipped: List[str]
+    changed: bool
+    up_to_date: bool = False
+
+
+def build_file(
+    src: pathlib.Path,
+    stages: Sequence[Stage],
+    args: argparse.Namespace,
+    entry: Optional[dict],
+    blobs: BlobStore,
+) -> Tuple[FileResult, dict]:
+    writes_noimg = any(s.name == "strip" for s in stages)
+    out_path = src.with_suffix(src.suffix + NOIMG_SUFFIX) if writes_noimg else src
+    tools = [tool_version(s, args) for s in stages]
+    config = sha256_text("|".join(f"{s.name}={t}" for s, t in zip(stages, tools)))
+
+    st = src.stat()
+    stat_key = [st.st_size, st.st_mtime_ns]
+    entry = entry or {}
+    old_stages: Dict[str, dict] = entry.get("stages", {})
+
+    def up_to_date(source_hash: Optional[str]) -> bool:
+        if entry.get("config") != config or not out_path.exists():
+            return False
+        if source_hash is None:
+            if entry.get("stat") != stat_key:
+                return False
+        elif entry.get("source") != source_hash:
+            return False
+        ost = out_path.stat()
+        return entry.get("out_stat") == [ost.st_size, ost.st_mtime_ns]
+
+    names = [s.name for s in stages]
+    # Fast path: nothing touched since the last build -> don't even read the file.
+    if up_to_date(None):
+        return FileResult(src, out_path, [], names, False, True), entry
+
+    with span("read", path=str(src)) as sp:
+        text = src.read_text(encoding="utf-8")
+        sp.bytes = len(text)
+    source_hash = sha256_text(text)
+    if up_to_date(source_hash):
+        entry = dict(entry, stat=stat_key)
+        return FileResult(src, out_path, [], names, False, True), entry
+
+    # Walk the chain while each stage's (input, tool) key matches the manifest.
+    new_stages: Dict[str, dict] = {}
+    cur_hash = source_hash
+    first_dirty = len(stages)
+    for k, (stage, tool) in enumerate(zip(stages, tools)):
+        rec = old_stages.get(stage.name)
+        if rec and rec.get("input") == cur_hash and rec.get("tool") == tool and blobs.has(rec["output"]):
+            new_stages[stage.name] = rec
+            cur_hash = rec["output"]
+            continue
+        first_dirty = k
+        break
+
+    if first_dirty < len(stages):
+        cur_text = text if first_dirty == 0 else blobs.get(cur_hash)
+        dirty = stages[first_dirty:]
+        chain: List[Transform] = []
+        taps: List[Tap] = []
+        for stage in dirty:
+            tap = Tap()
+            chain.extend([*profiled([stage.factory(args)], src), tap])
+            taps.append(tap)
+        # Drain the fused pipeline; the taps hold every stage's output.
+        with span("transform", len(cur_text), path=str(src), stages=",".join(s.name for s in dirty)):
+            for _ in run(tokenize_text(cur_text), chain):
+                pass
+        for stage, tool, tap in zip(dirty, tools[first_dirty:], taps):
+            out_text = tap.text()
+            out_hash = sha256_text(out_text)
+            blobs.put(out_hash, out_text)
+            new_stages[stage.name] = {"input": cur_hash, "tool": tool, "output": out_hash}
+            cur_hash = out_hash
+        final_text = taps[-1].text() if taps else cur_text
+    else:
+        final_text = blobs.get(cur_hash) if cur_hash != source_hash else text
+
+    existing = out_path.read_text(encoding="utf-8") if out_path.exists() else None
+    changed = existing != final_text
+    wrote = False
+    if changed and (writes_noimg or args.in_place):
+        # One atomic replace per file, however many stages ran, so a dev server
+        # watching the file reloads once.
+        with span("write", len(final_text), path=str(out_path)), atomic_output(out_path) as out:
+            out.write(final_text)
+        wrote = True
+
+    result = FileResult(src, out_path, names[first_dirty:], names[:first_dirty], changed)
+    new_entry: dict = {"config": config, "stages": new_stages}
+    if not changed or wrote:
+        # Record what's on disk now so the next build can take the fast path.
+        if out_path == src:
+            st = src.stat()
+            stat_key = [st.st_size, st.st_mtime_ns]
+            source_hash = sha256_text(final_text)
+        ost = out_path.stat()
+        new_entry.update(stat=stat_key, source=source_hash, out_stat=[ost.st_size, ost.st_mtime_ns])
+    return result, new_entry
+
+
+def build_sources(
+    sources: Iterable[pathlib.Path],
+    stages: Sequence[Stage],
+    args: argparse.Namespace,
+    files: Dict[str, dict],
+    blobs: BlobStore,
+) -> Tuple[int, int, int]:
+    """Build each source, updating `files` (the manifest) in place; returns (built, up_to_date, changed)."""
+    n_built = n_fresh = n_changed = 0
+    for src in sources:
+        resolved = src.resolve()
+        key = str(resolved.relative_to(REPO_ROOT)) if resolved.is_relative_to(REPO_ROOT) else str(resolved)
+        res, entry = build_file(src, stages, args, files.get(key), blobs)
+        files[key] = entry
+        if res.up_to_date:
+            n_fresh += 1
+            continue
+        n_built += 1
+        n_changed += int(res.changed)
+        ran = ",".join(res.ran) or "-"
+        skipped = ",".join(res.skipped) or "-"
+        status = "updated" if res.changed else "no changes"
+        print(f"{res.out_path}: {status}; ran={ran} cached={skipped}")
+    return n_built, n_fresh, n_changed
+
+
+def stat_sources(targets: Iterable[pathlib.Path]) -> Dict[pathlib.Path, Tuple[int, int]]:
+    snap: Dict[pathlib.Path, Tuple[int, int]] = {}
+    for src in iter_sources(targets):
+        try:
+            st = src.stat()
+        except FileNotFoundError:
+            continue
+        snap[src] = (st.st_size, st.st_mtime_ns)
+    return snap
+
+
+def watch(
+    targets: Sequence[pathlib.Path],
+    stages: Sequence[Stage],
+    args: argparse.Namespace,
+    files: Dict[str, dict],
+    blobs: BlobStore,
+    manifest_path: pathlib.Path,
+) -> int:
+    """Poll `targets` and rebuild each file that changed, once its saves have settled."""
+    seen = stat_sources(targets)
+    pending: Dict[pathlib.Path, float] = {}  # path -> when it last changed
+    print(f"Watching {len(seen)} file(s) in {', '.join(map(str, targets))} (Ctrl-C to stop)", flush=True)
+    try:
+        while True:
+            time.sleep(args.interval)
+            now = time.monotonic()
+            current = stat_sources(targets)
+            for src, key in current.items():
+                if seen.get(src) != key:
+                    pending[src] = now
+            seen = current
+            ready = [src for src, t in pending.items() if now - t >= args.debounce]
+            if not ready:
+                continue
+            for src in ready:
+                del pending[src]
+            t0 = time.perf_counter()
+            n_built, _, n_changed = build_sources(ready, stages, args, files, blobs)
+            save_manifest(manifest_path, files)
+            # Our own --in-place writes are not edits; re-stat just the files we built.
+            for src in ready:
+                try:
+                    st = src.stat()
+                except FileNotFoundError:
+                    continue
+                seen[src] = (st.st_size, st.st_mtime_ns)
+            ms = (time.perf_counter() - t0) * 1000
+            print(f"built={n_built} changed={n_changed} in {ms:.1f} ms", flush=True)
+    except KeyboardInterrupt:
+        return 0
+
+
+def main(argv: List[str]) -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument(
+        "targets",
+        nargs="*",
+        type=pathlib.Path,
+        help=f"Markdown files or directories (default: {' '.join(DEFAULT_TARGETS)})",
+    )
+    ap.add_argument(
+        "--stages",
+        type=str,
+        default="captions,footnotes,math",
+        help=f"Comma-separated stages to run (known: {','.join(STAGES)}; default: captions,footnotes,math)",
+    )
+    ap.add_argument("--in-place", action="store_true", help="Write results back to the source files")
+    ap.add_argument("--since", type=str, default=None, help="Only build files changed since this git ref")
+    ap.add_argument(
+        "--cache-dir",
+        type=pathlib.Path,
+        default=DEFAULT_CACHE_DIR,
+        help=f"Manifest and intermediate outputs (default: {DEFAULT_CACHE_DIR.relative_to(REPO_ROOT)})",
+    )
+    ap.add_argument("--force", action="store_true", help="Ignore the manifest and rebuild everything")
+    ap.add_argument("--watch", action="store_true", help="After building, keep rebuilding files as they are saved")
+    ap.add_argument(
+        "--interval", type=float, default=0.25, help="--watch: seconds between polls (default: 0.25)"
+    )
+    ap.add_argument(
+        "--debounce",
+        type=float,
+        default=0.3,
+        help="--watch: rebuild a file once it has not changed for this many seconds (default: 0.3)",
+    )
+    ap.add_argument(
+        "--placeholder",
+        type=str,
+        default=strip_image_paths_and_check_md.PLACEHOLDER,
+        help="Placeholder URL for the strip stage",
+    )
+    ap.add_argument(
+        "--normalize-math-only",
+        action="store_true",
+        help="Strip stage: normalize KaTeX-unfriendly Unicode inside math spans only",
+    )
+    ap.add_argument("--normalize-asset-paths", action="store_true", help="Captions stage: prefix assets/ urls with /")
+    ap.add_argument("--normalize-existing-titles", action="store_true", help="Captions stage: clean existing titles")
+    add_profile_arg(ap)
+    args = ap.parse_args(argv)
+
+    stages = resolve_stages([n.strip() for n in args.stages.split(",") if n.strip()])
+    if not stages:
+        print("ERROR: no stages selected", file=sys.stderr)
+        return 2
+
+    targets = args.targets or [REPO_ROOT / t for t in DEFAULT_TARGETS]
+    missing = [t for t in targets if not t.exists()]
+    if missing:
+        print(f"ERROR: not found: {', '.join(map(str, missing))}", file=sys.stderr)
+        return 2
+
+    only: Optional[Set[pathlib.Path]] = git_changed_files(args.since) if args.since else None
+
+    manifest_path = args.cache_dir / "manifest.json"
+    files = {} if args.force else load_manifest(manifest_path)
+    blobs = BlobStore(args.cache_dir / "objects")
+    dry_run = not args.in_place and not any(s.name == "strip" for s in stages)
+
+    sources = [src for src in iter_sources(targets) if only is None or src.resolve() in only]
+    # --profile covers the initial build, not --watch rebuilds.
+    with profiling(args.profile):
+        n_built, n_fresh, n_changed = build_sources(sources, stages, args, files, blobs)
+    # Stage records are valid even for a dry run; the file-level fast-path keys
+    # are only recorded for outputs that actually match what's on disk.
+    save_manifest(manifest_path, files)
+
+    print(f"built={n_built} up_to_date={n_fresh} changed={n_changed}")
+    if dry_run:
+        print("\n(dry-run) Re-run with --in-place to apply changes.")
+    if args.watch:
+        return watch(targets, stages, args, files, blobs, manifest_path)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Build the site's client-side search index (static/assets/search/index.bin).
+
+Posts are split into sections at their `##` / `###` headings exactly the way
+Markdown.svelte chunks them (post_sections.py: same heading regexes, directive
+blocks and slugs), so every hit links to an existing `#anchor`. Section text is reduced to
+plain words (markdown, HTML, footnote markers and TeX commands dropped) and
+tokenized like `src/lib/search.ts` tokenizes queries.
+
+The index is an inverted index with positions, packed as unsigned LEB128 varints:
+
+    "RLSI" u8(version)
+    varint(n) + n bytes of UTF-8 JSON header:
+        {"docs": [{"title", "url"}],
+         "sections": [{"doc", "anchor", "title", "excerpt"}],
+         "terms": "<sorted terms joined by \\n>"}
+    then, for each term in header order:
+        varint(df)
+        df x [varint(section - previous section), varint(tf), tf x varint(position delta)]
+
+Positions are token offsets within the section (used for phrase/proximity
+ranking). The page only fetches the file when the search box is first used.
+
+Usage:
+  python scripts/build_search_index.py
+  python scripts/build_search_index.py --output /tmp/index.bin
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import pathlib
+import re
+import sys
+import unicodedata
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Tuple
+
+from post_sections import REPO_ROOT, Post, iter_sections, load_posts, plain_text, strip_footnote_defs
+
+DEFAULT_OUTPUT = REPO_ROOT / "static" / "assets" / "search" / "index.bin"
+
+MAGIC = b"RLSI"
+INDEX_VERSION = 1
+EXCERPT_CHARS = 200
+
+TOKEN_RE = re.compile(r"[0-9a-z]+")
+
+
+def fold(text: str) -> str:
+    """Lowercase and strip accents (NFKD minus combining marks), like the client."""
+    return "".join(ch for ch in unicodedata.normalize("NFKD", text) if not unicodedata.combining(ch)).lower()
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_RE.findall(fold(text))
+
+
+@dataclass
+class Section:
+    doc: int
+    anchor: str
+    title: str
+    excerpt: str
+    tokens: List[str] = field(default_factory=list)
+
+
+@dataclass
+class Doc:
+    title: str
+    url: str
+
+
+def build_sections(posts: Iterable[Post]) -> Tuple[List[Doc], List[Section]]:
+    docs: List[Doc] = []
+    sections: List[Section] = []
+    for post in posts:
+        docs.append(Doc(post.title, post.url))
+        for sec in iter_sections(strip_footnote_defs(post.body)):
+            # The untitled lead section stands for the whole post.
+            title = sec.title or post.title
+            text = plain_text(sec.markdown)
+            tokens = tokenize(title) + tokenize(text)
+            if not tokens:
+                continue
+            excerpt = text[:EXCERPT_CHARS].rsplit(" ", 1)[0] if len(text) > EXCERPT_CHARS else text
+            sections.append(Section(len(docs) - 1, sec.anchor, title, excerpt, tokens))
+    return docs, sections
+
+
+def varint(n: int, out: bytearray) -> None:
+    while n >= 0x80:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def encode_index(docs: List[Doc], sections: List[Section]) -> Tuple[bytes, Dict[str, int]]:
+    postings: Dict[str, Dict[int, List[int]]] = {}
+    for s_id, sec in enumerate(sections):
+        for pos, tok in enumerate(sec.tokens):
+            postings.setdefault(tok, {}).setdefault(s_id, []).append(pos)
+    terms = sorted(postings)
+
+    header = {
+        "docs": [{"title": d.title, "url": d.url} for d in docs],
+        "sections": [
+            {"doc": s.doc, "anchor": s.anchor, "title": s.title, "excerpt": s.excerpt} for s in sections
+        ],
+        "terms": "\n".join(terms),
+    }
+    header_bytes = json.dumps(header, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    out = bytearray(MAGIC)
+    out.append(INDEX_VERSION)
+    varint(len(header_bytes), out)
+    out += header_bytes
+    n_postings = n_positions = 0
+    for term in terms:
+        by_section = postings[term]
+        varint(len(by_section), out)
+        prev_section = 0
+        for s_id in sorted(by_section):
+            positions = by_section[s_id]
+            varint(s_id - prev_section, out)
+            prev_section = s_id
+            varint(len(positions), out)
+            prev = 0
+            for p in positions:
+                varint(p - prev, out)
+                prev = p
+            n_postings += 1
+            n_positions += len(positions)
+    stats = {
+        "docs": len(docs),
+        "sections": len(sections),
+        "terms": len(terms),
+        "postings": n_postings,
+        "positions": n_positions,
+        "header_bytes": len(header_bytes),
+        "bytes": len(out),
+    }
+    return bytes(out), stats
+
+
+def write_if_changed(path: pathlib.Path, data: bytes) -> bool:
+    """Atomically replace `path` unless it already holds `data` (keeps the dev server quiet)."""
+    try:
+        if path.read_bytes() == data:
+            return False
+    except FileNotFoundError:
+        pass
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+    return True
+
+
+def main(argv: List[str]) -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument(
+        "--output",
+        type=pathlib.Path,
+        default=DEFAULT_OUTPUT,
+        help=f"Index file (default: {DEFAULT_OUTPUT.relative_to(REPO_ROOT)})",
+    )
+    ap.add_argument("--verbose", action="store_true", help="List the indexed sections")
+    args = ap.parse_args(argv)
+
+    docs, sections = build_sections(load_posts())
+    data, stats = encode_index(docs, sections)
+    if args.verbose:
+        for sec in sections:
+            print(f"  {docs[sec.doc].url}#{sec.anchor}  {len(sec.tokens):5d} tokens  {sec.title}")
+    changed = write_if_changed(args.output, data)
+    print(
+        f"{args.output}: {stats['bytes']} bytes ({'updated' if changed else 'unchanged'}); "
+        f"{stats['docs']} docs, {stats['sections']} sections, {stats['terms']} terms, "
+        f"{stats['postings']} postings, {stats['positions']} positions"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
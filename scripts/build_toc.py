@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Build the per-post section manifest (src/lib/generated/toc-manifest.json).
+
+For every post (post_sections.py: the main post and the project posts) it records
+what Markdown.svelte and ScrollMeter.svelte otherwise work out on each load:
+
+  - headings: `##` / `###` in order, with the exact ids Markdown.svelte assigns,
+    level, parent (the enclosing `##` id), raw text and the plain TOC label
+    (ScrollMeter's sanitizeHeadingLabel), plus word count and reading time;
+    a `##` heading's counts include its `###` subsections;
+  - jumpboxes: ids (and labels) of the `:::jumpbox:::` directives and the section
+    each one is in;
+  - whole-post word count and reading time (WORDS_PER_MINUTE).
+
+The components only trust a heading entry whose text matches the heading they
+actually render, so a stale manifest falls back to runtime slugging instead of
+producing wrong anchors.
+
+Usage:
+  python scripts/build_toc.py
+  python scripts/build_toc.py --check      # exit 1 if the manifest is out of date
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+import pathlib
+import re
+import sys
+from typing import Dict, List, Optional
+
+from post_sections import REPO_ROOT, Post, iter_sections, load_posts, plain_text, strip_footnote_defs
+
+DEFAULT_MANIFEST = REPO_ROOT / "src" / "lib" / "generated" / "toc-manifest.json"
+MANIFEST_VERSION = 1
+WORDS_PER_MINUTE = 230
+
+# sanitizeHeadingLabel in ScrollMeter.svelte, in the same order.
+LABEL_RULES = (
+    (re.compile(r"\$([^$]+)\$"), r"\1"),
+    (re.compile(r"\$\$"), ""),
+    (re.compile(r"\\text\{([^}]+)\}"), r"\1"),
+    (re.compile(r"\\mathrm\{([^}]+)\}"), r"\1"),
+    (re.compile(r"\\mathbf\{([^}]+)\}"), r"\1"),
+    (re.compile(r"\\mathit\{([^}]+)\}"), r"\1"),
+    (re.compile(r"\\mathcal\{([^}]+)\}"), r"\1"),
+    (re.compile(r"_\{([^}]+)\}"), r"_\1"),
+    (re.compile(r"\^\{([^}]+)\}"), r"^\1"),
+    (re.compile(r"\\"), ""),
+    (re.compile(r"\s+"), " "),
+)
+# Inline markdown that does not show up in the rendered heading's textContent.
+INLINE_MD_RE = re.compile(r"\*\*|__|(?<!\w)[*_](?=\S)|(?<=\S)[*_](?!\w)|`")
+
+
+def heading_label(text: str) -> str:
+    out = INLINE_MD_RE.sub("", text)
+    for rx, repl in LABEL_RULES:
+        out = rx.sub(repl, out)
+    return out.strip()
+
+
+def reading_minutes(words: int) -> int:
+    return max(1, math.ceil(words / WORDS_PER_MINUTE)) if words else 0
+
+
+def build_post(post: Post) -> dict:
+    headings: List[dict] = []
+    jumpboxes: List[dict] = []
+    total = 0
+    parent: Optional[dict] = None
+    for sec in iter_sections(strip_footnote_defs(post.body)):
+        words = len(plain_text(sec.markdown).split())
+        total += words
+        if sec.level:
+            entry = {
+                "id": sec.anchor,
+                "level": sec.level,
+                "parent": None,
+                "text": sec.title,
+                "label": heading_label(sec.title),
+                "words": words,
+            }
+            if sec.level == 2:
+                parent = entry
+            elif parent is not None:
+                entry["parent"] = parent["id"]
+                parent["words"] += words
+            headings.append(entry)
+        for jid, label in sec.jumpboxes:
+            jumpboxes.append({"id": jid, "label": label, "section": sec.anchor or None})
+    for h in headings:
+        h["readingMinutes"] = reading_minutes(h["words"])
+    return {
+        "title": post.title,
+        "url": post.url,
+        "words": total,
+        "readingMinutes": reading_minutes(total),
+        "headings": headings,
+        "jumpboxes": jumpboxes,
+    }
+
+
+def build_manifest(posts: List[Post]) -> dict:
+    return {
+        "version": MANIFEST_VERSION,
+        "wordsPerMinute": WORDS_PER_MINUTE,
+        "posts": {post.key: build_post(post) for post in posts},
+    }
+
+
+def render(manifest: dict) -> str:
+    return json.dumps(manifest, indent=1, ensure_ascii=False) + "\n"
+
+
+def main(argv: List[str]) -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument(
+        "--output",
+        type=pathlib.Path,
+        default=DEFAULT_MANIFEST,
+        help=f"Manifest path (default: {DEFAULT_MANIFEST.relative_to(REPO_ROOT)})",
+    )
+    ap.add_argument("--check", action="store_true", help="Don't write; exit 1 if the manifest is out of date")
+    args = ap.parse_args(argv)
+
+    manifest = build_manifest(load_posts())
+    text = render(manifest)
+    try:
+        current: Optional[str] = args.output.read_text(encoding="utf-8")
+    except FileNotFoundError:
+        current = None
+
+    posts: Dict[str, dict] = manifest["posts"]
+    for key, post in posts.items():
+        print(
+            f"{key}: {len(post['headings'])} headings, {len(post['jumpboxes'])} jumpboxes, "
+            f"{post['words']} words (~{post['readingMinutes']} min)"
+        )
+    if current == text:
+        print(f"{args.output}: up to date")
+        return 0
+    if args.check:
+        print(f"{args.output}: out of date; run scripts/build_toc.py", file=sys.stderr)
+        return 1
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    tmp = args.output.with_name(f".{args.output.name}.tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, args.output)
+    print(f"{args.output}: written")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Report the weight of the built JS/CSS/font bundles and check it against a budget.
+
+Walks docs/_app/immutable/{assets,chunks,entry,nodes} (SvelteKit's hashed build
+output) and, for every file, measures:
+
+  - raw bytes;
+  - gzip bytes (zlib level 9, what a static host serves for text assets);
+  - brotli bytes (quality 11) when the `brotli` package is installed, otherwise
+    an estimate from xz/LZMA at its highest preset, which lands close to
+    brotli -11 on JS/CSS. Estimated columns are headed "brotli~".
+
+It also lists font faces that ship in more than one format. KaTeX's CSS offers
+.woff2, .woff and .ttf for every face; browsers that support woff2 never fetch
+the other two, so those bytes are deploy size that no visitor downloads.
+
+The budget file (scripts/bundle_budget.json) holds maximum raw/gzip bytes of the
+deployed files per directory, for all fonts, for the whole bundle and for the
+largest single file (hashed names change every build, so budgets are not per
+file). The script
+exits 1 when any measured size is over its budget; --update-budget rewrites the
+file from the current build with --headroom to spare. Brotli is reported but
+not budgeted, since the estimate differs from the real encoder.
+
+Usage:
+  python scripts/bundle_report.py                    # npm run build runs it (postbuild)
+  python scripts/bundle_report.py --verbose          # every file, largest first
+  python scripts/bundle_report.py --format json
+  python scripts/bundle_report.py --update-budget --headroom 0.05
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import json
+import lzma
+import math
+import os
+import pathlib
+import re
+import sys
+from dataclasses import asdict, dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from asset_report import BUILD_DIR, REPO_ROOT, human
+
+try:
+    import brotli  # type: ignore[import-not-found]
+except ImportError:  # optional; fall back to an LZMA estimate
+    brotli = None  # type: ignore[assignment]
+
+DEFAULT_BUDGET = REPO_ROOT / "scripts" / "bundle_budget.json"
+BUDGET_VERSION = 1
+GROUPS = ("assets", "chunks", "entry", "nodes")
+METRICS = ("raw", "gzip")
+FONT_SUFFIXES = (".woff2", ".woff", ".ttf", ".otf", ".eot")
+# Vite's output names: <name>.<8-char hash>.<ext>
+HASHED_RE = re.compile(r"^(?P<name>.+)\.[A-Za-z0-9_-]{8}(?P<ext>\.[A-Za-z0-9]+)$")
+LZMA_FILTERS = [{"id": lzma.FILTER_LZMA2, "preset": 9 | lzma.PRESET_EXTREME}]
+
+
+@dataclass
+class FileSize:
+    path: str  # relative to _app/immutable
+    group: str
+    raw: int
+    gzip: int
+    brotli: int
+
+    @property
+    def is_font(self) -> bool:
+        return self.path.endswith(FONT_SUFFIXES)
+
+
+def brotli_size(data: bytes) -> int:
+    if brotli is not None:
+        return len(brotli.compress(data, quality=11))
+    return len(lzma.compress(data, format=lzma.FORMAT_RAW, filters=LZMA_FILTERS))
+
+
+def measure(path: pathlib.Path, rel: str, group: str) -> FileSize:
+    data = path.read_bytes()
+    return FileSize(rel, group, len(data), len(gzip.compress(data, 9, mtime=0)), brotli_size(data))
+
+
+def scan(immutable: pathlib.Path) -> List[FileSize]:
+    files: List[FileSize] = []
+    for group in GROUPS:
+        root = immutable / group
+        if not root.is_dir():
+            continue
+        for p in sorted(root.rglob("*")):
+            # Skip precompress.py's .gz sidecars; gzip sizes are measured here anyway.
+            if p.is_file() and p.suffix != ".gz":
+                files.append(measure(p, p.relative_to(immutable).as_posix(), group))
+    return files
+
+
+def totals(files: Iterable[FileSize]) -> Dict[str, int]:
+    out = {"files": 0, "raw": 0, "gzip": 0, "brotli": 0}
+    for f in files:
+        out["files"] += 1
+        out["raw"] += f.raw
+        out["gzip"] += f.gzip
+        out["brotli"] += f.brotli
+    return out
+
+
+def summarize(files: List[FileSize]) -> Dict[str, Dict[str, int]]:
+    """Measured sizes under the budget keys."""
+    summary = {group: totals(f for f in files if f.group == group) for group in GROUPS}
+    summary["fonts"] = totals(f for f in files if f.is_font)
+    summary["total"] = totals(files)
+    summary["largest_file"] = {m: max((getattr(f, m) for f in files), default=0) for m in ("raw", "gzip", "brotli")}
+    return summary
+
+
+def duplicate_fonts(files: List[FileSize]) -> Dict[str, List[FileSize]]:
+    """Font faces shipped in more than one format, keyed by face name."""
+    faces: Dict[str, List[FileSize]] = {}
+    for f in files:
+        if not f.is_font:
+            continue
+        m = HASHED_RE.match(pathlib.PurePosixPath(f.path).name)
+        name = m.group("name") if m else pathlib.PurePosixPath(f.path).stem
+        faces.setdefault(name, []).append(f)
+    return {
+        name: sorted(fs, key=lambda f: FONT_SUFFIXES.index(pathlib.PurePosixPath(f.path).suffix))
+        for name, fs in sorted(faces.items())
+        if len({pathlib.PurePosixPath(f.path).suffix for f in fs}) > 1
+    }
+
+
+def load_budget(path: pathlib.Path) -> Optional[Dict[str, Dict[str, int]]]:
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return None
+    if data.get("version") != BUDGET_VERSION:
+        raise ValueError(f"{path}: unsupported budget version {data.get('version')!r}")
+    return data["budgets"]
+
+
+def check_budget(
+    summary: Dict[str, Dict[str, int]], budgets: Dict[str, Dict[str, int]]
+) -> List[Tuple[str, str, int, int]]:
+    """(key, metric, measured, budget) for every size over its budget."""
+    over = []
+    for key, limits in budgets.items():
+        for metric, limit in limits.items():
+            measured = summary.get(key, {}).get(metric, 0)
+            if measured > limit:
+                over.append((key, metric, measured, limit))
+    return over
+
+
+def new_budget(summary: Dict[str, Dict[str, int]], headroom: float) -> Dict[str, Dict[str, int]]:
+    def limit(n: int) -> int:
+        return int(math.ceil(n * (1 + headroom) / 1024)) * 1024
+
+    keys = (*GROUPS, "fonts", "total", "largest_file")
+    return {key: {m: limit(summary[key][m]) for m in METRICS} for key in keys if summary[key].get("raw")}
+
+
+def print_report(
+    files: List[FileSize],
+    summary: Dict[str, Dict[str, int]],
+    dupes: Dict[str, List[FileSize]],
+    verbose: bool,
+) -> None:
+    br = "brotli" if brotli is not None else "brotli~"
+    if verbose:
+        print(f"{'raw':>10} {'gzip':>10} {br:>10}  file")
+        for f in sorted(files, key=lambda f: -f.raw):
+            print(f"{human(f.raw):>10} {human(f.gzip):>10} {human(f.brotli):>10}  {f.path}")
+        print()
+    print(f"{'':14} {'files':>5} {'raw':>10} {'gzip':>10} {br:>10}")
+    for key in (*GROUPS, "fonts", "total"):
+        s = summary[key]
+        print(f"{key:14} {s['files']:5d} {human(s['raw']):>10} {human(s['gzip']):>10} {human(s['brotli']):>10}")
+    s = summary["largest_file"]
+    print(f"{'largest_file':14} {'':5} {human(s['raw']):>10} {human(s['gzip']):>10} {human(s['brotli']):>10}")
+
+    if dupes:
+        spare = sum(f.raw for fs in dupes.values() for f in fs[1:])
+        print(
+            f"\nFont faces shipped in several formats ({len(dupes)}); "
+            f"{human(spare)} is never fetched by woff2-capable browsers:"
+        )
+        for name, fs in dupes.items():
+            formats = ", ".join(f"{pathlib.PurePosixPath(f.path).suffix[1:]} {human(f.raw)}" for f in fs)
+            print(f"  {name}: {formats}")
+
+
+def main(argv: List[str]) -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--build-dir", type=pathlib.Path, default=BUILD_DIR, help="Build output (default: docs)")
+    ap.add_argument(
+        "--budget",
+        type=pathlib.Path,
+        default=DEFAULT_BUDGET,
+        help=f"Budget file (default: {DEFAULT_BUDGET.relative_to(REPO_ROOT)})",
+    )
+    ap.add_argument("--format", choices=("text", "json"), default="text")
+    ap.add_argument("--verbose", action="store_true", help="List every file (text format)")
+    ap.add_argument("--update-budget", action="store_true", help="Rewrite the budget file from this build")
+    ap.add_argument(
+        "--headroom",
+        type=float,
+        default=0.05,
+        help="With --update-budget: allowed growth over the current sizes (default: 0.05)",
+    )
+    args = ap.parse_args(argv)
+
+    immutable = args.build_dir / "_app" / "immutable"
+    if not immutable.is_dir():
+        print(f"ERROR: not found: {immutable} (run `npm run build`)", file=sys.stderr)
+        return 2
+
+    files = scan(immutable)
+    summary = summarize(files)
+    dupes = duplicate_fonts(files)
+
+    if args.update_budget:
+        args.budget.parent.mkdir(parents=True, exist_ok=True)
+        tmp = args.budget.with_name(f".{args.budget.name}.tmp")
+        payload = {"version": BUDGET_VERSION, "budgets": new_budget(summary, args.headroom)}
+        tmp.write_text(json.dumps(payload, indent=2) + "\n", encoding="utf-8")
+        os.replace(tmp, args.budget)
+        print(f"{args.budget}: written ({args.headroom:.0%} headroom)")
+        return 0
+
+    try:
+        budgets = load_budget(args.budget)
+    except ValueError as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        return 2
+    over = check_budget(summary, budgets or {})
+
+    if args.format == "json":
+        report = {
+            "brotli": "brotli" if brotli is not None else "lzma-estimate",
+            "files": [asdict(f) for f in files],
+            "summary": summary,
+            "duplicateFonts": {name: [f.path for f in fs] for name, fs in dupes.items()},
+            "overBudget": [{"key": k, "metric": m, "size": n, "budget": b} for k, m, n, b in over],
+        }
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(files, summary, dupes, args.verbose)
+        if brotli is None:
+            print("\n~ brotli sizes are LZMA estimates (pip install brotli for exact numbers)")
+        if budgets is None:
+            print(f"\nNo budget file at {args.budget}; create one with --update-budget")
+        elif over:
+            print(f"\nOver budget ({args.budget.name}):", file=sys.stderr)
+            for key, metric, measured, limit in over:
+                print(
+                    f"  {key} {metric}: {human(measured)} > {human(limit)} (+{human(measured - limit)})",
+                    file=sys.stderr,
+                )
+        else:
+            print(f"\nWithin budget ({args.budget.name})")
+    return 1 if over else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
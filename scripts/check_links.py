@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+"""
+Check every external URL in the posts' footnote definitions, concurrently.
+
+URLs come from the footnote blocks found by
+`external_links_to_references.parse_existing_footnotes`. Each URL is requested
+with HEAD (falling back to GET when a server rejects HEAD), following redirects.
+
+Requests run on asyncio with a small built-in HTTP/1.1 client (stdlib only):
+  - connections are pooled per host (scheme, host, port) and reused (keep-alive);
+  - at most --per-host requests run against one host at a time, and at most
+    --concurrency overall;
+  - results are cached on disk (.cache/linkcheck/results.json) with a TTL, so a
+    rerun only re-checks URLs whose result is older than --ttl-hours. Only
+    definitive answers (2xx, 4xx) are cached: timeouts, connection errors and
+    5xx may be transient and are checked again on the next run.
+
+Outcomes:
+  ok          2xx after redirects
+  restricted  401/403/429 (usually bot protection; reported, not a failure)
+  broken      anything else: 4xx/5xx, DNS/connect/TLS errors, timeouts, redirect loops
+
+Plain http:// URLs work too, so the checker can be exercised against a local
+stand-in server (e.g. `python -m http.server`) with a markdown file pointing at it.
+
+Exit code is 1 if any URL is broken.
+
+Usage:
+  python scripts/check_links.py                       # src/maintext + src/projects
+  python scripts/check_links.py src/maintext/rl_excursions.md --per-host 2
+  python scripts/check_links.py --force               # ignore cached results
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import pathlib
+import ssl
+import sys
+import time
+import urllib.parse
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional, Set, Tuple
+
+from build_content import DEFAULT_TARGETS, iter_sources
+from external_links_to_references import URL_RE, parse_existing_footnotes
+
+REPO_ROOT = pathlib.Path(__file__).resolve().parent.parent
+DEFAULT_CACHE = REPO_ROOT / ".cache" / "linkcheck" / "results.json"
+CACHE_VERSION = 1
+
+DEFAULT_TTL_HOURS = 24.0 * 7
+DEFAULT_PER_HOST = 4
+DEFAULT_CONCURRENCY = 64
+DEFAULT_TIMEOUT = 15.0
+MAX_REDIRECTS = 8
+USER_AGENT = "Mozilla/5.0 (compatible; rl-excursions-linkcheck/1.0)"
+
+RESTRICTED = {401, 403, 429}
+# Servers that answer HEAD with one of these often serve GET fine.
+RETRY_WITH_GET = {400, 403, 404, 405, 406, 500, 501, 503}
+
+HostKey = Tuple[str, str, int]
+Conn = Tuple[asyncio.StreamReader, asyncio.StreamWriter]
+
+
+@dataclass
+class CheckResult:
+    url: str
+    outcome: str
+    status: Optional[int] = None
+    final_url: str = ""
+    error: str = ""
+    checked_at: float = 0.0
+    elapsed: float = 0.0
+
+    @property
+    def definitive(self) -> bool:
+        """False for a failure that may go away on its own (no response, or a 5xx)."""
+        return not self.error and self.status is not None and self.status < 500
+
+
+@dataclass
+class Reference:
+    url: str
+    # "path#footnote-id" for every definition that cites the URL
+    sites: List[str] = field(default_factory=list)
+
+
+def collect_references(paths: List[pathlib.Path]) -> Dict[str, Reference]:
+    refs: Dict[str, Reference] = {}
+    for p in paths:
+        lines = p.read_text(encoding="utf-8").splitlines(keepends=True)
+        defs, _ = parse_existing_footnotes(lines)
+        for fid, raw_lines in defs.items():
+            for m in URL_RE.finditer(" ".join(raw_lines)):
+                url = m.group(0).rstrip(").,;")
+                refs.setdefault(url, Reference(url)).sites.append(f"{p}#{fid}")
+    return refs
+
+
+class HttpError(Exception):
+    pass
+
+
+class HostPool:
+    """Idle keep-alive connections to one host, plus its concurrency limit."""
+
+    def __init__(self, limit: int) -> None:
+        self.sem = asyncio.Semaphore(limit)
+        self.idle: List[Conn] = []
+
+    def close(self) -> None:
+        for _, writer in self.idle:
+            writer.close()
+        self.idle.clear()
+
+
+class LinkChecker:
+    def __init__(self, per_host: int, concurrency: int, timeout: float) -> None:
+        self.per_host = per_host
+        self.timeout = timeout
+        self.total = asyncio.Semaphore(concurrency)
+        self.pools: Dict[HostKey, HostPool] = {}
+        self.ssl_ctx = ssl.create_default_context()
+        self.connections_opened = 0
+
+    def _pool(self, key: HostKey) -> HostPool:
+        pool = self.pools.get(key)
+        if pool is None:
+            pool = self.pools[key] = HostPool(self.per_host)
+        return pool
+
+    async def _connect(self, key: HostKey) -> Conn:
+        scheme, host, port = key
+        self.connections_opened += 1
+        if scheme == "https":
+            return await asyncio.open_connection(host, port, ssl=self.ssl_ctx, server_hostname=host)
+        return await asyncio.open_connection(host, port)
+
+    async def _exchange(self, conn: Conn, method: str, host_header: str, target: str) -> Tuple[int, Dict[str, str], bool]:
+        """Send one request, read the status and headers. Returns (status, headers, reusable)."""
+        reader, writer = conn
+        writer.write(
+            (
+                f"{method} {target} HTTP/1.1\r\n"
+                f"Host: {host_header}\r\n"
+                f"User-Agent: {USER_AGENT}\r\n"
+                "Accept: */*\r\n"
+                "Connection: keep-alive\r\n\r\n"
+            ).encode("latin-1")
+        )
+        await writer.drain()
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError("connection closed before response")
+        parts = status_line.decode("latin-1").split(None, 2)
+        if len(parts) < 2 or not parts[0].startswith("HTTP/"):
+            raise HttpError(f"bad status line: {status_line[:80]!r}")
+        status = int(parts[1])
+        headers: Dict[str, str] = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        reusable = parts[0] == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+        if method == "HEAD" or status in (204, 304):
+            return status, headers, reusable
+        # GET: drain a small, length-delimited body to keep the connection; otherwise drop it.
+        length = headers.get("content-length")
+        if reusable and length is not None and length.isdigit() and int(length) <= 1 << 20:
+            await reader.readexactly(int(length))
+            return status, headers, True
+        return status, headers, False
+
+    async def request(self, method: str, url: str) -> Tuple[int, Dict[str, str]]:
+        parts = urllib.parse.urlsplit(url)
+        scheme = parts.scheme.lower()
+        if scheme not in ("http", "https") or not parts.hostname:
+            raise HttpError(f"unsupported url: {url}")
+        host = parts.hostname.encode("idna").decode("ascii")
+        port = parts.port or (443 if scheme == "https" else 80)
+        key = (scheme, host, port)
+        default_port = port == (443 if scheme == "https" else 80)
+        host_header = host if default_port else f"{host}:{port}"
+        target = urllib.parse.quote(parts.path or "/", safe="/%:@!$&'()*+,;=-._~")
+        if parts.query:
+            target += "?" + urllib.parse.quote(parts.query, safe="=&%:@!$'()*+,;/?-._~")
+
+        pool = self._pool(key)
+        async with pool.sem:
+            # A pooled connection may have been closed by the server; retry once on a fresh one.
+            for attempt in range(2):
+                reused = bool(pool.idle) and attempt == 0
+                conn = pool.idle.pop() if reused else await self._connect(key)
+                try:
+                    status, headers, reusable = await self._exchange(conn, method, host_header, target)
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    conn[1].close()
+                    if reused:
+                        continue
+                    raise
+                except BaseException:
+                    conn[1].close()
+                    raise
+                if reusable:
+                    pool.idle.append(conn)
+                else:
+                    conn[1].close()
+                return status, headers
+        raise HttpError("unreachable")
+
+    async def _follow(self, url: str) -> Tuple[int, str]:
+        method = "HEAD"
+        seen: Set[str] = set()
+        current = url
+        for _ in range(MAX_REDIRECTS + 1):
+            status, headers = await self.request(method, current)
+            if method == "HEAD" and status in RETRY_WITH_GET:
+                method = "GET"
+                status, headers = await self.request(method, current)
+            if status in (301, 302, 303, 307, 308) and "location" in headers:
+                nxt = urllib.parse.urljoin(current, headers["location"])
+                if nxt in seen:
+                    raise HttpError("redirect loop")
+                seen.add(current)
+                current = nxt
+                continue
+            return status, current
+        raise HttpError("too many redirects")
+
+    async def check(self, url: str) -> CheckResult:
+        t0 = time.monotonic()
+        async with self.total:
+            try:
+                status, final_url = await asyncio.wait_for(self._follow(url), self.timeout)
+            except asyncio.TimeoutError:
+                return CheckResult(url, "broken", error="timeout", checked_at=time.time(), elapsed=time.monotonic() - t0)
+            except (OSError, HttpError, ValueError, asyncio.IncompleteReadError) as e:
+                err = f"{type(e).__name__}: {e}" if str(e) else type(e).__name__
+                return CheckResult(url, "broken", error=err, checked_at=time.time(), elapsed=time.monotonic() - t0)
+        if 200 <= status < 300:
+            outcome = "ok"
+        elif status in RESTRICTED:
+            outcome = "restricted"
+        else:
+            outcome = "broken"
+        return CheckResult(url, outcome, status, final_url, checked_at=time.time(), elapsed=time.monotonic() - t0)
+
+    def close(self) -> None:
+        for pool in self.pools.values():
+            pool.close()
+
+
+async def check_all(urls: List[str], per_host: int, concurrency: int, timeout: float) -> Tuple[List[CheckResult], int]:
+    checker = LinkChecker(per_host, concurrency, timeout)
+    try:
+        results = await asyncio.gather(*(checker.check(u) for u in urls))
+    finally:
+        checker.close()
+    return list(results), checker.connections_opened
+
+
+def load_cache(path: pathlib.Path) -> Dict[str, CheckResult]:
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    if data.get("version") != CACHE_VERSION:
+        return {}
+    out: Dict[str, CheckResult] = {}
+    for url, d in data.get("results", {}).items():
+        try:
+            r = CheckResult(**d)
+        except TypeError:
+            continue
+        if r.definitive:
+            out[url] = r
+    return out
+
+
+def save_cache(path: pathlib.Path, results: Dict[str, CheckResult]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.tmp")
+    payload = {"version": CACHE_VERSION, "results": {u: asdict(r) for u, r in sorted(results.items()) if r.definitive}}
+    tmp.write_text(json.dumps(payload, indent=1) + "\n", encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def main(argv: List[str]) -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument(
+        "targets",
+        nargs="*",
+        type=pathlib.Path,
+        help=f"Markdown files or directories (default: {' '.join(DEFAULT_TARGETS)})",
+    )
+    ap.add_argument("--per-host", type=int, default=DEFAULT_PER_HOST, help=f"Max concurrent requests per host (default: {DEFAULT_PER_HOST})")
+    ap.add_argument(
+        "--concurrency", type=int, default=DEFAULT_CONCURRENCY, help=f"Max concurrent requests overall (default: {DEFAULT_CONCURRENCY})"
+    )
+    ap.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, help=f"Per-URL timeout in seconds (default: {DEFAULT_TIMEOUT:g})")
+    ap.add_argument(
+        "--ttl-hours",
+        type=float,
+        default=DEFAULT_TTL_HOURS,
+        help=f"Re-check cached results older than this (default: {DEFAULT_TTL_HOURS:g})",
+    )
+    ap.add_argument(
+        "--cache",
+        type=pathlib.Path,
+        default=DEFAULT_CACHE,
+        help=f"Result cache (default: {DEFAULT_CACHE.relative_to(REPO_ROOT)})",
+    )
+    ap.add_argument("--force", action="store_true", help="Ignore cached results")
+    ap.add_argument("--verbose", action="store_true", help="Also list URLs that are ok")
+    args = ap.parse_args(argv)
+
+    targets = args.targets or [REPO_ROOT / t for t in DEFAULT_TARGETS]
+    missing = [t for t in targets if not t.exists()]
+    if missing:
+        print(f"ERROR: not found: {', '.join(map(str, missing))}", file=sys.stderr)
+        return 2
+
+    refs = collect_references(list(iter_sources(targets)))
+    cache = {} if args.force else load_cache(args.cache)
+    now = time.time()
+    ttl = args.ttl_hours * 3600
+    stale = [u for u in refs if u not in cache or now - cache[u].checked_at > ttl]
+
+    t0 = time.monotonic()
+    fresh, opened = asyncio.run(check_all(stale, args.per_host, args.concurrency, args.timeout)) if stale else ([], 0)
+    wall = time.monotonic() - t0
+    for r in fresh:
+        cache[r.url] = r
+    save_cache(args.cache, cache)
+
+    counts: Dict[str, int] = {}
+    for url in sorted(refs):
+        r = cache[url]
+        counts[r.outcome] = counts.get(r.outcome, 0) + 1
+        if r.outcome == "ok" and not args.verbose:
+            continue
+        detail = str(r.status) if r.status is not None else r.error
+        moved = f" -> {r.final_url}" if r.final_url and r.final_url != url else ""
+        print(f"{r.outcome.upper():<10} {detail:<12} {url}{moved}")
+        for site in refs[url].sites:
+            print(f"{'':<24}{site}")
+
+    summary = " ".join(f"{k}={v}" for k, v in sorted(counts.items()))
+    print(
+        f"\n{len(refs)} urls ({summary}); checked {len(stale)} in {wall:.1f}s "
+        f"over {opened} connections, {len(refs) - len(stale)} from cache"
+    )
+    return 1 if counts.get("broken") else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
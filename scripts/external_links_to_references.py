@@ -12,32 +12,45 @@ What this script does:
   - Appends new footnote definitions for any new external URLs.
   - Skips fenced code blocks and existing footnote definition blocks.
   - Deduplicates by URL (same URL -> same footnote id).
+  - Ids are shared across the corpus through footnote_registry.py (the same URL gets
+    the same id in every post); --no-registry restores per-file ids.
 
 Notes / constraints:
   - Only treats http/https links as "external".
   - Does NOT touch image links: ![alt](...)
   - Pragmatic markdown parsing (line-based state machine); not a full parser.
+  - --profile TRACE.json writes a timing trace (see profiling.py); it implies --jobs 1.
 """
 
 from __future__ import annotations
 
 import argparse
+import functools
+import itertools
+import os
 import pathlib
 import re
 import sys
-from dataclasses import dataclass
-from typing import Dict, Iterable, List, Optional, Set, Tuple
-
-
-FOOTNOTE_DEF_RE = re.compile(r"^\[\^([^\]]+)\]:\s*(.*)$")
-FOOTNOTE_CONT_RE = re.compile(r"^(?:\s{2,}|\t).+")
-
-# Standard markdown links (NOT images), single-line:
-# [text](https://example.com)
-# [text](https://example.com "title")
-MD_LINK_RE = re.compile(
-    r"(?<!\!)\[(?P<label>[^\]]+)\]\((?P<url>https?://[^)\s]+)(?P<title>\s+\"[^\"]*\")?\)"
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, replace
+from typing import Container, Dict, Iterable, List, Optional, Set, Tuple, Union
+
+from footnote_registry import DEFAULT_REGISTRY, REPO_ROOT, FootnoteRegistry
+
+from md_stream import (
+    BLANK,
+    FOOTNOTE,
+    FOOTNOTE_CONT_RE,
+    FOOTNOTE_DEF_RE,
+    IMAGE,
+    MD_LINK_RE,
+    TEXT,
+    Line,
+    Transform,
+    transform_text,
 )
+from profiling import add_profile_arg, profiled, profiling, span
+
 
 URL_RE = re.compile(r"https?://\S+")
 
@@ -49,11 +62,6 @@ def slugify(s: str) -> str:
     return s
 
 
-def is_fence_line(line: str) -> bool:
-    # minimal: treat "```" starting a line as a fence toggle
-    return line.lstrip().startswith("```")
-
-
 def parse_existing_footnotes(lines: List[str]) -> Tuple[Dict[str, List[str]], Set[int]]:
     """
     Return:
@@ -113,9 +121,28 @@ def build_url_to_id(existing_defs: Dict[str, List[str]]) -> Dict[str, str]:
     return url_to_id
 
 
-def make_id_for_url(url: str, used_ids: Set[str]) -> str:
+def well_formed_label(label: str) -> bool:
+    """False for text that would leave an open bracket in a new definition (e.g. "[Title](")."""
+    return label.count("[") == label.count("]") and label.count("(") == label.count(")")
+
+
+def definition_label(raw_lines: List[str], url: str) -> str:
+    """
+    The text of an existing definition without its URL, to describe that URL
+    elsewhere: "A. (2023). [Title](url). ICML." -> "A. (2023). Title. ICML".
+    A markdown link to `url` keeps its text; a bare `url` is dropped.
+    """
+    text = " ".join(ln.strip() for ln in raw_lines)
+    link_re = re.compile(r"\[([^\[\]]*)\]\(\s*<?" + re.escape(url) + r'>?(?:\s+"[^"]*")?\s*\)')
+    text = link_re.sub(lambda m: m.group(1), text).replace(url, "")
+    label = re.sub(r"\s+", " ", text).strip().rstrip(".").strip()
+    return label if well_formed_label(label) else ""
+
+
+def make_id_for_url(url: str, used_ids: Set[str], reserved: Container[str] = ()) -> str:
     """
-    Create a readable, stable-ish id from the URL, ensuring uniqueness.
+    Create a readable, stable-ish id from the URL, ensuring uniqueness
+    (against `used_ids`, which it updates, and against `reserved`).
     """
     # domain + last segment works well for arxiv/hf/etc.
     try:
@@ -130,7 +157,7 @@ def make_id_for_url(url: str, used_ids: Set[str]) -> str:
 
     candidate = base
     k = 2
-    while candidate in used_ids:
+    while candidate in used_ids or candidate in reserved:
         candidate = f"{base}-{k}"
         k += 1
     used_ids.add(candidate)
@@ -144,83 +171,173 @@ class NewFootnote:
     url: str
 
 
-def convert_file(path: pathlib.Path, in_place: bool) -> Tuple[bool, str]:
-    """
-    Returns (changed, message).
-    """
-    raw = path.read_text(encoding="utf-8")
-    lines = raw.splitlines(True)
+# A line with external links, split into literal text and (label, url) pieces.
+# Footnote ids can only be assigned once the existing definitions (usually at the
+# end of the file) have been seen, so these are resolved in `finish`.
+_Pending = Tuple[Line, List[Union[str, Tuple[str, str]]]]
 
-    existing_defs, def_line_idxs = parse_existing_footnotes([l.rstrip("\n") for l in lines])
-    url_to_id = build_url_to_id(existing_defs)
 
-    used_ids: Set[str] = set(existing_defs.keys())
-    new_footnotes: Dict[str, NewFootnote] = {}
-    new_order: List[str] = []
+class ExternalLinksToFootnotes(Transform):
+    """
+    Streaming external-link -> footnote transform.
 
-    out_lines: List[str] = []
-    in_code = False
+    Links are located as lines stream past and existing footnote definitions are
+    collected on the way; ids are resolved (and new definitions appended) at the
+    end of the document, matching `parse_existing_footnotes` + `build_url_to_id`
+    semantics without a second scan.
 
-    for ix, line in enumerate(lines):
-        if is_fence_line(line):
-            in_code = not in_code
-            out_lines.append(line)
-            continue
-
-        if in_code or ix in def_line_idxs:
-            out_lines.append(line)
-            continue
+    With a `registry`, URLs not defined in this document take their corpus-wide id
+    (and first label) from it, new URLs are registered, and the document's own
+    definitions seed it.
+    """
 
-        def repl(m: re.Match[str]) -> str:
-            label = m.group("label") or ""
-            url = m.group("url") or ""
+    name = "footnotes"
+
+    def __init__(self, registry: Optional[FootnoteRegistry] = None) -> None:
+        self.registry = registry
+        self.new_footnotes: List[NewFootnote] = []
+        self._items: List[Union[Line, _Pending]] = []
+        self._defs: Dict[str, List[str]] = {}
+        self._current_id: Optional[str] = None
+
+    def feed(self, line: Line) -> Iterable[Line]:
+        if line.kind == FOOTNOTE:
+            m = FOOTNOTE_DEF_RE.match(line.text)
+            if m:
+                self._current_id = m.group(1)
+                self._defs[self._current_id] = [m.group(2)]
+            elif self._current_id is not None:
+                self._defs[self._current_id].append(line.text)
+            self._items.append(line)
+            return ()
+        self._current_id = None
+
+        # Skip fenced code (and anything that isn't prose).
+        if line.kind not in (TEXT, IMAGE):
+            self._items.append(line)
+            return ()
+
+        parts: List[Union[str, Tuple[str, str]]] = []
+        pos = 0
+        for m in MD_LINK_RE.finditer(line.text):
+            parts.append(line.text[pos : m.start()])
+            parts.append((m.group("label") or "", m.group("url") or ""))
+            pos = m.end()
+        if not parts:
+            self._items.append(line)
+            return ()
+        parts.append(line.text[pos:])
+        self._items.append((line, parts))
+        return ()
+
+    def _resolve(self, parts: List[Union[str, Tuple[str, str]]], url_to_id: Dict[str, str], used_ids: Set[str]) -> str:
+        out: List[str] = []
+        for part in parts:
+            if isinstance(part, str):
+                out.append(part)
+                continue
+            label, url = part
 
             # Reuse id if URL already exists.
             fid = url_to_id.get(url)
             if not fid:
-                fid = make_id_for_url(url, used_ids)
+                desc = label
+                if self.registry is not None:
+                    fid, desc = self._registry_id(url, label, used_ids)
+                else:
+                    fid = make_id_for_url(url, used_ids)
                 url_to_id[url] = fid
                 # keep first label as description
-                new_footnotes[fid] = NewFootnote(fid=fid, label=label, url=url)
-                new_order.append(fid)
+                self.new_footnotes.append(NewFootnote(fid=fid, label=desc, url=url))
 
             # Replace inline link with text + footnote ref
             label_txt = label.strip()
-            if not label_txt:
-                return f"[^{fid}]"
-            return f"{label_txt}[^{fid}]"
-
-        new_line = MD_LINK_RE.sub(repl, line)
-        out_lines.append(new_line)
-
-    # Append new defs (if any)
-    if new_order:
-        # Ensure trailing newline and a blank line before definitions.
-        if out_lines and not out_lines[-1].endswith("\n"):
-            out_lines[-1] = out_lines[-1] + "\n"
-        if out_lines and out_lines[-1].strip() != "":
-            out_lines.append("\n")
-
-        for fid in new_order:
-            nf = new_footnotes[fid]
+            out.append(f"{label_txt}[^{fid}]" if label_txt else f"[^{fid}]")
+        return "".join(out)
+
+    def _registry_id(self, url: str, label: str, used_ids: Set[str]) -> Tuple[str, str]:
+        """(id, description) for a URL with no definition in this document."""
+        reg = self.registry
+        assert reg is not None
+        proposed: List[str] = []
+
+        def propose(taken: Container[str]) -> str:
+            proposed.append(make_id_for_url(url, used_ids, reserved=taken))
+            return proposed[-1]
+
+        entry = reg.get(url) or reg.add(url, label.strip(), propose)
+        if proposed and entry.id == proposed[-1]:
+            return entry.id, label
+        if entry.id in used_ids:
+            # This document already uses that id for another URL; fall back to a local id.
+            return make_id_for_url(url, used_ids, reserved=reg), label
+        used_ids.add(entry.id)
+        # Registries seeded by older versions can hold labels cut off mid-link.
+        return entry.id, (entry.label if well_formed_label(entry.label) else "") or label
+
+    def finish(self) -> Iterable[Line]:
+        url_to_id = build_url_to_id(self._defs)
+        used_ids: Set[str] = set(self._defs.keys())
+        if self.registry is not None:
+            for url, fid in url_to_id.items():
+                self.registry.seed(url, fid, definition_label(self._defs[fid], url))
+
+        last: Optional[Line] = None
+        for item in self._items:
+            if last is not None:
+                yield last
+            if isinstance(item, Line):
+                last = item
+            else:
+                line, parts = item
+                last = line.retext(self._resolve(parts, url_to_id, used_ids))
+        self._items = []
+
+        if not self.new_footnotes:
+            if last is not None:
+                yield last
+            return
+
+        # Append new defs. Ensure trailing newline and a blank line before definitions.
+        if last is not None:
+            if not last.eol:
+                last = replace(last, eol="\n")
+            yield last
+            if last.text.strip() != "":
+                yield Line("", "\n", BLANK)
+
+        for nf in self.new_footnotes:
             desc = (nf.label or "").strip()
             if desc:
                 # Ensure a period before URL for readability, matching existing style.
                 if desc.endswith((".", "!", "?", ":", ";")):
-                    line = f"[^{fid}]: {desc} {nf.url}\n"
+                    text = f"[^{nf.fid}]: {desc} {nf.url}"
                 else:
-                    line = f"[^{fid}]: {desc}. {nf.url}\n"
+                    text = f"[^{nf.fid}]: {desc}. {nf.url}"
             else:
-                line = f"[^{fid}]: {nf.url}\n"
-            out_lines.append(line)
+                text = f"[^{nf.fid}]: {nf.url}"
+            yield Line(text, "\n", FOOTNOTE)
+
 
-    out = "".join(out_lines)
+def convert_file(
+    path: pathlib.Path, in_place: bool, registry: Optional[FootnoteRegistry] = None
+) -> Tuple[bool, str]:
+    """
+    Returns (changed, message).
+    """
+    with span("read", path=str(path)) as sp:
+        raw = path.read_text(encoding="utf-8")
+        sp.bytes = len(raw)
+    t = ExternalLinksToFootnotes(registry=registry)
+    with span("transform", len(raw), path=str(path)):
+        out = transform_text(raw, profiled([t], path))
     changed = out != raw
 
     if changed and in_place:
-        path.write_text(out, encoding="utf-8")
+        with span("write", len(out), path=str(path)):
+            path.write_text(out, encoding="utf-8")
 
-    msg = f"{path}: {'updated' if changed else 'no changes'}; new footnotes: {len(new_order)}"
+    msg = f"{path}: {'updated' if changed else 'no changes'}; new footnotes: {len(t.new_footnotes)}"
     return changed, msg
 
 
@@ -234,6 +351,14 @@ def iter_md_files(root: pathlib.Path) -> Iterable[pathlib.Path]:
         yield p
 
 
+def _report(results: Iterable[Tuple[bool, str]]) -> bool:
+    changed_any = False
+    for changed, msg in results:
+        changed_any = changed_any or changed
+        print(msg)
+    return changed_any
+
+
 def main(argv: List[str]) -> int:
     ap = argparse.ArgumentParser()
     ap.add_argument("path", type=pathlib.Path, help="Path to a .md file or a directory to process")
@@ -248,6 +373,24 @@ def main(argv: List[str]) -> int:
         default=0,
         help="Optional limit on number of files processed (0 = no limit).",
     )
+    ap.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Convert files in N worker processes (0 = one per CPU; default: 1).",
+    )
+    ap.add_argument(
+        "--registry",
+        type=pathlib.Path,
+        default=DEFAULT_REGISTRY,
+        help=f"Corpus-wide URL -> footnote id registry (default: {DEFAULT_REGISTRY.relative_to(REPO_ROOT)})",
+    )
+    ap.add_argument(
+        "--no-registry",
+        action="store_true",
+        help="Pick footnote ids per file, ignoring the registry.",
+    )
+    add_profile_arg(ap)
     args = ap.parse_args(argv)
 
     root: pathlib.Path = args.path
@@ -255,15 +398,20 @@ def main(argv: List[str]) -> int:
         print(f"ERROR: not found: {root}", file=sys.stderr)
         return 2
 
-    changed_any = False
-    processed = 0
-    for p in iter_md_files(root):
-        processed += 1
-        if args.limit and processed > args.limit:
-            break
-        changed, msg = convert_file(p, in_place=args.in_place)
-        changed_any = changed_any or changed
-        print(msg)
+    paths = list(itertools.islice(iter_md_files(root), args.limit or None))
+    # Dry runs look ids up but never write the registry.
+    registry = None if args.no_registry else FootnoteRegistry(args.registry, readonly=not args.in_place)
+    worker = functools.partial(convert_file, in_place=args.in_place, registry=registry)
+    # Worker processes would profile into their own copies; keep it in-process.
+    jobs = 1 if args.profile else args.jobs or os.cpu_count() or 1
+    if jobs > 1 and len(paths) > 1:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(paths))) as ex:
+            # map() yields in submission order, so messages come out in file order.
+            results = ex.map(worker, paths, chunksize=max(1, len(paths) // (jobs * 4)))
+            changed_any = _report(results)
+    else:
+        with profiling(args.profile):
+            changed_any = _report(worker(p) for p in paths)
 
     if not args.in_place:
         print("\n(dry-run) Re-run with --in-place to apply changes.")
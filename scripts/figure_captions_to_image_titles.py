@@ -20,35 +20,26 @@ Notes:
   - Leaves images that already have an explicit title unchanged.
   - If a "caption line" appears to contain additional prose (e.g., "Beyond ..."),
     it keeps the remainder as a normal paragraph after the image.
+  - --profile TRACE.json writes a timing trace (see profiling.py); it implies --jobs 1.
 """
 
 from __future__ import annotations
 
 import argparse
+import functools
 import os
 import re
-from dataclasses import dataclass
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, replace
 from pathlib import Path
 from typing import Iterable, List, Optional, Tuple
 
-
-FENCE_RE = re.compile(r"^\s*```")
+from md_stream import IMAGE, IMAGE_LINE_RE, Line, Transform, render, run, tokenize_text
+from profiling import add_profile_arg, profiled, profiling, span
 
 # Basic markdown image: ![alt](url "optional title"){optional attrs}
-# We keep this conservative and line-based on purpose.
-IMG_RE = re.compile(
-    r"""^
-        (?P<prefix>\s*)!
-        \[(?P<alt>[^\]]*)\]
-        \(
-          (?P<url>[^)\s]+)
-          (?P<title>\s+(?P<q>["'])(?P<title_text>.*?)(?P=q))?
-        \)
-        (?P<attrs>\{[^}]*\})?
-        \s*$
-    """,
-    re.VERBOSE,
-)
+# Shared with the tokenizer, which classifies such lines as IMAGE.
+IMG_RE = IMAGE_LINE_RE
 
 # Caption line patterns we accept (as a whole paragraph line).
 # Examples:
@@ -70,6 +61,18 @@ CAPTION_RE = re.compile(
 )
 
 SPLIT_REMAINDER_RE = re.compile(r"^(?P<cap>.*?\.)\s+(?P<rest>(Beyond|We|In|This)\b.*)$")
+WHITESPACE_RUN_RE = re.compile(r"\s{2,}")
+
+
+def match_caption(text: str) -> Optional[re.Match]:
+    """
+    CAPTION_RE.match on `text` with whitespace runs collapsed to one space.
+
+    The lazy body tries `\s*$` at every position, which is quadratic inside a long
+    whitespace run; with single spaces it is linear. The caption text is
+    whitespace-normalized anyway, so the result is the same.
+    """
+    return CAPTION_RE.match(WHITESPACE_RUN_RE.sub(" ", text))
 
 
 def _clean_caption_text(raw: str) -> str:
@@ -104,56 +107,83 @@ class EditStats:
     captions_split: int = 0
 
 
-def process_markdown_text(text: str) -> Tuple[str, EditStats]:
-    lines = text.splitlines()
-    out: List[str] = []
-    stats = EditStats()
+class CaptionsToTitles(Transform):
+    """
+    Streaming caption -> image-title transform.
 
-    in_fence = False
-    i = 0
-    while i < len(lines):
-        line = lines[i]
+    An image line is held back (together with any blank lines after it) until the
+    next non-empty line shows whether it is a caption paragraph. Optionally also
+    normalizes every emitted image line (asset paths / existing titles), which used
+    to be a second scan over the whole document.
+    """
 
-        if FENCE_RE.match(line):
-            in_fence = not in_fence
-            out.append(line)
-            i += 1
-            continue
+    name = "captions"
 
-        if in_fence:
-            out.append(line)
-            i += 1
-            continue
+    def __init__(self, normalize_asset_paths: bool = False, normalize_existing_titles: bool = False) -> None:
+        self.normalize_asset_paths = normalize_asset_paths
+        self.normalize_existing_titles = normalize_existing_titles
+        self.stats = EditStats()
+        self._image: Optional[Line] = None
+        self._blanks: List[Line] = []
 
-        m = IMG_RE.match(line)
-        if not m:
-            out.append(line)
-            i += 1
-            continue
+    def _normalize(self, line: Line) -> Line:
+        if not (self.normalize_asset_paths or self.normalize_existing_titles):
+            return line
+        m = line.image
+        if m is None:
+            return line
 
-        # Image line found
         prefix = m.group("prefix") or ""
         alt = m.group("alt") or ""
         url = m.group("url")
-        has_title = bool(m.group("title"))
         attrs = m.group("attrs") or ""
+        has_title = bool(m.group("title"))
         title_text = m.group("title_text") if has_title else None
 
+        if self.normalize_asset_paths and url.startswith("assets/"):
+            url = "/" + url
+
+        if self.normalize_existing_titles and title_text is not None:
+            title_text = _clean_caption_text(title_text)
+
+        if has_title and title_text is not None:
+            new = f"{prefix}![{alt}]({url}{_quote_title(title_text)}){attrs}"
+        else:
+            new = f"{prefix}![{alt}]({url}){attrs}"
+        return line if new == line.text else line.retext(new)
+
+    def _flush(self) -> List[Line]:
+        out: List[Line] = []
+        if self._image is not None:
+            out.append(self._normalize(self._image))
+        out.extend(self._blanks)
+        self._image, self._blanks = None, []
+        return out
+
+    def feed(self, line: Line) -> Iterable[Line]:
+        if self._image is None:
+            if line.kind == IMAGE:
+                self._image = line
+            else:
+                yield line
+            return
+
         # Look ahead for caption line
-        j = i + 1
-        while j < len(lines) and lines[j].strip() == "":
-            j += 1
-        if j >= len(lines):
-            out.append(line)
-            i += 1
-            continue
-
-        cap_line = lines[j]
-        cm = CAPTION_RE.match(cap_line)
+        if line.text.strip() == "":
+            self._blanks.append(line)
+            return
+
+        cm = match_caption(line.text)
         if not cm:
-            out.append(line)
-            i += 1
-            continue
+            yield from self._flush()
+            # The line that ended the look-ahead may itself be the next image.
+            yield from self.feed(line)
+            return
+
+        image, had_blanks = self._image, bool(self._blanks)
+        self._image, self._blanks = None, []
+        m = image.image
+        assert m is not None
 
         # Build caption text
         # Reconstruct "Figure N: body" in a normalized way
@@ -167,42 +197,86 @@ def process_markdown_text(text: str) -> Tuple[str, EditStats]:
         if split_m:
             caption = split_m.group("cap").strip()
             remainder = split_m.group("rest").strip()
-            stats.captions_split += 1
+            self.stats.captions_split += 1
 
+        out: List[Line] = []
         # If image already has a title, do not overwrite it; just remove the duplicate caption line.
-        if has_title:
-            out.append(line)
+        if m.group("title"):
+            out.append(self._normalize(image))
         else:
-            new_line = f"{prefix}![{alt}]({url}{_quote_title(caption)}){attrs}"
-            out.append(new_line)
-            stats.images_titled += 1
+            prefix = m.group("prefix") or ""
+            alt = m.group("alt") or ""
+            attrs = m.group("attrs") or ""
+            new_line = f"{prefix}![{alt}]({m.group('url')}{_quote_title(caption)}){attrs}"
+            out.append(self._normalize(image.retext(new_line)))
+            self.stats.images_titled += 1
 
-        # Keep original blank lines between image and caption? We remove the caption paragraph itself.
-        stats.captions_removed += 1
+        # We remove the caption paragraph itself.
+        self.stats.captions_removed += 1
 
-        # Copy intervening blank lines between i and j, but ensure at most one blank line.
+        # Collapse intervening blank lines between image and caption to at most one.
         # (keeps markdown structure tidy)
-        if j > i + 1:
-            out.append("")
+        if had_blanks:
+            out.append(image.retext(""))
 
         # If we split remainder prose, keep it as its own paragraph after a blank line.
         if remainder:
-            out.append(remainder)
+            out.append(image.retext(remainder))
+
+        # The group ends where the caption line ended.
+        out[-1] = replace(out[-1], eol=line.eol)
+        yield from out
 
-        i = j + 1
+    def finish(self) -> Iterable[Line]:
+        return self._flush()
 
-    new_text = "\n".join(out) + ("\n" if text.endswith("\n") else "")
-    return new_text, stats
+
+def process_markdown_text(
+    text: str,
+    normalize_asset_paths: bool = False,
+    normalize_existing_titles: bool = False,
+    path: object = "",
+) -> Tuple[str, EditStats]:
+    t = CaptionsToTitles(normalize_asset_paths, normalize_existing_titles)
+    new_text = render(run(tokenize_text(text), profiled([t], path)))
+    return new_text, t.stats
 
 
 def iter_md_files(target: Path) -> Iterable[Path]:
     if target.is_file():
         yield target
         return
-    for p in target.rglob("*.md"):
+    # Sorted so that summaries (and --jobs merges) are deterministic.
+    for p in sorted(target.rglob("*.md")):
         yield p
 
 
+def process_file(
+    md_path: Path,
+    in_place: bool,
+    normalize_asset_paths: bool = False,
+    normalize_existing_titles: bool = False,
+) -> Tuple[bool, EditStats]:
+    """
+    Process one file; returns (changed, stats). Module-level so it can run in a worker process.
+    """
+    with span("read", path=str(md_path)) as sp:
+        old = md_path.read_text(encoding="utf-8")
+        sp.bytes = len(old)
+    with span("transform", len(old), path=str(md_path)):
+        new, stats = process_markdown_text(
+            old,
+            normalize_asset_paths=normalize_asset_paths,
+            normalize_existing_titles=normalize_existing_titles,
+            path=md_path,
+        )
+    changed = new != old
+    if changed and in_place:
+        with span("write", len(new), path=str(md_path)):
+            md_path.write_text(new, encoding="utf-8")
+    return changed, stats
+
+
 def main() -> int:
     ap = argparse.ArgumentParser()
     ap.add_argument("target", help="Markdown file or directory to process")
@@ -218,6 +292,13 @@ def main() -> int:
         action="store_true",
         help="Clean up existing image titles (e.g., strip leftover ** markers)",
     )
+    ap.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Process files in N worker processes (0 = one per CPU; default: 1)",
+    )
+    add_profile_arg(ap)
     args = ap.parse_args()
 
     target = Path(args.target)
@@ -230,60 +311,30 @@ def main() -> int:
     total = EditStats()
     changed_files: List[Path] = []
 
-    def process_with_normalization(text: str) -> Tuple[str, EditStats]:
-        new_text, stats = process_markdown_text(text)
-        if not (args.normalize_asset_paths or args.normalize_existing_titles):
-            return new_text, stats
-
-        lines = new_text.splitlines()
-        out2: List[str] = []
-        in_fence = False
-        for ln in lines:
-            if FENCE_RE.match(ln):
-                in_fence = not in_fence
-                out2.append(ln)
-                continue
-            if in_fence:
-                out2.append(ln)
-                continue
-
-            m = IMG_RE.match(ln)
-            if not m:
-                out2.append(ln)
-                continue
-
-            prefix = m.group("prefix") or ""
-            alt = m.group("alt") or ""
-            url = m.group("url")
-            attrs = m.group("attrs") or ""
-            has_title = bool(m.group("title"))
-            title_text = m.group("title_text") if has_title else None
-
-            if args.normalize_asset_paths and url.startswith("assets/"):
-                url = "/" + url
-
-            if args.normalize_existing_titles and title_text is not None:
-                title_text = _clean_caption_text(title_text)
-
-            if has_title and title_text is not None:
-                out2.append(f"{prefix}![{alt}]({url}{_quote_title(title_text)}){attrs}")
-            else:
-                out2.append(f"{prefix}![{alt}]({url}){attrs}")
-
-        out_final = "\n".join(out2) + ("\n" if new_text.endswith("\n") else "")
-        return out_final, stats
-
-    for md_path in iter_md_files(target):
-        old = md_path.read_text(encoding="utf-8")
-        new, stats = process_with_normalization(old)
-        if new != old:
+    paths = list(iter_md_files(target))
+    worker = functools.partial(
+        process_file,
+        in_place=in_place,
+        normalize_asset_paths=args.normalize_asset_paths,
+        normalize_existing_titles=args.normalize_existing_titles,
+    )
+    # Worker processes would profile into their own copies; keep it in-process.
+    jobs = 1 if args.profile else args.jobs or os.cpu_count() or 1
+    if jobs > 1 and len(paths) > 1:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(paths))) as ex:
+            # map() yields in submission order, so merged stats/output don't depend on scheduling.
+            results = list(ex.map(worker, paths, chunksize=max(1, len(paths) // (jobs * 4))))
+    else:
+        with profiling(args.profile):
+            results = [worker(p) for p in paths]
+
+    for md_path, (changed, stats) in zip(paths, results):
+        if changed:
             changed_files.append(md_path)
             total.files_changed += 1
             total.images_titled += stats.images_titled
             total.captions_removed += stats.captions_removed
             total.captions_split += stats.captions_split
-            if in_place:
-                md_path.write_text(new, encoding="utf-8")
 
     print(f"files_changed={total.files_changed}")
     print(f"images_titled={total.images_titled}")
@@ -300,5 +351,3 @@ def main() -> int:
 
 if __name__ == "__main__":
     raise SystemExit(main())
-
-
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Corpus-wide registry of external footnote URLs: URL -> footnote id (+ first label).
+
+`external_links_to_references.py` used to pick ids per file, so the same arXiv
+link in two posts could end up with two different ids. The registry makes the
+choice once for the whole corpus and keeps it:
+
+  - stored as append-only JSON lines ({"url", "id", "label"}) at
+    .cache/footnotes/registry.jsonl; the first entry for a URL (or an id) wins;
+  - loaded into dicts, so lookups are O(1) and nothing is re-scanned per file;
+  - only a URL the registry has never seen causes a write (one appended line);
+  - appends happen under an exclusive file lock after catching up on lines other
+    processes appended, so parallel workers (--jobs) agree on ids.
+
+Existing footnote definitions seed the registry as files are processed, so a
+fresh checkout converges to the ids already used in the markdown.
+
+Usage:
+  python scripts/footnote_registry.py              # list entries
+  python scripts/footnote_registry.py --url https://arxiv.org/abs/2501.00001
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import json
+import pathlib
+import sys
+from dataclasses import asdict, dataclass
+from typing import Callable, Container, Dict, Iterator, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX
+    fcntl = None  # type: ignore[assignment]
+
+REPO_ROOT = pathlib.Path(__file__).resolve().parent.parent
+DEFAULT_REGISTRY = REPO_ROOT / ".cache" / "footnotes" / "registry.jsonl"
+
+
+@dataclass(frozen=True)
+class RegistryEntry:
+    url: str
+    id: str
+    label: str = ""
+
+
+class FootnoteRegistry:
+    """
+    URL -> RegistryEntry map backed by an append-only file.
+
+    With `readonly=True` (dry runs) new entries are kept in memory only.
+    `fid in registry` tells whether an id is already owned by some URL.
+    """
+
+    def __init__(self, path: pathlib.Path = DEFAULT_REGISTRY, readonly: bool = False) -> None:
+        self.path = path
+        self.readonly = readonly
+        self.added = 0
+        self._by_url: Dict[str, RegistryEntry] = {}
+        self._by_id: Dict[str, str] = {}
+        self._offset = 0
+        self._refresh()
+
+    def __contains__(self, fid: object) -> bool:
+        return fid in self._by_id
+
+    def __len__(self) -> int:
+        return len(self._by_url)
+
+    def __iter__(self) -> Iterator[RegistryEntry]:
+        return iter(self._by_url.values())
+
+    def get(self, url: str) -> Optional[RegistryEntry]:
+        return self._by_url.get(url)
+
+    def _remember(self, entry: RegistryEntry) -> bool:
+        if entry.url in self._by_url or entry.id in self._by_id:
+            return False
+        self._by_url[entry.url] = entry
+        self._by_id[entry.id] = entry.url
+        return True
+
+    def _refresh(self) -> None:
+        """Read whatever was appended since the last call."""
+        try:
+            f = self.path.open("rb")
+        except FileNotFoundError:
+            return
+        with f:
+            f.seek(self._offset)
+            data = f.read()
+        # Only consume complete lines; a concurrent writer may be mid-append.
+        end = data.rfind(b"\n") + 1
+        self._offset += end
+        for raw in data[:end].splitlines():
+            try:
+                d = json.loads(raw)
+                self._remember(RegistryEntry(d["url"], d["id"], d.get("label", "")))
+            except (ValueError, KeyError, TypeError):
+                continue
+
+    @contextlib.contextmanager
+    def _locked(self) -> Iterator[None]:
+        if self.readonly:
+            yield
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.path.open("ab") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _append(self, entry: RegistryEntry) -> None:
+        self.added += 1
+        if self.readonly:
+            return
+        line = json.dumps(asdict(entry), ensure_ascii=False) + "\n"
+        with self.path.open("ab") as f:
+            f.write(line.encode("utf-8"))
+            self._offset = f.tell()
+
+    def add(self, url: str, label: str, propose: Callable[[Container[str]], str]) -> RegistryEntry:
+        """
+        Return the entry for `url`, creating it if needed. `propose(taken)` is only
+        called for a new URL and must return an id not in `taken` (this registry).
+        """
+        entry = self._by_url.get(url)
+        if entry is not None:
+            return entry
+        with self._locked():
+            if not self.readonly:
+                self._refresh()
+            entry = self._by_url.get(url)
+            if entry is None:
+                entry = RegistryEntry(url, propose(self), label)
+                self._remember(entry)
+                self._append(entry)
+        return entry
+
+    def seed(self, url: str, fid: str, label: str = "") -> bool:
+        """Record an id already used in a document; ignored if the URL or id is known."""
+        if url in self._by_url or fid in self._by_id:
+            return False
+        with self._locked():
+            if not self.readonly:
+                self._refresh()
+            entry = RegistryEntry(url, fid, label)
+            if not self._remember(entry):
+                return False
+            self._append(entry)
+        return True
+
+
+def main(argv: List[str]) -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument(
+        "--registry",
+        type=pathlib.Path,
+        default=DEFAULT_REGISTRY,
+        help=f"Registry file (default: {DEFAULT_REGISTRY.relative_to(REPO_ROOT)})",
+    )
+    ap.add_argument("--url", type=str, default=None, help="Only show the entry for this URL")
+    args = ap.parse_args(argv)
+
+    reg = FootnoteRegistry(args.registry, readonly=True)
+    if args.url is not None:
+        entry = reg.get(args.url)
+        if entry is None:
+            print(f"not registered: {args.url}", file=sys.stderr)
+            return 1
+        print(f"{entry.id}\t{entry.url}\t{entry.label}")
+        return 0
+    for entry in reg:
+        print(f"{entry.id}\t{entry.url}\t{entry.label}")
+    print(f"{len(reg)} entries in {args.registry}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+Record the intrinsic size of every image the posts reference.
+
+`Markdown.svelte` renders figures as a bare `<img src>`, so the browser only
+learns how tall a figure is once it has downloaded it: the text below jumps as
+each image arrives, and every image is fetched up front. This script reads each
+size from the file header alone, never decoding pixels:
+
+  - PNG: the IHDR chunk;
+  - GIF: the logical screen descriptor;
+  - JPEG: the first SOF segment (walking the segment lengths, EXIF included);
+  - WebP: the VP8 / VP8L / VP8X header;
+  - SVG: width/height of the root <svg> element, or its viewBox;
+
+for every image in the posts (post_sections.py: the main post and the project
+posts; fenced code is skipped) whose URL is a path under static/, plus the GIF
+fallback Markdown.svelte shows for a .mov figure. It writes
+src/lib/generated/image-dims.json:
+
+    {"version": 1, "images": {"/assets/figures/x.png": [width, height], ...}}
+
+keyed by the URL as written in the markdown. src/lib/markdown/render.js
+(useImageManifest) adds width/height to the images it knows, so the layout is
+reserved before they load, and loading="lazy" decoding="async" to every image.
+
+Sizes are cached by path, mtime and file size in .cache/image-dims/, so a
+rebuild only stats the files; the manifest is only rewritten when it changes.
+Run this before scripts/prerender_markdown.py, whose HTML includes the sizes.
+
+Usage:
+  python scripts/image_dims.py
+  python scripts/image_dims.py --check      # exit 1 if the manifest is out of date
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import pathlib
+import re
+import struct
+import sys
+from dataclasses import dataclass
+from typing import IO, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import unquote, urlsplit
+
+from md_stream import CODE, FENCE, tokenize_text
+from optimize_images import PNG_SIGNATURE
+from post_sections import REPO_ROOT, load_posts
+from strip_image_paths_and_check_md import IMG_RE, PLACEHOLDER
+
+STATIC_DIR = REPO_ROOT / "static"
+DEFAULT_MANIFEST = REPO_ROOT / "src" / "lib" / "generated" / "image-dims.json"
+DEFAULT_CACHE_DIR = REPO_ROOT / ".cache" / "image-dims"
+MANIFEST_VERSION = 1
+CACHE_VERSION = 1
+# Enough for any SVG prolog (XML declaration, comments, DOCTYPE) before <svg>.
+SVG_HEAD_BYTES = 1 << 16
+
+# Rendered as <video> by render.js; a .mov also gets a same-named .gif fallback <img>.
+VIDEO_SUFFIXES = (".mov", ".mp4", ".webm", ".ogg")
+
+# JPEG start-of-frame markers (C4, C8 and CC are DHT, JPG and DAC).
+JPEG_SOF = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+# Markers without a length field: TEM, RST0-7, SOI.
+JPEG_STANDALONE = frozenset([0x01, *range(0xD0, 0xD9)])
+
+SVG_TAG_RE = re.compile(rb"<svg\b[^>]*>", re.IGNORECASE)
+SVG_ATTR_RE = re.compile(rb"""\s([A-Za-z:-]+)\s*=\s*(?:"([^"]*)"|'([^']*)')""")
+SVG_LENGTH_RE = re.compile(r"\s*([0-9]*\.?[0-9]+)\s*(?:px)?\s*")
+
+
+@dataclass(frozen=True)
+class ImageRef:
+    url: str  # as written in the markdown (the manifest key)
+    path: pathlib.Path
+
+
+def png_size(head: bytes) -> Optional[Tuple[int, int]]:
+    if head[:8] != PNG_SIGNATURE or head[12:16] != b"IHDR" or len(head) < 24:
+        return None
+    return struct.unpack(">II", head[16:24])
+
+
+def gif_size(head: bytes) -> Optional[Tuple[int, int]]:
+    if head[:6] not in (b"GIF87a", b"GIF89a") or len(head) < 10:
+        return None
+    return struct.unpack("<HH", head[6:10])
+
+
+def webp_size(head: bytes) -> Optional[Tuple[int, int]]:
+    if head[:4] != b"RIFF" or head[8:12] != b"WEBP" or len(head) < 30:
+        return None
+    chunk = head[12:16]
+    if chunk == b"VP8 " and head[23:26] == b"\x9d\x01\x2a":
+        w, h = struct.unpack("<HH", head[26:30])
+        return w & 0x3FFF, h & 0x3FFF
+    if chunk == b"VP8L" and head[20] == 0x2F:
+        bits = int.from_bytes(head[21:25], "little")
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b"VP8X":
+        return int.from_bytes(head[24:27], "little") + 1, int.from_bytes(head[27:30], "little") + 1
+    return None
+
+
+def jpeg_size(f: IO[bytes]) -> Optional[Tuple[int, int]]:
+    """Walk the segments after SOI up to the first SOF; `f` is positioned anywhere."""
+    f.seek(2)
+    while True:
+        b = f.read(2)
+        if len(b) < 2 or b[0] != 0xFF:
+            return None
+        marker = b[1]
+        while marker == 0xFF:  # fill bytes
+            b = f.read(1)
+            if not b:
+                return None
+            marker = b[0]
+        if marker in JPEG_STANDALONE:
+            continue
+        if marker in JPEG_SOF:
+            seg = f.read(7)  # length, precision, height, width
+            if len(seg) < 7:
+                return None
+            h, w = struct.unpack(">HH", seg[3:7])
+            return w, h
+        if marker in (0xD9, 0xDA):  # EOI / SOS before any frame header
+            return None
+        seg = f.read(2)
+        if len(seg) < 2:
+            return None
+        f.seek(struct.unpack(">H", seg)[0] - 2, os.SEEK_CUR)
+
+
+def _svg_length(value: Optional[str]) -> Optional[float]:
+    # Only unitless and px lengths; %, em, mm, ... depend on the page.
+    m = SVG_LENGTH_RE.fullmatch(value) if value is not None else None
+    return float(m.group(1)) if m else None
+
+
+def svg_size(head: bytes) -> Optional[Tuple[int, int]]:
+    m = SVG_TAG_RE.search(head)
+    if m is None:
+        return None
+    attrs = {
+        k.decode("ascii", "replace").lower(): (v1 if v1 is not None else v2).decode("utf-8", "replace")
+        for k, v1, v2 in SVG_ATTR_RE.findall(m.group(0))
+    }
+    w, h = _svg_length(attrs.get("width")), _svg_length(attrs.get("height"))
+    box = (attrs.get("viewbox") or "").replace(",", " ").split()
+    if len(box) == 4:
+        try:
+            bw, bh = float(box[2]), float(box[3])
+        except ValueError:
+            bw = bh = 0.0
+        if bw > 0 and bh > 0:
+            # A missing (or relative) width/height follows the viewBox aspect ratio.
+            if w is None:
+                w = bw if h is None else h * bw / bh
+            if h is None:
+                h = w * bh / bw
+    if not w or not h:
+        return None
+    return round(w), round(h)
+
+
+def image_size(path: pathlib.Path) -> Optional[Tuple[int, int]]:
+    """(width, height) from the header, or None for an unknown or damaged format."""
+    with path.open("rb") as f:
+        head = f.read(32)
+        if head[:2] == b"\xff\xd8":
+            return jpeg_size(f)
+        for read in (png_size, gif_size, webp_size):
+            size = read(head)
+            if size is not None:
+                return size
+        if path.suffix.lower() == ".svg":
+            f.seek(0)
+            return svg_size(f.read(SVG_HEAD_BYTES))
+    return None
+
+
+def static_path(url: str) -> Optional[pathlib.Path]:
+    """The file under static/ a site-absolute URL is served from."""
+    parts = urlsplit(url)
+    if parts.scheme or parts.netloc or not parts.path.startswith("/"):
+        return None
+    path = (STATIC_DIR / unquote(parts.path).lstrip("/")).resolve()
+    try:
+        path.relative_to(STATIC_DIR)
+    except ValueError:
+        return None
+    return path
+
+
+def iter_image_refs(markdown: str) -> Iterator[ImageRef]:
+    # Blank out fenced code (keeping line structure), as prerender_math.py does.
+    prose = "".join("\n" if ln.kind in (FENCE, CODE) else ln.text + ln.eol for ln in tokenize_text(markdown))
+    for m in IMG_RE.finditer(prose):
+        url = m.group("url")
+        if url == PLACEHOLDER:
+            continue
+        path = static_path(url)
+        if path is None:
+            continue
+        suffix = path.suffix.lower()
+        if suffix == ".mov":
+            # render.js swaps the extension for the fallback, keeping any query.
+            yield ImageRef(re.sub(r"\.mov(\?.*)?$", r".gif\1", url, flags=re.IGNORECASE), path.with_suffix(".gif"))
+        elif suffix not in VIDEO_SUFFIXES:
+            yield ImageRef(url, path)
+
+
+def load_cache(path: pathlib.Path) -> Dict[str, dict]:
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    if data.get("version") != CACHE_VERSION:
+        return {}
+    return data.get("entries", {})
+
+
+def write_text(path: pathlib.Path, text: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def main(argv: List[str]) -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument(
+        "--output",
+        type=pathlib.Path,
+        default=DEFAULT_MANIFEST,
+        help=f"Manifest path (default: {DEFAULT_MANIFEST.relative_to(REPO_ROOT)})",
+    )
+    ap.add_argument(
+        "--cache-dir",
+        type=pathlib.Path,
+        default=DEFAULT_CACHE_DIR,
+        help=f"Size cache (default: {DEFAULT_CACHE_DIR.relative_to(REPO_ROOT)})",
+    )
+    ap.add_argument("--check", action="store_true", help="Don't write; exit 1 if the manifest is out of date")
+    args = ap.parse_args(argv)
+
+    refs: Dict[str, ImageRef] = {}
+    for post in load_posts():
+        for ref in iter_image_refs(post.body):
+            refs.setdefault(ref.url, ref)
+
+    cache_path = args.cache_dir / "cache.json"
+    cache = load_cache(cache_path)
+    fresh: Dict[str, dict] = {}
+    images: Dict[str, List[int]] = {}
+    read = 0
+    for url, ref in sorted(refs.items()):
+        key = ref.path.relative_to(REPO_ROOT).as_posix()
+        try:
+            st = ref.path.stat()
+        except FileNotFoundError:
+            print(f"  missing: {url} ({key})", file=sys.stderr)
+            continue
+        entry = cache.get(key)
+        if entry is None or entry["mtime_ns"] != st.st_mtime_ns or entry["size"] != st.st_size:
+            size = image_size(ref.path)
+            entry = {"mtime_ns": st.st_mtime_ns, "size": st.st_size, "dims": list(size) if size else None}
+            read += 1
+        fresh[key] = entry
+        if entry["dims"] is None:
+            print(f"  no size in header: {url} ({key})", file=sys.stderr)
+            continue
+        images[url] = entry["dims"]
+
+    if fresh != cache:
+        write_text(cache_path, json.dumps({"version": CACHE_VERSION, "entries": fresh}, sort_keys=True) + "\n")
+
+    text = json.dumps({"version": MANIFEST_VERSION, "images": images}, indent=1, sort_keys=True) + "\n"
+    try:
+        current: Optional[str] = args.output.read_text(encoding="utf-8")
+    except FileNotFoundError:
+        current = None
+
+    print(f"images: {len(refs)} referenced, {len(images)} sized, {read} read, {len(fresh) - read} from cache")
+    if current == text:
+        print(f"{args.output}: up to date")
+        return 0
+    if args.check:
+        print(f"{args.output}: out of date; run scripts/image_dims.py", file=sys.stderr)
+        return 1
+    write_text(args.output, text)
+    print(f"{args.output}: written")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+Import a Notion markdown export (.zip) straight into the site, without unpacking it.
+
+Every markdown entry of the export is streamed out of the archive with `zipfile`
+and through the same transforms as the rest of the content scripts, in one pass:
+
+  - strip_image_paths_and_check_md.StripImagePaths: KaTeX-unfriendly Unicode
+    (UNICODE_NORMALIZE_MAP) is normalized and each line is linted; images that
+    point at a file in the export ("Page%20abc123/image.png", relative to the
+    page) are copied into static/assets/figures/ under their content hash and
+    rewritten to /assets/figures/<hash>.<ext>; inline base64 images are decoded
+    there too; images that can't be found get the placeholder;
+  - figure_captions_to_image_titles.CaptionsToTitles;
+  - external_links_to_references.ExternalLinksToFootnotes (corpus registry);
+  - replace_math.ITagsToMath with --math.
+
+Pages are written to --out-dir as <slug>.md, the slug being the page title
+without Notion's id ("RL Excursions 1a2b...f.md" -> rl_excursions.md). Existing
+files are left alone unless --force. Only images a page references are copied.
+
+Pages are imported in worker processes (--jobs), each of which opens the
+archive itself. Memory stays bounded: an entry is read in chunks, base64 runs
+are spooled to disk (md_stream.iter_bounded_lines), images are copied in
+chunks, and output goes through atomic_output. Large exports that Notion splits
+into nested "...-Part-N.zip" archives are handled; those inner archives are
+copied to a temporary directory first, since zipfile needs to seek.
+
+Usage:
+  python scripts/import_notion.py ~/Downloads/Export-1234.zip
+  python scripts/import_notion.py export.zip --out-dir src/projects --math --jobs 4
+  python scripts/import_notion.py export.zip --list      # show pages and target files
+"""
+
+from __future__ import annotations
+
+import argparse
+import functools
+import io
+import os
+import pathlib
+import posixpath
+import re
+import shutil
+import sys
+import tempfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import unquote
+
+from external_links_to_references import ExternalLinksToFootnotes
+from figure_captions_to_image_titles import CaptionsToTitles
+from footnote_registry import DEFAULT_REGISTRY, REPO_ROOT, FootnoteRegistry
+from md_stream import RunSpool, Transform, atomic_output, iter_bounded_lines, run, tokenize
+from strip_image_paths_and_check_md import (
+    DATA_URI_EXT,
+    FIGURES_DIR,
+    FIGURES_URL,
+    PLACEHOLDER,
+    ImageExtractor,
+    Issue,
+    StripImagePaths,
+)
+
+# replace_math.py lives at the repo root.
+sys.path.insert(0, str(REPO_ROOT))
+from replace_math import ITagsToMath  # noqa: E402
+
+DEFAULT_OUT_DIR = REPO_ROOT / "src" / "maintext"
+# Notion appends the page id to every exported file and folder name.
+NOTION_ID_RE = re.compile(r"\s+[0-9a-f]{32}$", re.IGNORECASE)
+# URLs that are left as they are: absolute paths, http(s), other schemes.
+EXTERNAL_URL_RE = re.compile(r"^(?:/|[a-z][a-z0-9+.-]*:)", re.IGNORECASE)
+SKIP_PREFIXES = ("__MACOSX/",)
+
+
+@dataclass(frozen=True)
+class Page:
+    archive: pathlib.Path  # the export, or a nested part copied to a temp dir
+    entry: str  # member name inside `archive`
+    out_path: pathlib.Path
+
+
+@dataclass
+class PageResult:
+    page: Page
+    written: bool
+    images_copied: int = 0
+    images_extracted: int = 0
+    images_missing: List[str] = field(default_factory=list)
+    new_footnotes: int = 0
+    issues: List[Issue] = field(default_factory=list)
+    files_written: int = 0
+    duplicates: int = 0
+    bytes_written: int = 0
+
+
+def page_slug(entry: str) -> str:
+    """'Posts abc/RL Excursions 1a2b...9f.md' -> 'rl_excursions'."""
+    stem = NOTION_ID_RE.sub("", posixpath.splitext(posixpath.basename(entry))[0])
+    slug = re.sub(r"[^a-z0-9]+", "_", stem.lower()).strip("_")
+    return slug or "page"
+
+
+def image_ext(name: str) -> str:
+    ext = posixpath.splitext(name)[1].lstrip(".").lower()
+    return DATA_URI_EXT.get(ext, ext or "bin")
+
+
+def iter_markdown_entries(
+    archive: pathlib.Path, tmp_dir: pathlib.Path
+) -> Iterator[Tuple[pathlib.Path, str]]:
+    """(archive, entry) for every markdown page, descending into nested export parts."""
+    with zipfile.ZipFile(archive) as zf:
+        for info in zf.infolist():
+            name = info.filename
+            if info.is_dir() or name.startswith(SKIP_PREFIXES):
+                continue
+            lower = name.lower()
+            if lower.endswith(".md"):
+                yield archive, name
+            elif lower.endswith(".zip"):
+                fd, part = tempfile.mkstemp(suffix=".zip", dir=tmp_dir)
+                with os.fdopen(fd, "wb") as out, zf.open(info) as src:
+                    shutil.copyfileobj(src, out)
+                yield from iter_markdown_entries(pathlib.Path(part), tmp_dir)
+
+
+def plan_pages(entries: List[Tuple[pathlib.Path, str]], out_dir: pathlib.Path) -> List[Page]:
+    """Assign each entry its output file; pages with the same title get their Notion id appended."""
+    pages: List[Page] = []
+    taken: Dict[str, int] = {}
+    for archive, entry in entries:
+        slug = page_slug(entry)
+        n = taken.get(slug, 0)
+        taken[slug] = n + 1
+        if n:
+            m = NOTION_ID_RE.search(posixpath.splitext(posixpath.basename(entry))[0])
+            slug = f"{slug}_{m.group(0).strip()[:8].lower()}" if m else f"{slug}_{n + 1}"
+        pages.append(Page(archive, entry, out_dir / f"{slug}.md"))
+    return pages
+
+
+def import_page(
+    page: Page,
+    figures_dir: pathlib.Path,
+    figures_url: str,
+    registry: Optional[FootnoteRegistry],
+    math: bool,
+    force: bool,
+) -> PageResult:
+    """Import one page; module-level so it can run in a worker process."""
+    if page.out_path.exists() and not force:
+        return PageResult(page, written=False)
+
+    res = PageResult(page, written=True)
+    base = posixpath.dirname(page.entry)
+    copied: Dict[str, str] = {}
+    with zipfile.ZipFile(page.archive) as zf, RunSpool() as spool:
+        extractor = ImageExtractor(figures_dir, figures_url, spool)
+
+        def resolve(url: str) -> Optional[str]:
+            if EXTERNAL_URL_RE.match(url):
+                return url
+            path = posixpath.normpath(posixpath.join(base, unquote(url)))
+            if path not in copied:
+                try:
+                    with zf.open(path) as f:
+                        copied[path] = extractor.copy(f, image_ext(path))
+                except KeyError:
+                    res.images_missing.append(url)
+                    return None
+            res.images_copied += 1
+            return copied[path]
+
+        strip = StripImagePaths(placeholder=PLACEHOLDER, lint=True, extractor=extractor, resolve=resolve)
+        footnotes = ExternalLinksToFootnotes(registry=registry)
+        transforms: List[Transform] = [strip, CaptionsToTitles(), footnotes]
+        if math:
+            transforms.append(ITagsToMath())
+
+        page.out_path.parent.mkdir(parents=True, exist_ok=True)
+        with zf.open(page.entry) as raw, io.TextIOWrapper(raw, encoding="utf-8-sig") as f:
+            with atomic_output(page.out_path) as out:
+                for ln in run(tokenize(iter_bounded_lines(f, spool)), transforms):
+                    spool.write_expanded(ln.text + ln.eol, out)
+
+    res.images_extracted = strip.extracted
+    res.new_footnotes = len(footnotes.new_footnotes)
+    res.issues = strip.issues
+    res.files_written = extractor.files_written
+    res.duplicates = extractor.duplicates
+    res.bytes_written = extractor.bytes_written
+    return res
+
+
+def display(path: pathlib.Path) -> str:
+    try:
+        return str(path.resolve().relative_to(REPO_ROOT))
+    except ValueError:
+        return str(path)
+
+
+def main(argv: List[str]) -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("export", type=pathlib.Path, help="Notion export (.zip)")
+    ap.add_argument(
+        "--out-dir",
+        type=pathlib.Path,
+        default=DEFAULT_OUT_DIR,
+        help=f"Where pages are written (default: {DEFAULT_OUT_DIR.relative_to(REPO_ROOT)})",
+    )
+    ap.add_argument(
+        "--figures-dir",
+        type=pathlib.Path,
+        default=FIGURES_DIR,
+        help=f"Where images are copied (default: {FIGURES_DIR.relative_to(REPO_ROOT)})",
+    )
+    ap.add_argument(
+        "--figures-url",
+        type=str,
+        default=FIGURES_URL,
+        help=f"URL prefix for copied images (default: {FIGURES_URL})",
+    )
+    ap.add_argument("--math", action="store_true", help="Also convert <i>...</i> to $...$")
+    ap.add_argument(
+        "--registry",
+        type=pathlib.Path,
+        default=DEFAULT_REGISTRY,
+        help=f"Corpus-wide URL -> footnote id registry (default: {DEFAULT_REGISTRY.relative_to(REPO_ROOT)})",
+    )
+    ap.add_argument("--no-registry", action="store_true", help="Pick footnote ids per page")
+    ap.add_argument("--force", action="store_true", help="Overwrite pages that already exist in --out-dir")
+    ap.add_argument(
+        "--jobs",
+        type=int,
+        default=0,
+        help="Import pages in N worker processes (0 = one per CPU; default: 0)",
+    )
+    ap.add_argument("--list", action="store_true", help="List the pages and their target files; write nothing")
+    args = ap.parse_args(argv)
+
+    if not zipfile.is_zipfile(args.export):
+        print(f"ERROR: not a zip archive: {args.export}", file=sys.stderr)
+        return 2
+
+    with tempfile.TemporaryDirectory(prefix="notion-") as tmp:
+        pages = plan_pages(list(iter_markdown_entries(args.export, pathlib.Path(tmp))), args.out_dir)
+        if not pages:
+            print(f"ERROR: no markdown pages in {args.export}", file=sys.stderr)
+            return 2
+        if args.list:
+            for page in pages:
+                exists = " (exists)" if page.out_path.exists() else ""
+                print(f"{page.entry} -> {display(page.out_path)}{exists}")
+            return 0
+
+        registry = None if args.no_registry else FootnoteRegistry(args.registry)
+        worker = functools.partial(
+            import_page,
+            figures_dir=args.figures_dir,
+            figures_url=args.figures_url,
+            registry=registry,
+            math=args.math,
+            force=args.force,
+        )
+        jobs = args.jobs or os.cpu_count() or 1
+        if jobs > 1 and len(pages) > 1:
+            with ProcessPoolExecutor(max_workers=min(jobs, len(pages))) as ex:
+                # map() yields in submission order, so the report is in export order.
+                results = list(ex.map(worker, pages))
+        else:
+            results = [worker(p) for p in pages]
+
+    n_issues = 0
+    for r in results:
+        target = display(r.page.out_path)
+        if not r.written:
+            print(f"{r.page.entry}: {target} exists, skipped (--force to overwrite)")
+            continue
+        print(
+            f"{r.page.entry} -> {target}: images copied={r.images_copied} extracted={r.images_extracted} "
+            f"missing={len(r.images_missing)} new_footnotes={r.new_footnotes} issues={len(r.issues)}"
+        )
+        for url in r.images_missing:
+            print(f"  missing image (placeholder used): {url}")
+        for it in r.issues:
+            print(f"  {it.line}:{it.kind}:{it.excerpt}")
+        n_issues += len(r.issues)
+
+    done = [r for r in results if r.written]
+    print(
+        f"\n{len(done)} of {len(results)} pages imported; "
+        f"{sum(r.files_written for r in done)} new images ({sum(r.bytes_written for r in done)} bytes, "
+        f"{sum(r.duplicates for r in done)} already present) in {display(args.figures_dir)}"
+    )
+    # Like strip_image_paths_and_check_md.py: non-zero if the lint found issues.
+    return 1 if n_issues else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
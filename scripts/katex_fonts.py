@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+"""
+Work out which KaTeX font faces the posts' math actually uses, and drop the rest.
+
+KaTeX's CSS declares 20 faces (Main, Math, AMS, Caligraphic, Fraktur, Script,
+SansSerif, Typewriter, Size1-4, ...) in woff2, woff and ttf, and
+src/hooks.server.js preloads every font file the build emits, so a cold load
+fetches all of them. Our math uses a handful.
+
+Which face a glyph is drawn in is decided by KaTeX's CSS classes
+(`.mathnormal` -> KaTeX_Math italic, `.mathcal` -> KaTeX_Caligraphic,
+`.delimsizing.size2` -> KaTeX_Size2, ...), so instead of mapping TeX commands
+to fonts by hand this script replays the cascade: it parses
+node_modules/katex/dist/katex.css and walks the prerendered HTML of every math
+span (src/lib/generated/katex-manifest.json, see prerender_math.py), giving
+each text node the family/weight/style it inherits, resolved against the
+declared @font-face rules like a browser would. The MathML copy is skipped (it
+is visually hidden and uses the browser's math font).
+
+It writes src/lib/generated/katex-fonts.json ({"katex", "faces": {face: chars}});
+src/hooks.server.js reads it to preload only woff2 files of used faces. With
+--prune it also post-processes the build in docs/:
+
+  - in the built CSS, drops the @font-face rules of unused KaTeX faces and keeps
+    only the woff2 source of the others;
+  - drops <link rel="preload"> tags for those fonts from the built pages;
+  - deletes the KaTeX font files nothing references any more.
+
+Math rendered at runtime (expressions missing from the manifest) may need a face
+that was dropped and then falls back to the next font in the stack, so --prune
+refuses to run unless the manifest covers every math span in the posts (`npm
+run build` runs prerender_math.py first).
+
+Usage:
+  python scripts/katex_fonts.py                  # report + write the face list
+  python scripts/katex_fonts.py --prune          # after vite build; npm run build runs it (postbuild)
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import pathlib
+import re
+import sys
+from dataclasses import dataclass
+from html.parser import HTMLParser
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from asset_report import BUILD_DIR, human
+from build_content import DEFAULT_TARGETS, iter_sources
+from prerender_math import DEFAULT_MANIFEST as MATH_MANIFEST
+from prerender_math import REPO_ROOT, collect, katex_version, missing_spans, write_json
+
+KATEX_CSS = REPO_ROOT / "node_modules" / "katex" / "dist" / "katex.css"
+DEFAULT_OUTPUT = REPO_ROOT / "src" / "lib" / "generated" / "katex-fonts.json"
+FAMILY_PREFIX = "KaTeX_"
+
+COMMENT_RE = re.compile(r"/\*.*?\*/", re.S)
+DECL_RE = re.compile(r"(font-family|font-weight|font-style|font)\s*:\s*([^;]+)")
+FONT_FACE_RE = re.compile(r"@font-face\s*\{[^}]*\}")
+SRC_ITEM_RE = re.compile(r"url\((?P<url>[^)]*)\)\s*(?:format\((?P<format>[^)]*)\))?")
+PRELOAD_RE = re.compile(r'[ \t]*<link\b[^>]*\brel="preload"[^>]*\bas="font"[^>]*>\n?')
+HREF_RE = re.compile(r'\bhref="([^"]+)"')
+FONT_FILE_RE = re.compile(r"^(?P<face>KaTeX_[A-Za-z0-9]+-[A-Za-z]+)\.[A-Za-z0-9_-]{8}\.(?:woff2|woff|ttf)$")
+COMPOUND_RE = re.compile(r"^(?P<tag>[a-z][a-z0-9]*)?(?P<classes>(?:\.[\w-]+)*)$")
+
+
+@dataclass(frozen=True)
+class Font:
+    family: str
+    weight: str = "normal"  # "normal" / "bold"
+    style: str = "normal"  # "normal" / "italic"
+
+    @property
+    def face(self) -> str:
+        """File-name style face id, e.g. KaTeX_Main-BoldItalic."""
+        variant = ("Bold" if self.weight == "bold" else "") + ("Italic" if self.style == "italic" else "")
+        return f"{self.family}-{variant or 'Regular'}"
+
+
+def norm_weight(v: str) -> str:
+    v = v.strip().lower()
+    return "bold" if v in ("bold", "bolder") or (v.isdigit() and int(v) >= 600) else "normal"
+
+
+def norm_family(v: str) -> str:
+    return v.split(",")[0].strip().strip("\"'")
+
+
+@dataclass
+class Rule:
+    # Each selector: compounds from outermost to innermost, with the combinator
+    # (" " or ">") that precedes each compound.
+    selectors: List[List[Tuple[str, Optional[str], Set[str]]]]
+    decls: Dict[str, str]
+    order: int
+
+
+def parse_selector(sel: str) -> Optional[List[Tuple[str, Optional[str], Set[str]]]]:
+    out: List[Tuple[str, Optional[str], Set[str]]] = []
+    comb = " "
+    for tok in sel.replace(">", " > ").split():
+        if tok == ">":
+            comb = ">"
+            continue
+        m = COMPOUND_RE.match(tok)
+        if m is None:
+            return None  # pseudo-classes, attributes, ...: not needed for fonts
+        out.append((comb, m.group("tag"), set(m.group("classes").split(".")[1:])))
+        comb = " "
+    return out or None
+
+
+def parse_font_rules(css: str) -> Tuple[List[Rule], Dict[str, List[Font]]]:
+    """Style rules that set a font property, and the declared faces per KaTeX family."""
+    css = COMMENT_RE.sub("", css)
+    faces: Dict[str, List[Font]] = {}
+    for m in FONT_FACE_RE.finditer(css):
+        decls = dict(DECL_RE.findall(m.group(0)))
+        font = Font(
+            norm_family(decls.get("font-family", "")),
+            norm_weight(decls.get("font-weight", "normal")),
+            decls.get("font-style", "normal").strip(),
+        )
+        faces.setdefault(font.family, []).append(font)
+    css = FONT_FACE_RE.sub("", css)
+
+    rules: List[Rule] = []
+    for i, m in enumerate(re.finditer(r"([^{}@]+)\{([^{}]*)\}", css)):
+        decls: Dict[str, str] = {}
+        for prop, value in DECL_RE.findall(m.group(2)):
+            value = value.strip()
+            if prop == "font":
+                # Shorthand: [style] [weight] size[/line-height] family[, ...]
+                parts = re.split(r"\s+", value.split(",")[0])
+                size_at = next((j for j, p in enumerate(parts) if re.match(r"^[\d.]", p)), len(parts) - 2)
+                decls["font-family"] = norm_family(" ".join(parts[size_at + 1 :]))
+                decls["font-style"] = "italic" if "italic" in parts[:size_at] else "normal"
+                decls["font-weight"] = "bold" if "bold" in parts[:size_at] else "normal"
+            else:
+                decls[prop] = value
+        if not decls:
+            continue
+        selectors = [s for s in (parse_selector(s) for s in m.group(1).split(",")) if s]
+        if selectors:
+            rules.append(Rule(selectors, decls, i))
+    return rules, faces
+
+
+def resolve(font: Font, declared: Dict[str, List[Font]]) -> Optional[Font]:
+    """The declared face a browser picks for `font` (style first, then nearest weight)."""
+    candidates = declared.get(font.family)
+    if not candidates:
+        return None
+    same_style = [f for f in candidates if f.style == font.style] or candidates
+    same_weight = [f for f in same_style if f.weight == font.weight] or same_style
+    return same_weight[0]
+
+
+class FaceCollector(HTMLParser):
+    """Walks KaTeX HTML and records the characters drawn in each face."""
+
+    VOID = {"img", "br", "hr", "wbr", "input", "meta", "link"}
+
+    def __init__(self, rules: List[Rule], declared: Dict[str, List[Font]]) -> None:
+        super().__init__(convert_charrefs=True)
+        self.rules = rules
+        self.declared = declared
+        # (tag, classes, font, hidden)
+        self.stack: List[Tuple[str, Set[str], Font, bool]] = []
+        self.chars: Dict[str, Set[str]] = {}
+
+    def _matches(self, selector: List[Tuple[str, Optional[str], Set[str]]], tag: str, classes: Set[str]) -> bool:
+        chain = [(e[0], e[1]) for e in self.stack] + [(tag, classes)]
+
+        def fits(compound: Tuple[str, Optional[str], Set[str]], el: Tuple[str, Set[str]]) -> bool:
+            return (compound[1] is None or compound[1] == el[0]) and compound[2] <= el[1]
+
+        def match(si: int, ei: int) -> bool:
+            # selector[si] must match chain[ei]; then walk outwards.
+            if not fits(selector[si], chain[ei]):
+                return False
+            if si == 0:
+                return True
+            if selector[si][0] == ">":
+                return ei > 0 and match(si - 1, ei - 1)
+            return any(match(si - 1, j) for j in range(ei - 1, -1, -1))
+
+        return match(len(selector) - 1, len(chain) - 1)
+
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
+        classes = set((dict(attrs).get("class") or "").split())
+        parent_font = self.stack[-1][2] if self.stack else Font("")
+        hidden = (self.stack[-1][3] if self.stack else False) or "katex-mathml" in classes
+        decls: Dict[str, str] = {}
+        matched = []
+        for rule in self.rules:
+            for sel in rule.selectors:
+                if self._matches(sel, tag, classes):
+                    specificity = sum(len(c[2]) * 10 + (c[1] is not None) for c in sel)
+                    matched.append((specificity, rule.order, rule.decls))
+                    break
+        for _, _, d in sorted(matched, key=lambda t: (t[0], t[1])):
+            decls.update(d)
+        font = Font(
+            norm_family(decls.get("font-family", parent_font.family)),
+            norm_weight(decls["font-weight"]) if "font-weight" in decls else parent_font.weight,
+            decls.get("font-style", parent_font.style).strip(),
+        )
+        if tag in self.VOID:
+            return
+        self.stack.append((tag, classes, font, hidden))
+
+    def handle_startendtag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
+        pass  # <path .../> etc. carry no text
+
+    def handle_endtag(self, tag: str) -> None:
+        for i in range(len(self.stack) - 1, -1, -1):
+            if self.stack[i][0] == tag:
+                del self.stack[i:]
+                return
+
+    def handle_data(self, data: str) -> None:
+        if not self.stack or self.stack[-1][3]:
+            return
+        text = "".join(ch for ch in data if not ch.isspace())
+        if not text:
+            return
+        face = resolve(self.stack[-1][2], self.declared)
+        if face is not None and face.family.startswith(FAMILY_PREFIX):
+            self.chars.setdefault(face.face, set()).update(text)
+
+
+def used_faces(html: Iterable[str], css: str) -> Dict[str, str]:
+    """Face id -> the characters drawn in it (sorted), over all rendered spans."""
+    rules, declared = parse_font_rules(css)
+    collector = FaceCollector(rules, declared)
+    for h in html:
+        collector.feed(h)
+        collector.close()
+        collector.stack.clear()
+        collector.reset()
+    return {face: "".join(sorted(chars)) for face, chars in sorted(collector.chars.items())}
+
+
+def rewrite_css(css: str, keep: Set[str]) -> Tuple[str, int]:
+    """Drop unused KaTeX @font-face rules and non-woff2 sources; returns (css, rules dropped)."""
+    dropped = 0
+
+    def sub(m: re.Match) -> str:
+        nonlocal dropped
+        block = m.group(0)
+        decls = dict(DECL_RE.findall(block))
+        family = norm_family(decls.get("font-family", ""))
+        if not family.startswith(FAMILY_PREFIX):
+            return block
+        face = Font(family, norm_weight(decls.get("font-weight", "normal")), decls.get("font-style", "normal").strip())
+        if face.face not in keep:
+            dropped += 1
+            return ""
+        woff2 = [s for s in SRC_ITEM_RE.finditer(block) if "woff2" in (s.group("format") or s.group("url"))]
+        if not woff2:
+            return block
+        return re.sub(r"src\s*:[^;}]*", lambda _: "src:" + woff2[0].group(0), block, count=1)
+
+    return FONT_FACE_RE.sub(sub, css), dropped
+
+
+def prune_build(build_dir: pathlib.Path, keep: Set[str]) -> Tuple[int, int, int, int]:
+    """Rewrite CSS and pages under build_dir; returns (rules, preloads, files, bytes) removed."""
+    immutable = build_dir / "_app" / "immutable"
+    rules = preloads = files = freed = 0
+    for css_path in sorted((immutable / "assets").glob("*.css")):
+        css = css_path.read_text(encoding="utf-8")
+        new, n = rewrite_css(css, keep)
+        if new != css:
+            css_path.write_text(new, encoding="utf-8")
+            rules += n
+
+    def drop_link(m: re.Match) -> str:
+        nonlocal preloads
+        href = HREF_RE.search(m.group(0))
+        name = href.group(1).rsplit("/", 1)[-1] if href else ""
+        fm = FONT_FILE_RE.match(name)
+        if fm and (fm.group("face") not in keep or not name.endswith(".woff2")):
+            preloads += 1
+            return ""
+        return m.group(0)
+
+    for page in sorted(build_dir.rglob("*.html")):
+        html = page.read_text(encoding="utf-8")
+        new = PRELOAD_RE.sub(drop_link, html)
+        if new != html:
+            page.write_text(new, encoding="utf-8")
+
+    referenced = "".join(
+        p.read_text(encoding="utf-8", errors="replace")
+        for p in build_dir.rglob("*")
+        if p.is_file() and p.suffix in (".css", ".js", ".html")
+    )
+    for font in sorted((immutable / "assets").glob(f"{FAMILY_PREFIX}*")):
+        if FONT_FILE_RE.match(font.name) and font.name not in referenced:
+            freed += font.stat().st_size
+            files += 1
+            font.unlink()
+            font.with_name(font.name + ".gz").unlink(missing_ok=True)
+    return rules, preloads, files, freed
+
+
+def main(argv: List[str]) -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument(
+        "--output",
+        type=pathlib.Path,
+        default=DEFAULT_OUTPUT,
+        help=f"Face list (default: {DEFAULT_OUTPUT.relative_to(REPO_ROOT)})",
+    )
+    ap.add_argument("--build-dir", type=pathlib.Path, default=BUILD_DIR, help="Build output (default: docs)")
+    ap.add_argument("--prune", action="store_true", help="Strip unused faces and non-woff2 files from the build")
+    args = ap.parse_args(argv)
+
+    version = katex_version()
+    if version is None or not KATEX_CSS.exists():
+        print("ERROR: node_modules/katex not found (run `npm install`)", file=sys.stderr)
+        return 2
+    try:
+        manifest = json.loads(MATH_MANIFEST.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        print(f"ERROR: not found: {MATH_MANIFEST} (run scripts/prerender_math.py)", file=sys.stderr)
+        return 2
+    if manifest.get("katex") != version:
+        print(f"ERROR: {MATH_MANIFEST.name} is for KaTeX {manifest.get('katex')}, not {version}", file=sys.stderr)
+        return 2
+    if args.prune:
+        spans, _ = collect(iter_sources([REPO_ROOT / t for t in DEFAULT_TARGETS]))
+        missing = missing_spans(manifest, spans, version)
+        if missing:
+            print(
+                f"ERROR: {MATH_MANIFEST.name} is missing {len(missing)} math spans of the posts, whose faces "
+                "would be pruned (run scripts/prerender_math.py)",
+                file=sys.stderr,
+            )
+            return 2
+
+    html = list(manifest["display"].values()) + list(manifest["inline"].values())
+    faces = used_faces(html, KATEX_CSS.read_text(encoding="utf-8"))
+    _, declared = parse_font_rules(KATEX_CSS.read_text(encoding="utf-8"))
+    n_declared = sum(len(v) for k, v in declared.items() if k.startswith(FAMILY_PREFIX))
+    print(f"{len(html)} math spans use {len(faces)} of {n_declared} KaTeX faces:")
+    for face, chars in faces.items():
+        print(f"  {face}: {len(chars)} glyphs")
+    write_json(args.output, {"katex": version, "faces": faces}, indent=1)
+
+    if args.prune:
+        immutable = args.build_dir / "_app" / "immutable"
+        if not immutable.is_dir():
+            print(f"ERROR: not found: {immutable} (run `npm run build`)", file=sys.stderr)
+            return 2
+        rules, preloads, files, freed = prune_build(args.build_dir, set(faces))
+        print(
+            f"{args.build_dir}: dropped {rules} @font-face rules and {preloads} font preloads, "
+            f"deleted {files} font files ({human(freed)})"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
@@ -0,0 +1,22 @@
+// Long-lived KaTeX renderer for scripts/prerender_math.py.
+//
+// Reads one JSON request per line on stdin: {"tex": "...", "display": true|false}
+// and answers each with one JSON line on stdout: {"html": "..."} or {"error": "..."}.
+// Options match renderMath() in src/lib/components/Markdown.svelte.
+import readline from "node:readline";
+import katex from "katex";
+
+const rl = readline.createInterface({ input: process.stdin, crlfDelay: Infinity });
+
+process.stdout.write(JSON.stringify({ ready: true, version: katex.version }) + "\n");
+
+rl.on("line", (line) => {
+  let reply;
+  try {
+    const { tex, display } = JSON.parse(line);
+    reply = { html: katex.renderToString(tex, { throwOnError: false, displayMode: !!display }) };
+  } catch (err) {
+    reply = { error: String(err && err.message ? err.message : err) };
+  }
+  process.stdout.write(JSON.stringify(reply) + "\n");
+});
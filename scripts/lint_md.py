@@ -0,0 +1,394 @@
+#!/usr/bin/env python3
+"""
+Lint the posts' markdown with machine-readable output and an incremental mode.
+
+Runs the per-line rules registered in strip_image_paths_and_check_md.py
+(`LINT_RULES`) over the markdown as written, so `katex_unicode_whitespace` also
+reports characters the strip stage would silently fix.
+
+  --format text|json|sarif   human report (path:line:rule:excerpt), a JSON document,
+                             or SARIF 2.1.0 for code-scanning tools
+  --rules / --disable        comma-separated rule ids (see --list-rules)
+
+Every rule looks at one line only, so only changed lines ever need re-linting:
+
+  --incremental   keeps a per-file issue index in .cache/lint/index.json (size,
+                  mtime, one short hash per line, the issues found). A file whose
+                  size/mtime match is not read at all; otherwise its line hashes
+                  are diffed against the index, only inserted/replaced lines are
+                  linted, and issues on untouched lines are carried over with
+                  their new line numbers.
+  --since REF     lints only the lines git reports as added or changed since REF
+                  (`git diff -U0`), plus untracked files, and reports just those;
+                  this is the pre-commit mode and never touches the index.
+
+The index always holds the issues of every rule, so changing --rules does not
+invalidate it; editing the rules (or this script) does.
+
+Usage:
+  python scripts/lint_md.py                                # src/maintext + src/projects
+  python scripts/lint_md.py --incremental --format sarif > lint.sarif
+  python scripts/lint_md.py --since HEAD --disable katex_unicode_whitespace
+"""
+
+from __future__ import annotations
+
+import argparse
+import difflib
+import hashlib
+import json
+import os
+import pathlib
+import re
+import subprocess
+import sys
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import strip_image_paths_and_check_md as checks
+from build_content import DEFAULT_TARGETS, REPO_ROOT, iter_sources
+from profiling import add_profile_arg, profiling, span
+from strip_image_paths_and_check_md import LINT_RULES, Issue, line_issues, select_rules
+
+DEFAULT_INDEX = REPO_ROOT / ".cache" / "lint" / "index.json"
+INDEX_VERSION = 1
+FORMATS = ("text", "json", "sarif")
+SARIF_SCHEMA = "https://json.schemastore.org/sarif-2.1.0.json"
+
+HUNK_RE = re.compile(r"^@@ -\d+(?:,\d+)? \+(?P<start>\d+)(?:,(?P<count>\d+))? @@")
+
+
+def rules_version() -> str:
+    """Hash of the rule implementations and this script; a change drops the index."""
+    h = hashlib.sha256()
+    for path in (pathlib.Path(checks.__file__), pathlib.Path(__file__)):
+        h.update(path.read_bytes())
+    return h.hexdigest()[:16]
+
+
+def display_path(path: pathlib.Path) -> str:
+    try:
+        return path.resolve().relative_to(REPO_ROOT).as_posix()
+    except ValueError:
+        return str(path)
+
+
+def read_lines(path: pathlib.Path) -> List[str]:
+    with span("read", path=str(path)) as sp:
+        text = path.read_text(encoding="utf-8")
+        sp.bytes = len(text)
+    lines = text.split("\n")
+    if lines and lines[-1] == "":
+        lines.pop()
+    return lines
+
+
+def line_hash(line: str) -> str:
+    return hashlib.blake2b(line.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def lint_lines(lines: Sequence[str], numbers: Iterable[int]) -> List[Issue]:
+    """Issues (all rules) for the given 1-based line numbers."""
+    issues: List[Issue] = []
+    with span("lint") as sp:
+        for n in numbers:
+            if 1 <= n <= len(lines):
+                sp.bytes += len(lines[n - 1]) + 1
+                issues.extend(line_issues(n, lines[n - 1]))
+    return issues
+
+
+@dataclass
+class Stats:
+    files: int = 0
+    files_skipped: int = 0
+    lines: int = 0
+    lines_linted: int = 0
+
+
+@dataclass
+class FileReport:
+    path: str
+    issues: List[Issue] = field(default_factory=list)
+
+
+class IssueIndex:
+    """Per-file cache of line hashes and issues, keyed by repo-relative path."""
+
+    def __init__(self, path: pathlib.Path) -> None:
+        self.path = path
+        self.version = rules_version()
+        self.files: Dict[str, dict] = {}
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return
+        if data.get("version") == INDEX_VERSION and data.get("rules") == self.version:
+            self.files = data.get("files", {})
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(
+            json.dumps({"version": INDEX_VERSION, "rules": self.version, "files": self.files}, sort_keys=True),
+            encoding="utf-8",
+        )
+        os.replace(tmp, self.path)
+
+    def lint(self, path: pathlib.Path, key: str, stats: Stats) -> List[Issue]:
+        st = path.stat()
+        entry = self.files.get(key)
+        if entry is not None and entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns:
+            stats.files_skipped += 1
+            stats.lines += len(entry["hashes"])
+            return [Issue(*it) for it in entry["issues"]]
+
+        lines = read_lines(path)
+        hashes = [line_hash(ln) for ln in lines]
+        stats.lines += len(lines)
+        if entry is None:
+            relint: Sequence[int] = range(1, len(lines) + 1)
+            carried: List[Issue] = []
+        else:
+            relint, carried = self._diff(entry, hashes)
+        fresh = lint_lines(lines, relint)
+        stats.lines_linted += len(relint)
+        issues = sorted(carried + fresh, key=lambda it: it.line)
+        self.files[key] = {
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "hashes": hashes,
+            "issues": [[it.line, it.kind, it.excerpt] for it in issues],
+        }
+        return issues
+
+    @staticmethod
+    def _diff(entry: dict, hashes: List[str]) -> Tuple[List[int], List[Issue]]:
+        """(new line numbers to re-lint, cached issues moved to their new line numbers)."""
+        old: List[str] = entry["hashes"]
+        # Trim the common head and tail first: an edit usually touches one region,
+        # and SequenceMatcher is much slower than a plain scan on long runs.
+        head = 0
+        limit = min(len(old), len(hashes))
+        while head < limit and old[head] == hashes[head]:
+            head += 1
+        tail = 0
+        while tail < limit - head and old[-1 - tail] == hashes[-1 - tail]:
+            tail += 1
+
+        moved: Dict[int, int] = {}  # old line -> new line (both 1-based)
+        for i in range(head):
+            moved[i + 1] = i + 1
+        for k in range(1, tail + 1):
+            moved[len(old) - k + 1] = len(hashes) - k + 1
+
+        relint: List[int] = []
+        sm = difflib.SequenceMatcher(None, old[head : len(old) - tail], hashes[head : len(hashes) - tail], autojunk=False)
+        for tag, i1, i2, j1, j2 in sm.get_opcodes():
+            if tag == "equal":
+                for d in range(i2 - i1):
+                    moved[head + i1 + d + 1] = head + j1 + d + 1
+            else:
+                relint.extend(range(head + j1 + 1, head + j2 + 1))
+
+        carried = [
+            Issue(moved[line], kind, excerpt) for line, kind, excerpt in entry["issues"] if line in moved
+        ]
+        return relint, carried
+
+
+def git_changed_lines(ref: str, paths: Sequence[pathlib.Path]) -> Dict[pathlib.Path, Optional[Set[int]]]:
+    """
+    Lines added or changed since REF, per file (resolved path). Untracked files map
+    to None (every line is new). Files with only deletions are left out.
+    """
+
+    def git(*cmd: str) -> str:
+        return subprocess.run(
+            ["git", "-c", "core.quotepath=off", *cmd], cwd=REPO_ROOT, check=True, capture_output=True, text=True
+        ).stdout
+
+    rel = [display_path(p) for p in paths]
+    changed: Dict[pathlib.Path, Optional[Set[int]]] = {}
+    current: Optional[Set[int]] = None
+    for ln in git("diff", "-U0", "--no-color", "--no-ext-diff", ref, "--", *rel).splitlines():
+        if ln.startswith("+++ "):
+            name = ln[4:]
+            if name == "/dev/null":
+                current = None
+                continue
+            current = changed.setdefault((REPO_ROOT / name[2:]).resolve(), set())
+            continue
+        m = HUNK_RE.match(ln)
+        if m and current is not None:
+            start = int(m.group("start"))
+            count = 1 if m.group("count") is None else int(m.group("count"))
+            current.update(range(start, start + count))
+    for name in git("ls-files", "--others", "--exclude-standard", "--", *rel).splitlines():
+        if name:
+            changed[(REPO_ROOT / name).resolve()] = None
+    return {p: lines for p, lines in changed.items() if lines is None or lines}
+
+
+def sarif_report(reports: List[FileReport], rules: List[str]) -> dict:
+    return {
+        "$schema": SARIF_SCHEMA,
+        "version": "2.1.0",
+        "runs": [
+            {
+                "tool": {
+                    "driver": {
+                        "name": "lint_md",
+                        "rules": [
+                            {"id": r, "shortDescription": {"text": LINT_RULES[r].description}} for r in rules
+                        ],
+                    }
+                },
+                "results": [
+                    {
+                        "ruleId": it.kind,
+                        "ruleIndex": rules.index(it.kind),
+                        "level": "warning",
+                        "message": {"text": f"{LINT_RULES[it.kind].description}: {it.excerpt}"},
+                        "locations": [
+                            {
+                                "physicalLocation": {
+                                    "artifactLocation": {"uri": rep.path},
+                                    "region": {"startLine": it.line},
+                                }
+                            }
+                        ],
+                    }
+                    for rep in reports
+                    for it in rep.issues
+                ],
+            }
+        ],
+    }
+
+
+def json_report(reports: List[FileReport], rules: List[str], stats: Stats) -> dict:
+    return {
+        "rules": rules,
+        "issues": [
+            {"path": rep.path, "line": it.line, "rule": it.kind, "excerpt": it.excerpt}
+            for rep in reports
+            for it in rep.issues
+        ],
+        "stats": vars(stats),
+    }
+
+
+def split_ids(value: Optional[str]) -> Optional[List[str]]:
+    if value is None:
+        return None
+    return [v.strip() for v in value.split(",") if v.strip()]
+
+
+def main(argv: List[str]) -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument(
+        "paths",
+        nargs="*",
+        type=pathlib.Path,
+        help=f"Markdown files or directories (default: {', '.join(DEFAULT_TARGETS)})",
+    )
+    ap.add_argument("--format", choices=FORMATS, default="text", help="Report format (default: text)")
+    ap.add_argument("--rules", type=str, default=None, help="Comma-separated rule ids to run (default: all)")
+    ap.add_argument("--disable", type=str, default=None, help="Comma-separated rule ids to skip")
+    ap.add_argument("--list-rules", action="store_true", help="List the available rules and exit")
+    mode = ap.add_mutually_exclusive_group()
+    mode.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Re-lint only lines changed since the last --incremental run (per-file issue index)",
+    )
+    mode.add_argument(
+        "--since",
+        type=str,
+        default=None,
+        metavar="REF",
+        help="Lint only lines added or changed since this git ref (plus untracked files)",
+    )
+    ap.add_argument(
+        "--index",
+        type=pathlib.Path,
+        default=DEFAULT_INDEX,
+        help=f"Issue index for --incremental (default: {DEFAULT_INDEX.relative_to(REPO_ROOT)})",
+    )
+    add_profile_arg(ap)
+    args = ap.parse_args(argv)
+
+    if args.list_rules:
+        for rule in LINT_RULES.values():
+            print(f"{rule.id:42s} {rule.description}")
+        return 0
+    try:
+        rules = select_rules(split_ids(args.rules), split_ids(args.disable) or ())
+    except ValueError as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        return 2
+    enabled = set(rules)
+
+    targets = args.paths or [REPO_ROOT / t for t in DEFAULT_TARGETS]
+    for t in targets:
+        if not t.exists():
+            print(f"ERROR: not found: {t}", file=sys.stderr)
+            return 2
+    files = list(iter_sources(targets))
+
+    only_lines: Optional[Dict[pathlib.Path, Optional[Set[int]]]] = None
+    if args.since is not None:
+        try:
+            only_lines = git_changed_lines(args.since, targets)
+        except (OSError, subprocess.CalledProcessError) as e:
+            print(f"ERROR: git diff against {args.since!r} failed: {e}", file=sys.stderr)
+            return 2
+
+    index = IssueIndex(args.index) if args.incremental else None
+    stats = Stats()
+    reports: List[FileReport] = []
+    with profiling(args.profile):
+        for path in files:
+            key = display_path(path)
+            if only_lines is not None:
+                resolved = path.resolve()
+                if resolved not in only_lines:
+                    continue
+                lines = read_lines(path)
+                numbers = only_lines[resolved]
+                todo = range(1, len(lines) + 1) if numbers is None else sorted(numbers)
+                stats.lines += len(lines)
+                stats.lines_linted += len(todo)
+                issues = lint_lines(lines, todo)
+            elif index is not None:
+                issues = index.lint(path, key, stats)
+            else:
+                lines = read_lines(path)
+                stats.lines += len(lines)
+                stats.lines_linted += len(lines)
+                issues = lint_lines(lines, range(1, len(lines) + 1))
+            stats.files += 1
+            reports.append(FileReport(key, [it for it in issues if it.kind in enabled]))
+    if index is not None:
+        index.save()
+
+    n_issues = sum(len(rep.issues) for rep in reports)
+    if args.format == "json":
+        print(json.dumps(json_report(reports, rules, stats), indent=1, ensure_ascii=False))
+    elif args.format == "sarif":
+        print(json.dumps(sarif_report(reports, rules), indent=1, ensure_ascii=False))
+    else:
+        for rep in reports:
+            for it in rep.issues:
+                print(f"{rep.path}:{it.line}:{it.kind}:{it.excerpt}")
+        print(
+            f"{n_issues} issue(s) in {stats.files} file(s); linted {stats.lines_linted}/{stats.lines} lines"
+            + (f", {stats.files_skipped} file(s) unchanged" if stats.files_skipped else ""),
+            file=sys.stderr,
+        )
+    return 1 if n_issues else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
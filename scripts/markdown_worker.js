@@ -0,0 +1,38 @@
+// Markdown prerenderer for scripts/prerender_markdown.py.
+//
+// Reads one JSON request per line on stdin: {"source": "..."} (a post's markdown,
+// front matter included, exactly as the page passes it to Markdown.svelte) and answers
+// each with one JSON line on stdout: the prerender() result from
+// src/lib/markdown/render.js, or {"error": "..."}. Rendering goes through the very
+// module the component uses, so the HTML is identical to what the browser builds.
+import fs from "node:fs";
+import readline from "node:readline";
+import katex from "katex";
+import { prerender, useImageManifest, useMathManifest } from "../src/lib/markdown/render.js";
+
+// Same KaTeX output the page would use (scripts/prerender_math.py), when present.
+try {
+  useMathManifest(JSON.parse(fs.readFileSync(new URL("../src/lib/generated/katex-manifest.json", import.meta.url), "utf8")));
+} catch {
+  // No manifest: render math with KaTeX directly, as the component does.
+}
+// Same image sizes (scripts/image_dims.py), for the width/height of <img>.
+try {
+  useImageManifest(JSON.parse(fs.readFileSync(new URL("../src/lib/generated/image-dims.json", import.meta.url), "utf8")));
+} catch {
+  // No manifest: images are rendered without width/height, as in the component.
+}
+
+const rl = readline.createInterface({ input: process.stdin, crlfDelay: Infinity });
+
+process.stdout.write(JSON.stringify({ ready: true, katex: katex.version }) + "\n");
+
+rl.on("line", (line) => {
+  let reply;
+  try {
+    reply = prerender(JSON.parse(line).source);
+  } catch (err) {
+    reply = { error: String(err && err.message ? err.message : err) };
+  }
+  process.stdout.write(JSON.stringify(reply) + "\n");
+});
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Declarative notation rules for math expressions, applied in ONE regex scan.
+
+Rules live in a plain-text file (default: scripts/math_rules.txt), one per line:
+
+    B_problem => B_\\text{problem}
+    re: \\\\mathrm\\{(train|test)\\} => \\\\text{\\1}
+
+  - `<literal> => <replacement>` replaces the literal text, taken verbatim (no
+    escaping needed for backslashes or braces). A literal that starts/ends with a
+    word character only matches at a word boundary on that side, so `B_problem`
+    does not fire inside `AB_problem` or `B_problems`.
+  - `re: <pattern> => <template>` is a regular expression; the template may use
+    \\1-style group references (as in `re.sub`), the pattern itself may not
+    (it is embedded in a larger alternation, which renumbers its groups).
+  - Blank lines and lines starting with `#` are ignored.
+
+All literal rules are compiled into a single trie-shaped regex (shared prefixes
+are matched once, so hundreds of literals cost about as much as a handful); regex
+rules are added as extra alternatives. Each expression is scanned once; at any
+position the longest literal wins, then regex rules in file order. Replacements
+are not rescanned. Every rule has a hit counter.
+
+Usage:
+  python scripts/math_rules.py 'B_{problem} + B_problem'
+  python scripts/math_rules.py --rules my_rules.txt 'x'
+"""
+
+from __future__ import annotations
+
+import argparse
+import pathlib
+import re
+import sys
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+
+DEFAULT_RULES_PATH = pathlib.Path(__file__).resolve().parent / "math_rules.txt"
+
+ARROW = " => "
+REGEX_PREFIX = "re:"
+
+
+@dataclass(frozen=True)
+class Rule:
+    name: str
+    pattern: str
+    replacement: str
+    regex: bool = False
+    lineno: int = 0
+
+
+def parse_rules(text: str, source: str = "<rules>") -> List[Rule]:
+    rules: List[Rule] = []
+    seen: Dict[str, int] = {}
+    for lineno, raw in enumerate(text.splitlines(), start=1):
+        line = raw.strip()
+        if not line or line.startswith("#"):
+            continue
+        if ARROW not in line:
+            raise ValueError(f"{source}:{lineno}: expected '<match>{ARROW}<replacement>'")
+        lhs, rhs = line.split(ARROW, 1)
+        lhs, rhs = lhs.strip(), rhs.strip()
+        regex = lhs.startswith(REGEX_PREFIX)
+        if regex:
+            lhs = lhs[len(REGEX_PREFIX) :].strip()
+            try:
+                re.compile(lhs)
+            except re.error as e:
+                raise ValueError(f"{source}:{lineno}: bad regex: {e}") from None
+        if not lhs:
+            raise ValueError(f"{source}:{lineno}: empty match")
+        name = f"{REGEX_PREFIX}{lhs}" if regex else lhs
+        if name in seen:
+            raise ValueError(f"{source}:{lineno}: duplicate rule (first defined on line {seen[name]})")
+        seen[name] = lineno
+        rules.append(Rule(name, lhs, rhs, regex, lineno))
+    return rules
+
+
+def load_rules(path: pathlib.Path = DEFAULT_RULES_PATH) -> List[Rule]:
+    return parse_rules(path.read_text(encoding="utf-8"), str(path))
+
+
+def _is_word(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+
+def trie_regex(words: Iterable[str]) -> str:
+    """
+    Regex matching any of `words`, as a trie (common prefixes factored out).
+    Longer words are preferred at the same position; word-character edges get
+    boundary assertions.
+    """
+    trie: Dict[str, dict] = {}
+    for w in words:
+        node = trie
+        for ch in w:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def emit(node: Dict[str, dict], last: str) -> str:
+        alts = [re.escape(ch) + emit(child, ch) for ch, child in sorted(node.items()) if ch]
+        if "" in node:
+            # Word ends here; listed last so longer continuations are tried first.
+            alts.append(r"(?!\w)" if _is_word(last) else "")
+        if len(alts) == 1:
+            return alts[0]
+        return "(?:" + "|".join(alts) + ")"
+
+    firsts = []
+    for ch, child in sorted(trie.items()):
+        lead = r"(?<!\w)" if _is_word(ch) else ""
+        firsts.append(lead + re.escape(ch) + emit(child, ch))
+    return "|".join(firsts)
+
+
+class RuleSet:
+    """Compiled rules with per-rule hit counters (`hits`, keyed by rule name)."""
+
+    def __init__(self, rules: Iterable[Rule]) -> None:
+        self.rules = list(rules)
+        self.hits: Dict[str, int] = {r.name: 0 for r in self.rules}
+        self._literals: Dict[str, Rule] = {r.pattern: r for r in self.rules if not r.regex}
+        self._regex_rules = [r for r in self.rules if r.regex]
+        self._compiled = {r.name: re.compile(r.pattern) for r in self._regex_rules}
+
+        alts: List[str] = []
+        if self._literals:
+            alts.append(f"(?P<lit>{trie_regex(self._literals)})")
+        for i, r in enumerate(self._regex_rules):
+            alts.append(f"(?P<r{i}>{r.pattern})")
+        self._re: Optional[re.Pattern] = re.compile("|".join(alts)) if alts else None
+
+    def _repl(self, m: re.Match) -> str:
+        group = m.lastgroup
+        if group == "lit":
+            rule = self._literals[m.group()]
+            self.hits[rule.name] += 1
+            return rule.replacement
+        rule = self._regex_rules[int(group[1:])]  # type: ignore[index]
+        self.hits[rule.name] += 1
+        # Re-match the rule on its own so its group numbers and template line up.
+        own = self._compiled[rule.name].match(m.string, m.start())
+        return own.expand(rule.replacement) if own is not None else m.group()
+
+    def apply(self, expr: str) -> str:
+        if self._re is None:
+            return expr
+        return self._re.sub(self._repl, expr)
+
+    def total_hits(self) -> int:
+        return sum(self.hits.values())
+
+
+def main(argv: List[str]) -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("expr", nargs="+", help="Math expression(s) to normalize")
+    ap.add_argument(
+        "--rules",
+        type=pathlib.Path,
+        default=DEFAULT_RULES_PATH,
+        help=f"Rules file (default: {DEFAULT_RULES_PATH.name} next to this script)",
+    )
+    args = ap.parse_args(argv)
+
+    try:
+        rules = RuleSet(load_rules(args.rules))
+    except (OSError, ValueError) as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        return 2
+    for expr in args.expr:
+        print(rules.apply(expr))
+    for name, n in rules.hits.items():
+        if n:
+            print(f"  {n:5d}  {name}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
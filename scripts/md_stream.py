@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+"""
+Shared single-pass markdown tokenizer for the content scripts.
+
+Every content script in this repo (`strip_image_paths_and_check_md.py`,
+`figure_captions_to_image_titles.py`, `external_links_to_references.py` and
+`replace_math.py`) used to re-read the file, split lines and track code fences
+on its own. This module does that once:
+
+  - `tokenize(...)` classifies each physical line exactly once (fence toggles,
+    fenced code, footnote-definition blocks, inline base64 data-uri lines,
+    standalone image lines, blank lines and plain text).
+  - `Transform` is the plug-in point: a transform receives classified `Line`s
+    one at a time and yields zero or more `Line`s downstream.
+  - `run(...)` chains transforms so that a document flows through *all* enabled
+    transforms in one streaming pass.
+
+Inline helpers (`iter_inline_links`, `iter_math_spans`) expose the link and
+math-span patterns that several scripts need, so the regexes live in one place.
+
+For huge Notion exports, `iter_bounded_lines` reads a file in fixed-size chunks
+and moves every very long base64-alphabet run (inline `data:image/...;base64`
+payloads) into a disk-backed `RunSpool`, leaving a short sentinel in the line.
+Transforms see ordinary short lines; `RunSpool.write_expanded` restores any
+surviving payloads while the output is written.
+
+This is NOT a full Markdown parser; like the scripts it serves, it is a
+pragmatic line-based state machine tuned for our Notion-exported posts.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import io
+import os
+import pathlib
+import re
+import tempfile
+from dataclasses import dataclass, replace
+from typing import IO, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+
+# Line kinds produced by the tokenizer.
+TEXT = "text"
+BLANK = "blank"
+FENCE = "fence"        # the ``` line itself (opens or closes a fenced block)
+CODE = "code"          # a line inside a fenced block
+FOOTNOTE = "footnote"  # a footnote definition line or one of its continuation lines
+IMAGE = "image"        # a standalone markdown image line
+DATA_URI = "data_uri"  # a Notion "[](data:image/...;base64,...)" line
+
+FENCE_RE = re.compile(r"^\s*```")
+
+FOOTNOTE_DEF_RE = re.compile(r"^\[\^([^\]]+)\]:\s*(.*)$")
+FOOTNOTE_CONT_RE = re.compile(r"^(?:\s{2,}|\t).+")
+
+# Notion exports sometimes embed huge inline base64 payloads as links like:
+# [](data:image/png;base64,.....)
+DATA_URI_LINE_RE = re.compile(r"^\s*\[\]\(data:image\/[^;]+;base64,[^)]+\)\s*$")
+
+# Basic markdown image occupying a whole line: ![alt](url "optional title"){optional attrs}
+# We keep this conservative and line-based on purpose.
+IMAGE_LINE_RE = re.compile(
+    r"""^
+        (?P<prefix>\s*)!
+        \[(?P<alt>[^\]]*)\]
+        \(
+          (?P<url>[^)\s]+)
+          (?P<title>\s+(?P<q>["'])(?P<title_text>.*?)(?P=q))?
+        \)
+        (?P<attrs>\{[^}]*\})?
+        \s*$
+    """,
+    re.VERBOSE,
+)
+
+# Standard markdown links (NOT images), single-line:
+# [text](https://example.com)
+# [text](https://example.com "title")
+# Labels don't contain "[" (the innermost brackets are the link, as in CommonMark)
+# and urls don't contain "](", so every scan stops where the next link could start
+# and long bracket runs match in linear time (scripts/regex_stress.py).
+MD_LINK_RE = re.compile(
+    r"(?<!\!)\[(?P<label>[^\[\]]+)\]\((?P<url>https?://(?=[^)\s])[^)\s\]]*(?:\](?!\()[^)\s\]]*)*)(?P<title>\s+\"[^\"]*\")?\)"
+)
+
+# Most lines a transform holds back while an inline construct ("![alt...", "<i>...")
+# runs onto the next line; past this it gives up and passes them through, so an
+# unclosed opener can't make every later line rescan a growing buffer.
+MAX_SPAN_LINES = 64
+
+# Math spans as Markdown.svelte tokenizes them: $$...$$ (display) and $...$ (inline).
+MATH_SPAN_RE = re.compile(r"\$\$(?P<display>[\s\S]+?)\$\$|\$(?P<inline>[^\$\n]+?)\$")
+
+
+@dataclass(frozen=True)
+class Line:
+    """One physical line of a document (several, if a transform merged them)."""
+
+    text: str
+    eol: str = "\n"
+    kind: str = TEXT
+    lineno: int = 0
+    image: Optional[re.Match] = None
+
+    def retext(self, text: str) -> "Line":
+        """
+        Return a copy with new text. Prose-like kinds are re-classified so that
+        downstream transforms see e.g. a freshly captioned image as an image.
+        """
+        if self.kind in (TEXT, BLANK, IMAGE) or (self.kind == DATA_URI and not DATA_URI_LINE_RE.match(text)):
+            kind, image = _classify_prose(text)
+            return replace(self, text=text, kind=kind, image=image)
+        return replace(self, text=text)
+
+
+def _classify_prose(text: str) -> Tuple[str, Optional[re.Match]]:
+    m = IMAGE_LINE_RE.match(text)
+    if m:
+        return IMAGE, m
+    if text.strip() == "":
+        return BLANK, None
+    return TEXT, None
+
+
+def _split_eol(raw: str) -> Tuple[str, str]:
+    text = raw.rstrip("\r\n")
+    return text, raw[len(text):]
+
+
+def iter_raw_lines(text: str) -> Iterator[str]:
+    """Split text into lines, keeping the original line terminators (like a file opened with newline='')."""
+    return iter(io.StringIO(text, newline=""))
+
+
+def tokenize(raw_lines: Iterable[str]) -> Iterator[Line]:
+    """
+    Classify lines (with their terminators) in a single pass.
+
+    Accepts any iterable of lines, e.g. an open file (opened with newline='')
+    or `iter_raw_lines(text)`.
+    """
+    in_fence = False
+    in_footnote = False
+
+    for lineno, raw in enumerate(raw_lines, start=1):
+        text, eol = _split_eol(raw)
+
+        if FENCE_RE.match(text):
+            in_fence = not in_fence
+            in_footnote = False
+            yield Line(text, eol, FENCE, lineno)
+            continue
+
+        if DATA_URI_LINE_RE.match(text):
+            in_footnote = False
+            yield Line(text, eol, DATA_URI, lineno)
+            continue
+
+        if in_fence:
+            yield Line(text, eol, CODE, lineno)
+            continue
+
+        if FOOTNOTE_DEF_RE.match(text):
+            in_footnote = True
+            yield Line(text, eol, FOOTNOTE, lineno)
+            continue
+
+        # Continuation lines belong to the def block (a blank line is allowed as part of the block).
+        if in_footnote and (text.strip() == "" or FOOTNOTE_CONT_RE.match(text)):
+            yield Line(text, eol, FOOTNOTE, lineno)
+            continue
+        in_footnote = False
+
+        kind, image = _classify_prose(text)
+        yield Line(text, eol, kind, lineno, image)
+
+
+# Base64-alphabet runs at least this long are spooled to disk by `iter_bounded_lines`.
+# The first SPOOL_KEEP characters stay inline so that line excerpts (e.g. lint
+# reports, which show the first 220 characters) never contain a sentinel.
+SPOOL_MIN_RUN = 4096
+SPOOL_KEEP = 256
+READ_CHUNK = 1 << 16
+
+_B64_RUN_RE = re.compile(r"[A-Za-z0-9+/=]{%d,}" % SPOOL_MIN_RUN)
+_B64_HEAD_RE = re.compile(r"[A-Za-z0-9+/=]*")
+_B64_TAIL_RE = re.compile(r"[A-Za-z0-9+/=]*\Z")
+
+# Private-use codepoint: not in the base64 alphabet, not whitespace, not a bracket
+# or paren, so every pattern in the scripts treats a sentinel like URL characters.
+SPOOL_MARK = "\ue000"
+SPOOL_REF_RE = re.compile(SPOOL_MARK + r"(\d+)" + SPOOL_MARK)
+
+
+class RunSpool:
+    """
+    Disk-backed store for long base64 runs cut out of lines by `iter_bounded_lines`.
+    """
+
+    def __init__(self) -> None:
+        self._f: IO[bytes] = tempfile.TemporaryFile()
+        self._runs: List[List[int]] = []  # [offset, length] per run id
+
+    def open_run(self) -> str:
+        """Start a new run and return the sentinel that stands in for it."""
+        self._f.seek(0, io.SEEK_END)
+        self._runs.append([self._f.tell(), 0])
+        return f"{SPOOL_MARK}{len(self._runs) - 1}{SPOOL_MARK}"
+
+    def append(self, chars: str) -> None:
+        """Append to the most recently opened run."""
+        if not chars:
+            return
+        self._f.seek(0, io.SEEK_END)
+        self._f.write(chars.encode("ascii"))
+        self._runs[-1][1] += len(chars)
+
+    def __len__(self) -> int:
+        return len(self._runs)
+
+    def run_length(self, run_id: int) -> int:
+        return self._runs[run_id][1]
+
+    def iter_run(self, run_id: int, chunk_size: int = READ_CHUNK) -> Iterator[str]:
+        offset, remaining = self._runs[run_id]
+        while remaining > 0:
+            self._f.seek(offset)
+            data = self._f.read(min(chunk_size, remaining))
+            if not data:
+                break
+            offset += len(data)
+            remaining -= len(data)
+            yield data.decode("ascii")
+
+    def iter_expanded(self, text: str) -> Iterator[str]:
+        """Yield `text` in pieces, with sentinels replaced by their spooled runs."""
+        if SPOOL_MARK not in text:
+            yield text
+            return
+        pos = 0
+        for m in SPOOL_REF_RE.finditer(text):
+            yield text[pos : m.start()]
+            yield from self.iter_run(int(m.group(1)))
+            pos = m.end()
+        yield text[pos:]
+
+    def write_expanded(self, text: str, out: IO[str]) -> None:
+        """Write text to `out`, replacing sentinels with their spooled runs."""
+        for piece in self.iter_expanded(text):
+            out.write(piece)
+
+    def close(self) -> None:
+        self._f.close()
+
+    def __enter__(self) -> "RunSpool":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+
+def iter_bounded_lines(f: IO[str], spool: RunSpool, chunk_size: int = READ_CHUNK) -> Iterator[str]:
+    """
+    Yield the lines of a text file (with terminators) while holding at most a
+    chunk plus one line's non-base64 text in memory: any base64-alphabet run of
+    SPOOL_MIN_RUN+ characters is written to `spool` as it is read, so even a
+    multi-megabyte data-uri line costs a few hundred bytes here.
+    """
+    pending: List[str] = []  # pieces of the current (unterminated) line
+    carry = ""  # trailing alphabet chars that may still grow into a long run
+    in_run = False
+
+    while True:
+        chunk = f.read(chunk_size)
+        eof = not chunk
+
+        if in_run:
+            m = _B64_HEAD_RE.match(chunk)
+            spool.append(m.group(0))
+            if not eof and m.end() == len(chunk):
+                continue
+            in_run = False
+            chunk = chunk[m.end():]
+
+        text = carry + chunk
+        carry = ""
+        parts: List[str] = []
+        pos = 0
+        for m in _B64_RUN_RE.finditer(text):
+            keep = m.start() + SPOOL_KEEP
+            parts.append(text[pos:keep])
+            parts.append(spool.open_run())
+            spool.append(text[keep : m.end()])
+            pos = m.end()
+            if not eof and pos == len(text):
+                in_run = True
+        rest = text[pos:]
+        if not eof and not in_run:
+            t = _B64_TAIL_RE.search(rest)
+            assert t is not None
+            carry, rest = rest[t.start():], rest[: t.start()]
+        parts.append(rest)
+
+        pieces = "".join(parts).split("\n")
+        for piece in pieces[:-1]:
+            pending.append(piece)
+            yield "".join(pending) + "\n"
+            pending = []
+        if pieces[-1]:
+            pending.append(pieces[-1])
+
+        if eof:
+            break
+
+    if pending:
+        yield "".join(pending)
+
+
+def tokenize_text(text: str) -> Iterator[Line]:
+    return tokenize(iter_raw_lines(text))
+
+
+def render(lines: Iterable[Line]) -> str:
+    return "".join(ln.text + ln.eol for ln in lines)
+
+
+def iter_inline_links(text: str) -> Iterator[re.Match]:
+    """External (http/https) markdown links on a line; images are excluded."""
+    return MD_LINK_RE.finditer(text)
+
+
+def iter_math_spans(text: str) -> Iterator[re.Match]:
+    """`$$...$$` / `$...$` spans; check `m.group("display")` vs `m.group("inline")`."""
+    return MATH_SPAN_RE.finditer(text)
+
+
+class Transform:
+    """
+    Base class for a streaming transform.
+
+    Subclasses override `feed` (called once per incoming line, may yield any
+    number of lines) and optionally `finish` (called once at end of input, e.g.
+    to flush look-ahead buffers or append footnote definitions).
+    """
+
+    name = "transform"
+
+    def feed(self, line: Line) -> Iterable[Line]:
+        yield line
+
+    def finish(self) -> Iterable[Line]:
+        return ()
+
+
+def run(lines: Iterable[Line], transforms: Sequence[Transform]) -> Iterator[Line]:
+    """
+    Stream `lines` through `transforms` in order. Each line is handed to the
+    next stage as soon as the previous stage emits it, so the document is
+    scanned once no matter how many transforms are enabled.
+    """
+    n = len(transforms)
+
+    def push(stage: int, items: Iterable[Line]) -> Iterator[Line]:
+        if stage == n:
+            yield from items
+            return
+        t = transforms[stage]
+        for item in items:
+            yield from push(stage + 1, t.feed(item))
+
+    yield from push(0, lines)
+    for stage, t in enumerate(transforms):
+        yield from push(stage + 1, t.finish())
+
+
+def transform_text(text: str, transforms: Sequence[Transform]) -> str:
+    return render(run(tokenize_text(text), transforms))
+
+
+@contextlib.contextmanager
+def atomic_output(path: pathlib.Path) -> Iterator[IO[str]]:
+    """
+    Open a temp file next to `path` for writing and move it over `path` only once
+    the block succeeds, so readers (and Vite's file watcher) never see a partial file.
+    An existing file's permission bits are kept.
+    """
+    fd, tmp_name = tempfile.mkstemp(prefix=f".{path.name}.", dir=path.parent)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as out:
+            yield out
+        try:
+            mode = path.stat().st_mode & 0o7777
+        except FileNotFoundError:
+            umask = os.umask(0)
+            os.umask(umask)
+            mode = 0o666 & ~umask
+        os.chmod(tmp_name, mode)
+        os.replace(tmp_name, path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(tmp_name)
+        raise
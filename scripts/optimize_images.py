@@ -0,0 +1,537 @@
+#!/usr/bin/env python3
+"""
+Losslessly shrink the PNG figures in static/assets/figures and build srcset variants.
+
+For every PNG:
+  - drops metadata chunks (tEXt/zTXt/iTXt/tIME/pHYs/eXIf/...); color-management
+    chunks (gAMA/cHRM/sRGB/iCCP/sBIT) and APNG animation chunks are kept;
+  - re-encodes the image data at maximum zlib effort, trying the original
+    filtering plus whole-image None/Sub/Up filtering and keeping the smallest
+    (the file is only replaced if the result is smaller);
+  - writes downscaled copies for `srcset` into variants/<stem>-<width>w.png
+    (box-filtered by repeated 2x2 averaging, then a final nearest-neighbour step).
+
+Everything is plain Python + zlib, so it runs offline on a stock Linux box. Row
+arithmetic (PNG filters, 2x2 averaging) is done on whole rows at once as big
+integers ("SIMD within a register"), which keeps multi-megapixel figures fast.
+
+Results are cached by source content hash in .cache/image-opt/, so unchanged
+figures (and byte-identical duplicates) are never reprocessed.
+
+Usage:
+  python scripts/optimize_images.py                 # static/assets/figures, in place
+  python scripts/optimize_images.py --dry-run
+  python scripts/optimize_images.py static/assets/images --widths 480,960
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import pathlib
+import struct
+import sys
+import zlib
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+REPO_ROOT = pathlib.Path(__file__).resolve().parent.parent
+DEFAULT_TARGETS = ("static/assets/figures",)
+DEFAULT_CACHE_DIR = REPO_ROOT / ".cache" / "image-opt"
+DEFAULT_WIDTHS = (640, 1280)
+VARIANTS_DIRNAME = "variants"
+MANIFEST_VERSION = 1
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+# Ancillary chunks that affect how the image renders (or animates); everything
+# else that isn't critical is metadata and gets dropped.
+KEEP_CHUNKS = {
+    b"IHDR", b"PLTE", b"IDAT", b"IEND",
+    b"tRNS", b"gAMA", b"cHRM", b"sRGB", b"iCCP", b"sBIT",
+    b"acTL", b"fcTL", b"fdAT",
+}
+
+# Samples per pixel by PNG color type.
+CHANNELS = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}
+
+
+@dataclass
+class Png:
+    width: int
+    height: int
+    bit_depth: int
+    color_type: int
+    interlace: int
+    chunks: List[Tuple[bytes, bytes]]
+
+    def idat(self) -> bytes:
+        return b"".join(data for ctype, data in self.chunks if ctype == b"IDAT")
+
+    def chunk(self, ctype: bytes) -> Optional[bytes]:
+        for t, data in self.chunks:
+            if t == ctype:
+                return data
+        return None
+
+
+def read_png(data: bytes) -> Png:
+    if not data.startswith(PNG_SIGNATURE):
+        raise ValueError("not a PNG file")
+    chunks: List[Tuple[bytes, bytes]] = []
+    pos = len(PNG_SIGNATURE)
+    while pos + 8 <= len(data):
+        (length,) = struct.unpack(">I", data[pos : pos + 4])
+        ctype = data[pos + 4 : pos + 8]
+        payload = data[pos + 8 : pos + 8 + length]
+        if len(payload) != length:
+            raise ValueError(f"truncated {ctype!r} chunk")
+        chunks.append((ctype, payload))
+        pos += 12 + length
+        if ctype == b"IEND":
+            break
+    if not chunks or chunks[0][0] != b"IHDR":
+        raise ValueError("missing IHDR")
+    width, height, bit_depth, color_type, _comp, _filt, interlace = struct.unpack(">IIBBBBB", chunks[0][1])
+    return Png(width, height, bit_depth, color_type, interlace, chunks)
+
+
+def write_png(chunks: Iterable[Tuple[bytes, bytes]]) -> bytes:
+    out = [PNG_SIGNATURE]
+    for ctype, payload in chunks:
+        out.append(struct.pack(">I", len(payload)))
+        out.append(ctype)
+        out.append(payload)
+        out.append(struct.pack(">I", zlib.crc32(payload, zlib.crc32(ctype)) & 0xFFFFFFFF))
+    return b"".join(out)
+
+
+def ihdr(width: int, height: int, bit_depth: int, color_type: int) -> bytes:
+    return struct.pack(">IIBBBBB", width, height, bit_depth, color_type, 0, 0, 0)
+
+
+# --- whole-row byte arithmetic on big integers --------------------------------
+
+
+class _Lanes:
+    """Byte-lane masks for rows of a given length."""
+
+    def __init__(self, n: int) -> None:
+        self.n = n
+        self.hi = int.from_bytes(b"\x80" * n, "big")
+        self.lo = int.from_bytes(b"\x7f" * n, "big")
+        self.fe = int.from_bytes(b"\xfe" * n, "big")
+
+    def add(self, a: int, b: int) -> int:
+        """Bytewise (a + b) mod 256."""
+        return ((a & self.lo) + (b & self.lo)) ^ ((a ^ b) & self.hi)
+
+    def sub(self, a: int, b: int) -> int:
+        """Bytewise (a - b) mod 256."""
+        return ((a | self.hi) - (b & self.lo)) ^ ((a ^ b ^ self.hi) & self.hi)
+
+    def avg(self, a: int, b: int) -> int:
+        """Bytewise floor((a + b) / 2)."""
+        return (a & b) + (((a ^ b) & self.fe) >> 1)
+
+
+def _to_int(row: bytes) -> int:
+    return int.from_bytes(row, "big")
+
+
+def _paeth_or_avg(ftype: int, line: bytes, prev: bytes, bpp: int) -> bytes:
+    cur = bytearray(line)
+    for i in range(len(cur)):
+        a = cur[i - bpp] if i >= bpp else 0
+        b = prev[i]
+        if ftype == 3:
+            cur[i] = (cur[i] + ((a + b) >> 1)) & 0xFF
+            continue
+        c = prev[i - bpp] if i >= bpp else 0
+        p = a + b - c
+        pa, pb, pc = abs(p - a), abs(p - b), abs(p - c)
+        if pa <= pb and pa <= pc:
+            pred = a
+        elif pb <= pc:
+            pred = b
+        else:
+            pred = c
+        cur[i] = (cur[i] + pred) & 0xFF
+    return bytes(cur)
+
+
+def unfilter(raw: bytes, width: int, height: int, bpp: int) -> List[bytes]:
+    """Undo PNG scanline filtering (8-bit samples, non-interlaced)."""
+    stride = width * bpp
+    lanes = _Lanes(stride)
+    rows: List[bytes] = []
+    prev = bytes(stride)
+    pos = 0
+    for _ in range(height):
+        ftype = raw[pos]
+        line = raw[pos + 1 : pos + 1 + stride]
+        pos += stride + 1
+        if ftype == 0:
+            cur = line
+        elif ftype == 1:
+            # Prefix sum with stride bpp, doubling the reach each step.
+            x = _to_int(line)
+            reach = bpp
+            while reach < stride:
+                x = lanes.add(x, x >> (8 * reach))
+                reach *= 2
+            cur = x.to_bytes(stride, "big")
+        elif ftype == 2:
+            cur = lanes.add(_to_int(line), _to_int(prev)).to_bytes(stride, "big")
+        elif ftype in (3, 4):
+            cur = _paeth_or_avg(ftype, line, prev, bpp)
+        else:
+            raise ValueError(f"bad filter type {ftype}")
+        rows.append(cur)
+        prev = cur
+    return rows
+
+
+def filter_rows(rows: Sequence[bytes], bpp: int, ftype: int) -> bytes:
+    """Filter every row with the same filter type (0 = None, 1 = Sub, 2 = Up)."""
+    if not rows:
+        return b""
+    stride = len(rows[0])
+    lanes = _Lanes(stride)
+    tag = bytes([ftype])
+    out: List[bytes] = []
+    prev = 0
+    for row in rows:
+        if ftype == 0:
+            out.append(tag + row)
+            continue
+        x = _to_int(row)
+        if ftype == 1:
+            f = lanes.sub(x, x >> (8 * bpp))
+        else:
+            f = lanes.sub(x, prev)
+            prev = x
+        out.append(tag + f.to_bytes(stride, "big"))
+    return b"".join(out)
+
+
+def deflate_max(raw: bytes, strategy: int = zlib.Z_DEFAULT_STRATEGY) -> bytes:
+    c = zlib.compressobj(9, zlib.DEFLATED, 15, 9, strategy)
+    return c.compress(raw) + c.flush()
+
+
+def best_idat(candidates: Iterable[bytes]) -> bytes:
+    """Compress each filtered candidate at maximum effort; keep the smallest stream."""
+    best: Optional[bytes] = None
+    best_raw = b""
+    for raw in candidates:
+        z = deflate_max(raw)
+        if best is None or len(z) < len(best):
+            best, best_raw = z, raw
+    assert best is not None
+    z = deflate_max(best_raw, zlib.Z_FILTERED)
+    return z if len(z) < len(best) else best
+
+
+# --- decoding for variants ------------------------------------------------------
+
+
+@dataclass
+class Pixels:
+    """8-bit, non-palette pixel rows."""
+
+    width: int
+    height: int
+    color_type: int
+    rows: List[bytes]
+
+    @property
+    def bpp(self) -> int:
+        return CHANNELS[self.color_type]
+
+
+def expand_palette(png: Png, rows: List[bytes]) -> Pixels:
+    plte = png.chunk(b"PLTE") or b""
+    trns = png.chunk(b"tRNS") or b""
+    n = len(plte) // 3
+    tables = [bytearray(256) for _ in range(4 if trns else 3)]
+    for i in range(n):
+        for c in range(3):
+            tables[c][i] = plte[3 * i + c]
+        if trns:
+            tables[3][i] = trns[i] if i < len(trns) else 255
+    bpp = len(tables)
+    out: List[bytes] = []
+    for row in rows:
+        px = bytearray(len(row) * bpp)
+        for c, table in enumerate(tables):
+            px[c::bpp] = row.translate(table)
+        out.append(bytes(px))
+    return Pixels(png.width, png.height, 6 if trns else 2, out)
+
+
+def halve(px: Pixels) -> Pixels:
+    """2x2 box filter."""
+    bpp = px.bpp
+    w2, h2 = px.width // 2, px.height // 2
+    stride = px.width * bpp
+    lanes = _Lanes(stride)
+    out: List[bytes] = []
+    for y in range(h2):
+        v = lanes.avg(_to_int(px.rows[2 * y]), _to_int(px.rows[2 * y + 1]))
+        # Average each pixel with its right-hand neighbour, then keep even pixels.
+        hb = lanes.avg(v, (v << (8 * bpp)) & ((1 << (8 * stride)) - 1)).to_bytes(stride, "big")
+        row = bytearray(w2 * bpp)
+        for c in range(bpp):
+            row[c::bpp] = hb[c : 2 * w2 * bpp : 2 * bpp]
+        out.append(bytes(row))
+    return Pixels(w2, h2, px.color_type, out)
+
+
+def resize_nearest(px: Pixels, width: int, height: int) -> Pixels:
+    bpp = px.bpp
+    idx = [(x * px.width // width) * bpp + c for x in range(width) for c in range(bpp)]
+    out = [bytes(map(px.rows[y * px.height // height].__getitem__, idx)) for y in range(height)]
+    return Pixels(width, height, px.color_type, out)
+
+
+def downscale(px: Pixels, width: int) -> Pixels:
+    height = max(1, round(px.height * width / px.width))
+    while px.width // 2 >= width and px.height >= 2:
+        px = halve(px)
+    if px.width == width and px.height == height:
+        return px
+    return resize_nearest(px, width, height)
+
+
+def encode_pixels(px: Pixels, extra: Sequence[Tuple[bytes, bytes]] = ()) -> bytes:
+    idat = best_idat(filter_rows(px.rows, px.bpp, f) for f in (0, 1, 2))
+    chunks = [(b"IHDR", ihdr(px.width, px.height, 8, px.color_type))]
+    chunks += list(extra)
+    chunks += [(b"IDAT", idat), (b"IEND", b"")]
+    return write_png(chunks)
+
+
+# --- per-file optimization --------------------------------------------------------
+
+
+@dataclass
+class Optimized:
+    data: bytes
+    variants: Dict[int, bytes] = field(default_factory=dict)
+
+
+def optimize_png(data: bytes, widths: Sequence[int]) -> Optimized:
+    png = read_png(data)
+    kept = [(t, d) for t, d in png.chunks if t in KEEP_CHUNKS and t not in (b"IDAT", b"IEND")]
+    raw = zlib.decompress(png.idat())
+
+    decodable = png.bit_depth == 8 and png.interlace == 0 and png.color_type in CHANNELS
+    candidates = [raw]
+    rows: Optional[List[bytes]] = None
+    if decodable:
+        rows = unfilter(raw, png.width, png.height, CHANNELS[png.color_type])
+        candidates += [filter_rows(rows, CHANNELS[png.color_type], f) for f in (0, 1, 2)]
+    idat = best_idat(candidates)
+    if len(idat) >= len(png.idat()):
+        idat = png.idat()
+
+    # Keep chunk order: everything that precedes IDAT, then IDAT, then what follows it.
+    first_idat = next(i for i, (t, _) in enumerate(png.chunks) if t == b"IDAT")
+    before = [c for c in kept if png.chunks.index(c) < first_idat]
+    after = [c for c in kept if png.chunks.index(c) > first_idat]
+    new = write_png(before + [(b"IDAT", idat)] + after + [(b"IEND", b"")])
+    result = Optimized(new if len(new) < len(data) else data)
+
+    # APNGs keep their frames in fdAT; a still variant of frame 0 would be misleading.
+    if rows is None or png.chunk(b"acTL") is not None:
+        return result
+    px = expand_palette(png, rows) if png.color_type == 3 else Pixels(png.width, png.height, png.color_type, rows)
+    color = [(t, d) for t, d in kept if t in (b"gAMA", b"cHRM", b"sRGB", b"iCCP")]
+    for w in sorted(widths, reverse=True):
+        if w < png.width:
+            px = downscale(px, w)
+            result.variants[w] = encode_pixels(px, color)
+    return result
+
+
+def variant_path(path: pathlib.Path, width: int) -> pathlib.Path:
+    return path.parent / VARIANTS_DIRNAME / f"{path.stem}-{width}w.png"
+
+
+def sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class Cache:
+    """source hash -> optimized/variant hashes, with the bytes stored by hash."""
+
+    def __init__(self, root: pathlib.Path, tool: str) -> None:
+        self.root = root
+        self.tool = tool
+        self.manifest_path = root / "manifest.json"
+        try:
+            data = json.loads(self.manifest_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            data = {}
+        fresh = data.get("version") == MANIFEST_VERSION and data.get("tool") == tool
+        self.results: Dict[str, dict] = data.get("results", {}) if fresh else {}
+        self.files: Dict[str, dict] = data.get("files", {}) if fresh else {}
+
+    def _blob(self, digest: str) -> pathlib.Path:
+        return self.root / "objects" / digest[:2] / digest[2:]
+
+    def get(self, digest: str) -> bytes:
+        return self._blob(digest).read_bytes()
+
+    def put(self, data: bytes) -> str:
+        digest = sha256(data)
+        p = self._blob(digest)
+        if not p.exists():
+            p.parent.mkdir(parents=True, exist_ok=True)
+            tmp = p.with_suffix(".tmp")
+            tmp.write_bytes(data)
+            os.replace(tmp, p)
+        return digest
+
+    def lookup(self, digest: str) -> Optional[dict]:
+        rec = self.results.get(digest)
+        if rec is None:
+            # Already-optimized output of an earlier run.
+            rec = next((r for r in self.results.values() if r["output"] == digest), None)
+        if rec is None:
+            return None
+        needed = [rec["output"], *rec["variants"].values()]
+        return rec if all(self._blob(d).exists() for d in needed) else None
+
+    def save(self) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self.manifest_path.with_suffix(".tmp")
+        payload = {"version": MANIFEST_VERSION, "tool": self.tool, "results": self.results, "files": self.files}
+        tmp.write_text(json.dumps(payload, indent=1, sort_keys=True), encoding="utf-8")
+        os.replace(tmp, self.manifest_path)
+
+
+def tool_version(widths: Sequence[int]) -> str:
+    h = hashlib.sha256(pathlib.Path(__file__).read_bytes())
+    return f"{h.hexdigest()[:16]}:{','.join(map(str, sorted(widths)))}"
+
+
+def write_if_changed(path: pathlib.Path, data: bytes) -> bool:
+    try:
+        if path.read_bytes() == data:
+            return False
+    except FileNotFoundError:
+        pass
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+    return True
+
+
+def iter_pngs(targets: Iterable[pathlib.Path]) -> Iterable[pathlib.Path]:
+    for target in targets:
+        if target.is_file():
+            yield target
+            continue
+        for p in sorted(target.glob("*.png")):
+            yield p
+
+
+def main(argv: List[str]) -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument(
+        "targets",
+        nargs="*",
+        type=pathlib.Path,
+        help=f"PNG files or directories (default: {' '.join(DEFAULT_TARGETS)})",
+    )
+    ap.add_argument(
+        "--widths",
+        type=str,
+        default=",".join(map(str, DEFAULT_WIDTHS)),
+        help=f"Comma-separated srcset widths; empty for none (default: {','.join(map(str, DEFAULT_WIDTHS))})",
+    )
+    ap.add_argument("--dry-run", action="store_true", help="Report savings without writing any files")
+    ap.add_argument(
+        "--cache-dir",
+        type=pathlib.Path,
+        default=DEFAULT_CACHE_DIR,
+        help=f"Result cache (default: {DEFAULT_CACHE_DIR.relative_to(REPO_ROOT)})",
+    )
+    args = ap.parse_args(argv)
+
+    widths = [int(w) for w in args.widths.split(",") if w.strip()]
+    targets = args.targets or [REPO_ROOT / t for t in DEFAULT_TARGETS]
+    missing = [t for t in targets if not t.exists()]
+    if missing:
+        print(f"ERROR: not found: {', '.join(map(str, missing))}", file=sys.stderr)
+        return 2
+
+    cache = Cache(args.cache_dir, tool_version(widths))
+    total_before = total_after = 0
+    for path in iter_pngs(targets):
+        key = str(path.resolve())
+        st = path.stat()
+        stat_key = [st.st_size, st.st_mtime_ns]
+        rec_file = cache.files.get(key)
+        data: Optional[bytes] = None
+        if rec_file and rec_file["stat"] == stat_key:
+            digest = rec_file["sha"]
+        else:
+            data = path.read_bytes()
+            digest = sha256(data)
+
+        rec = cache.lookup(digest)
+        status = "cached"
+        if rec is None:
+            data = data if data is not None else path.read_bytes()
+            try:
+                opt = optimize_png(data, widths)
+            except (ValueError, zlib.error) as e:
+                print(f"{path}: skipped ({e})")
+                continue
+            rec = {
+                "output": cache.put(opt.data),
+                "variants": {str(w): cache.put(v) for w, v in opt.variants.items()},
+                "before": len(data),
+                "after": len(opt.data),
+            }
+            cache.results[digest] = rec
+            status = "optimized"
+
+        before, after = rec["before"], rec["after"]
+        total_before += before
+        total_after += after
+
+        if not args.dry_run:
+            wrote = []
+            if digest != rec["output"] and write_if_changed(path, cache.get(rec["output"])):
+                wrote.append(path.name)
+            for w, vd in rec["variants"].items():
+                vp = variant_path(path, int(w))
+                if not vp.exists() or vp.stat().st_size != len(cache.get(vd)) or sha256(vp.read_bytes()) != vd:
+                    write_if_changed(vp, cache.get(vd))
+                    wrote.append(vp.name)
+            st = path.stat()
+            cache.files[key] = {"stat": [st.st_size, st.st_mtime_ns], "sha": rec["output"]}
+
+        saved = before - after
+        pct = 100.0 * saved / before if before else 0.0
+        variants = ",".join(f"{w}w" for w in rec["variants"]) or "-"
+        print(f"{path}: {status}; {before} -> {after} bytes (saved {saved}, {pct:.1f}%); variants={variants}")
+
+    if not args.dry_run:
+        cache.save()
+    saved = total_before - total_after
+    print(f"total: {total_before} -> {total_after} bytes (saved {saved})")
+    if args.dry_run:
+        print("\n(dry-run) Re-run without --dry-run to write files.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
@@ -0,0 +1,185 @@
+"""
+Split the site's posts into heading sections the way Markdown.svelte does.
+
+Markdown.svelte scans each post for `##` / `###` headings, `:::jumpbox:::`
+markers and the `:::*_begin:::` ... `:::*_end:::` directive blocks (whose content
+it renders separately, so headings inside them are not sections), and gives every
+heading an id with its slugger. The same regexes and slugger live here so build
+steps (search index, TOC manifest) produce anchors that exist on the page.
+"""
+
+from __future__ import annotations
+
+import pathlib
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Tuple
+
+REPO_ROOT = pathlib.Path(__file__).resolve().parent.parent
+MAIN_POST = REPO_ROOT / "src" / "maintext" / "rl_excursions.md"
+PROJECTS_DIR = REPO_ROOT / "src" / "projects"
+MAIN_TITLE = "RL Excursions during Pretraining"
+
+# Chunking regexes, kept in sync with Markdown.svelte.
+JUMP_RE = re.compile(r':::jumpbox\s+id="([^"]+)"(?:\s+label="([^"]+)")?\s*:::', re.M)
+BLOCK_RES: Tuple[Tuple[re.Pattern, re.Pattern], ...] = (
+    (re.compile(r":::takeaway_begin:::", re.M), re.compile(r":::takeaway_end:::", re.M)),
+    (re.compile(r":::small_begin:::", re.M), re.compile(r":::small_end:::", re.M)),
+    (
+        re.compile(r':::callout_begin(?:\s+type="([^"]+)")?(?:\s+title="([^"]+)")?\s*:::', re.M),
+        re.compile(r":::callout_end:::", re.M),
+    ),
+    (
+        re.compile(r':::fold_begin(?:\s+title="([^"]+)")?(?:\s+(open))?\s*:::', re.M),
+        re.compile(r":::fold_end:::", re.M),
+    ),
+)
+H2_RE = re.compile(r"^##(?!#)\s+(.+?)\s*$", re.M)
+H3_RE = re.compile(r"^###(?!#)\s+(.+?)\s*$", re.M)
+# On a tie, the order Markdown.svelte checks the markers in.
+MARKER_ORDER = ("h2", "h3", "jump", "block0", "block1", "block2", "block3")
+
+FOOTNOTE_DEF_RE = re.compile(r"^\[\^([^\]]+)\]:\s*(.*)$")
+FRONTMATTER_RE = re.compile(r"\A---\n(?P<body>.*?)\n---\n", re.S)
+DIRECTIVE_RE = re.compile(r":::[^:\n]*:::")
+
+# Markdown -> plain words.
+FOOTNOTE_REF_RE = re.compile(r"\[\^[^\]]+\]")
+IMAGE_RE = re.compile(r'!\[([^\]]*)\]\([^)\s]*(?:\s+"([^"]*)")?\)(?:\{[^}]*\})?')
+LINK_RE = re.compile(r"\[([^\]]*)\]\([^)]*\)")
+TAG_RE = re.compile(r"<[^>]+>")
+TEX_COMMAND_RE = re.compile(r"\\[A-Za-z]+")
+SPACE_RE = re.compile(r"\s+")
+SLUG_RE = re.compile(r"[^a-z0-9]+")
+
+
+def slugify(s: str) -> str:
+    return SLUG_RE.sub("-", s.lower()).strip("-")
+
+
+class Slugger:
+    """Same ids as Markdown.svelte's createSlugger: repeats get -1, -2, ..."""
+
+    def __init__(self) -> None:
+        self.seen: Dict[str, int] = {}
+
+    def slug(self, raw: str) -> str:
+        base = slugify(raw) or "section"
+        prev = self.seen.get(base, 0)
+        self.seen[base] = prev + 1
+        return base if prev == 0 else f"{base}-{prev}"
+
+
+def plain_text(md: str) -> str:
+    text = DIRECTIVE_RE.sub(" ", md)
+    text = FOOTNOTE_REF_RE.sub("", text)
+    text = IMAGE_RE.sub(lambda m: f" {m.group(1)} {m.group(2) or ''} ", text)
+    text = LINK_RE.sub(r"\1", text)
+    text = TAG_RE.sub(" ", text)
+    text = TEX_COMMAND_RE.sub(" ", text)
+    text = text.replace("$", "").replace("*", "").replace("`", "").replace("#", "")
+    return SPACE_RE.sub(" ", text).strip()
+
+
+def strip_footnote_defs(md: str) -> str:
+    """Drop footnote definitions (and their indented continuation lines) like extractFootnotes."""
+    out: List[str] = []
+    in_def = False
+    for line in md.split("\n"):
+        if FOOTNOTE_DEF_RE.match(line):
+            in_def = True
+            continue
+        if in_def and (line.startswith(("  ", "\t")) or not line.strip()):
+            continue
+        in_def = False
+        out.append(line)
+    return "\n".join(out)
+
+
+def parse_frontmatter(text: str) -> Tuple[Dict[str, str], str]:
+    """Top-level `key: value` pairs of a YAML front matter block (nested keys ignored)."""
+    m = FRONTMATTER_RE.match(text)
+    if m is None:
+        return {}, text
+    meta: Dict[str, str] = {}
+    for line in m.group("body").splitlines():
+        if line[:1].isspace() or ":" not in line:
+            continue
+        key, value = line.split(":", 1)
+        meta[key.strip()] = value.strip().strip("\"'")
+    return meta, text[m.end() :]
+
+
+@dataclass
+class PostSection:
+    # 2 or 3 for headings; 0 for the untitled text before the first heading.
+    level: int
+    anchor: str
+    title: str
+    markdown: str
+    # (id, label) of the :::jumpbox::: markers in this section.
+    jumpboxes: List[Tuple[str, Optional[str]]] = field(default_factory=list)
+
+
+def iter_sections(doc: str) -> Iterator[PostSection]:
+    """Sections of `doc` in order; the first one (level 0, anchor "") may be empty."""
+    slugger = Slugger()
+    cur = PostSection(0, "", "", "")
+    parts: List[str] = []
+    pos = 0
+    while pos < len(doc):
+        found: List[Tuple[int, str, re.Match]] = []
+        for kind, rx in (("h2", H2_RE), ("h3", H3_RE), ("jump", JUMP_RE)):
+            m = rx.search(doc, pos)
+            if m:
+                found.append((m.start(), kind, m))
+        for k, (begin_re, _) in enumerate(BLOCK_RES):
+            m = begin_re.search(doc, pos)
+            if m:
+                found.append((m.start(), f"block{k}", m))
+        if not found:
+            parts.append(doc[pos:])
+            break
+        start, kind, m = min(found, key=lambda f: (f[0], MARKER_ORDER.index(f[1])))
+        parts.append(doc[pos:start])
+        if kind in ("h2", "h3"):
+            cur.markdown = "".join(parts)
+            yield cur
+            title = m.group(1).strip()
+            cur = PostSection(int(kind[1]), slugger.slug(title), title, "")
+            parts = []
+            pos = m.end()
+        elif kind == "jump":
+            cur.jumpboxes.append((m.group(1), m.group(2)))
+            pos = m.end()
+        else:
+            end = BLOCK_RES[int(kind[5:])][1].search(doc, m.end())
+            if end is None:
+                pos = m.end()
+            else:
+                parts.append(doc[m.end() : end.start()])
+                pos = end.end()
+    cur.markdown = "".join(parts)
+    yield cur
+
+
+@dataclass
+class Post:
+    # Stable key: the file stem ("rl_excursions", "utd_scaling", ...).
+    key: str
+    path: pathlib.Path
+    title: str
+    url: str
+    body: str
+
+
+def load_posts() -> List[Post]:
+    """The main post (served at /) followed by the project posts (linking out)."""
+    meta, body = parse_frontmatter(MAIN_POST.read_text(encoding="utf-8"))
+    posts = [Post(MAIN_POST.stem, MAIN_POST, meta.get("title", MAIN_TITLE), "/", body)]
+    for path in sorted(PROJECTS_DIR.glob("*.md")):
+        if path.name.endswith(".noimg.md"):
+            continue
+        meta, body = parse_frontmatter(path.read_text(encoding="utf-8"))
+        posts.append(Post(path.stem, path, meta.get("title", path.stem), meta.get("link", ""), body))
+    return posts
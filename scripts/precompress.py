@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Write precompressed .gz sidecars for the static build output (docs/).
+
+GitHub Pages and the nginx mirror serve docs/ as-is. With a `<file>.gz` next to
+every compressible file, nginx's `gzip_static on;` sends the sidecar instead of
+compressing on each request. This script:
+
+  - finds the compressible files in docs/ (COMPRESSIBLE_SUFFIXES: JS, CSS,
+    HTML, SVG, JSON, TTF, ...) of at least --min-size bytes;
+  - compresses them at maximum effort (zopfli when the `zopfli` package is
+    installed, otherwise zlib level 9) in worker processes (--jobs);
+  - records the SHA-256 of the source in the gzip header's comment field, and
+    skips files whose existing sidecar already carries the current hash, so a
+    rebuild only recompresses what changed;
+  - doesn't write a sidecar that isn't smaller than the file itself, and
+    removes sidecars it wrote earlier whose source is gone or no longer
+    benefits.
+
+Sidecars are plain gzip (`gzip -d` reads them); mtime is zeroed so the output
+is deterministic.
+
+Usage:
+  npm run build && python scripts/precompress.py
+  python scripts/precompress.py --jobs 4 --verbose
+  python scripts/precompress.py --dry-run       # list what would be (re)compressed
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import os
+import pathlib
+import struct
+import sys
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Iterable, Iterator, List, Optional
+
+from asset_report import BUILD_DIR, human
+
+try:
+    import zopfli.zlib  # type: ignore[import-not-found]
+except ImportError:  # optional; zlib level 9 otherwise
+    zopfli = None  # type: ignore[assignment]
+
+SIDECAR_SUFFIX = ".gz"
+COMPRESSIBLE_SUFFIXES = {
+    ".js",
+    ".mjs",
+    ".css",
+    ".html",
+    ".svg",
+    ".json",
+    ".ttf",
+    ".otf",
+    ".txt",
+    ".xml",
+    ".map",
+}
+DEFAULT_MIN_SIZE = 256
+# Marks sidecars written by this script: "precompress sha256=<hex>" in FCOMMENT.
+COMMENT_PREFIX = b"precompress sha256="
+
+GZIP_MAGIC = b"\x1f\x8b"
+FTEXT, FHCRC, FEXTRA, FNAME, FCOMMENT = 0x01, 0x02, 0x04, 0x08, 0x10
+
+
+@dataclass
+class Result:
+    path: pathlib.Path
+    status: str  # "compressed", "fresh", "skipped" (not worth it), "removed"
+    raw: int
+    compressed: int = 0
+
+
+def sidecar_of(path: pathlib.Path) -> pathlib.Path:
+    return path.with_name(path.name + SIDECAR_SUFFIX)
+
+
+def iter_compressible(root: pathlib.Path, min_size: int) -> Iterator[pathlib.Path]:
+    for p in sorted(root.rglob("*")):
+        if p.is_file() and p.suffix.lower() in COMPRESSIBLE_SUFFIXES and p.stat().st_size >= min_size:
+            yield p
+
+
+def sidecar_hash(path: pathlib.Path) -> Optional[str]:
+    """The source hash recorded in a sidecar's header, or None if it isn't one of ours."""
+    try:
+        with path.open("rb") as f:
+            head = f.read(10)
+            if len(head) < 10 or head[:2] != GZIP_MAGIC or not head[3] & FCOMMENT:
+                return None
+            flags = head[3]
+            if flags & FEXTRA:
+                (xlen,) = struct.unpack("<H", f.read(2))
+                f.read(xlen)
+            if flags & FNAME:
+                while f.read(1) not in (b"\0", b""):
+                    pass
+            comment = bytearray()
+            while (c := f.read(1)) not in (b"\0", b""):
+                comment += c
+    except OSError:
+        return None
+    if not comment.startswith(COMMENT_PREFIX):
+        return None
+    return comment[len(COMMENT_PREFIX) :].decode("ascii", "replace")
+
+
+def deflate(data: bytes) -> bytes:
+    if zopfli is not None:
+        # zopfli.zlib wraps raw deflate in a 2-byte header and 4-byte adler32 trailer.
+        return zopfli.zlib.compress(data)[2:-4]
+    c = zlib.compressobj(9, zlib.DEFLATED, -zlib.MAX_WBITS, 9)
+    return c.compress(data) + c.flush()
+
+
+def gzip_member(data: bytes, digest: str) -> bytes:
+    # RFC 1952: magic, CM=deflate, FLG=FCOMMENT, MTIME=0, XFL=2 (max compression), OS=unknown.
+    header = GZIP_MAGIC + bytes([8, FCOMMENT]) + b"\0\0\0\0" + bytes([2, 255])
+    header += COMMENT_PREFIX + digest.encode("ascii") + b"\0"
+    trailer = struct.pack("<II", zlib.crc32(data) & 0xFFFFFFFF, len(data) & 0xFFFFFFFF)
+    return header + deflate(data) + trailer
+
+
+def compress_file(path: pathlib.Path, dry_run: bool = False) -> Result:
+    data = path.read_bytes()
+    digest = hashlib.sha256(data).hexdigest()
+    side = sidecar_of(path)
+    if sidecar_hash(side) == digest:
+        return Result(path, "fresh", len(data), side.stat().st_size)
+    if dry_run:
+        return Result(path, "compressed", len(data))
+    gz = gzip_member(data, digest)
+    if len(gz) >= len(data):
+        if sidecar_hash(side) is not None:
+            side.unlink()
+        return Result(path, "skipped", len(data), len(gz))
+    tmp = side.with_name(f".{side.name}.tmp")
+    tmp.write_bytes(gz)
+    os.replace(tmp, side)
+    return Result(path, "compressed", len(data), len(gz))
+
+
+def remove_orphans(root: pathlib.Path, sources: Iterable[pathlib.Path], dry_run: bool = False) -> List[Result]:
+    """Our sidecars whose source was deleted or is no longer compressed."""
+    keep = {sidecar_of(p) for p in sources}
+    out: List[Result] = []
+    for side in sorted(root.rglob(f"*{SIDECAR_SUFFIX}")):
+        if side in keep or sidecar_hash(side) is None:
+            continue
+        out.append(Result(side, "removed", 0, side.stat().st_size))
+        if not dry_run:
+            side.unlink()
+    return out
+
+
+def main(argv: List[str]) -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--build-dir", type=pathlib.Path, default=BUILD_DIR, help="Build output (default: docs)")
+    ap.add_argument(
+        "--jobs",
+        type=int,
+        default=0,
+        help="Compress in N worker processes (0 = one per CPU; default: 0).",
+    )
+    ap.add_argument(
+        "--min-size",
+        type=int,
+        default=DEFAULT_MIN_SIZE,
+        help=f"Don't compress files smaller than this many bytes (default: {DEFAULT_MIN_SIZE})",
+    )
+    ap.add_argument("--dry-run", action="store_true", help="Report what would change; write nothing")
+    ap.add_argument("--verbose", action="store_true", help="List every file")
+    args = ap.parse_args(argv)
+
+    root: pathlib.Path = args.build_dir
+    if not root.is_dir():
+        print(f"ERROR: not found: {root} (run `npm run build`)", file=sys.stderr)
+        return 2
+
+    paths = list(iter_compressible(root, args.min_size))
+    jobs = args.jobs or os.cpu_count() or 1
+    dry = [args.dry_run] * len(paths)
+    if jobs > 1 and len(paths) > 1:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(paths))) as ex:
+            # Big files first so one large bundle doesn't finish last on its own.
+            order = sorted(range(len(paths)), key=lambda i: -paths[i].stat().st_size)
+            done = dict(zip(order, ex.map(compress_file, [paths[i] for i in order], [dry[i] for i in order])))
+            results = [done[i] for i in range(len(paths))]
+    else:
+        results = [compress_file(p, args.dry_run) for p in paths]
+    removed = remove_orphans(root, (r.path for r in results if r.status != "skipped"), args.dry_run)
+
+    for r in results + removed:
+        if args.verbose or r.status in ("compressed", "removed"):
+            rel = r.path.relative_to(root)
+            if r.status == "removed":
+                print(f"  removed     {rel}")
+            elif r.compressed:
+                print(f"  {r.status:11} {rel}: {human(r.raw)} -> {human(r.compressed)}")
+            else:
+                print(f"  {r.status:11} {rel}: {human(r.raw)}")
+
+    counts = {s: sum(r.status == s for r in results) for s in ("compressed", "fresh", "skipped")}
+    served = [r for r in results if r.status in ("compressed", "fresh") and r.compressed]
+    raw = sum(r.raw for r in served)
+    gz = sum(r.compressed for r in served)
+    prefix = "(dry-run) " if args.dry_run else ""
+    print(
+        f"{prefix}{len(paths)} compressible files: {counts['compressed']} compressed, {counts['fresh']} up to date, "
+        f"{counts['skipped']} not worth it, {len(removed)} orphaned sidecars removed"
+        + (f"; {human(raw)} -> {human(gz)}" if served else "")
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
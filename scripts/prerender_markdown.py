@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Prerender the marked output of Markdown.svelte at build time.
+
+The component parses every chunk of a post with marked (math, `::color[...]::`,
+image `{attrs}`, the custom link/heading/blockquote/image renderer), every `##` /
+`###` heading with marked.parseInline, and every footnote definition, each time
+the page loads. This script does that work once, through
+src/lib/markdown/render.js (the component's own rendering code, run by node in
+scripts/markdown_worker.js), so the output is the same HTML byte for byte. For
+each post it writes:
+
+  - src/lib/generated/prerender/<key>.json: {"version", "katex", "source",
+    "chunks": {chunk markdown: html}, "headings": {heading text: inline html}};
+  - src/lib/generated/prerender/<key>.footnotes.json: the numbered footnotes
+    ({"id", "safeId", "num", "html"}) the component shows in its side column.
+
+"source" is a hash of the markdown. The component only uses a prerender whose
+hash, render version and KaTeX version match what it is rendering, and renders
+anything missing itself; the base-path rewrite of `src=` stays at runtime since
+it depends on the deploy. Page layout (sections, callouts, folds, jumpboxes) is
+Svelte markup and is already server-rendered by SvelteKit's static prerender.
+
+Run scripts/prerender_math.py first so math comes from the KaTeX manifest.
+
+Usage:
+  python scripts/prerender_markdown.py                 # the main post
+  python scripts/prerender_markdown.py src/maintext/rl_excursions.md
+  python scripts/prerender_markdown.py --check         # exit 1 if out of date
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import pathlib
+import subprocess
+import sys
+from typing import Dict, List, Optional
+
+from post_sections import MAIN_POST, REPO_ROOT
+from prerender_math import katex_version
+
+WORKER = pathlib.Path(__file__).resolve().parent / "markdown_worker.js"
+DEFAULT_OUTPUT_DIR = REPO_ROOT / "src" / "lib" / "generated" / "prerender"
+
+
+class MarkdownWorker:
+    """One node process; requests and replies are exchanged one JSON line at a time."""
+
+    def __init__(self, node: str = "node") -> None:
+        self.proc = subprocess.Popen(
+            [node, str(WORKER)],
+            cwd=REPO_ROOT,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            encoding="utf-8",
+            bufsize=1,
+        )
+        hello = self._read()
+        self.katex: str = hello["katex"]
+
+    def _read(self) -> dict:
+        assert self.proc.stdout is not None
+        line = self.proc.stdout.readline()
+        if not line:
+            raise RuntimeError(f"markdown worker exited (code {self.proc.poll()})")
+        return json.loads(line)
+
+    def render(self, source: str) -> dict:
+        assert self.proc.stdin is not None
+        self.proc.stdin.write(json.dumps({"source": source}) + "\n")
+        self.proc.stdin.flush()
+        reply = self._read()
+        if "error" in reply:
+            raise RuntimeError(reply["error"])
+        return reply
+
+    def close(self) -> None:
+        if self.proc.stdin is not None:
+            self.proc.stdin.close()
+        self.proc.wait()
+
+    def __enter__(self) -> "MarkdownWorker":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+
+def outputs(result: dict, out_dir: pathlib.Path, key: str) -> Dict[pathlib.Path, str]:
+    """File contents for one rendered post: the HTML fragments and the footnote sidecar."""
+    stamp = {k: result[k] for k in ("version", "katex", "source")}
+    html = {**stamp, "chunks": result["chunks"], "headings": result["headings"]}
+    notes = {**stamp, "footnotes": result["footnotes"]}
+    return {
+        out_dir / f"{key}.json": json.dumps(html, indent=1, ensure_ascii=False) + "\n",
+        out_dir / f"{key}.footnotes.json": json.dumps(notes, indent=1, ensure_ascii=False) + "\n",
+    }
+
+
+def write_text(path: pathlib.Path, text: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def main(argv: List[str]) -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument(
+        "posts",
+        nargs="*",
+        type=pathlib.Path,
+        help=f"Markdown files rendered with Markdown.svelte (default: {MAIN_POST.relative_to(REPO_ROOT)})",
+    )
+    ap.add_argument(
+        "--output-dir",
+        type=pathlib.Path,
+        default=DEFAULT_OUTPUT_DIR,
+        help=f"Where to write <key>.json / <key>.footnotes.json (default: {DEFAULT_OUTPUT_DIR.relative_to(REPO_ROOT)})",
+    )
+    ap.add_argument("--check", action="store_true", help="Don't write; exit 1 if any output is out of date")
+    ap.add_argument("--node", type=str, default="node", help="Node.js executable (default: node)")
+    args = ap.parse_args(argv)
+
+    posts = args.posts or [MAIN_POST]
+    missing = [p for p in posts if not p.is_file()]
+    if missing:
+        print(f"ERROR: not found: {', '.join(map(str, missing))}", file=sys.stderr)
+        return 2
+    version = katex_version()
+    if version is None:
+        print("ERROR: node_modules/katex not found (run `npm install`)", file=sys.stderr)
+        return 2
+
+    stale: List[pathlib.Path] = []
+    with MarkdownWorker(args.node) as worker:
+        if worker.katex != version:
+            print(f"ERROR: worker loaded KaTeX {worker.katex}, expected {version}", file=sys.stderr)
+            return 2
+        for post in posts:
+            result = worker.render(post.read_text(encoding="utf-8"))
+            for path, text in outputs(result, args.output_dir, post.stem).items():
+                current: Optional[str]
+                try:
+                    current = path.read_text(encoding="utf-8")
+                except FileNotFoundError:
+                    current = None
+                if current == text:
+                    continue
+                stale.append(path)
+                if not args.check:
+                    write_text(path, text)
+            print(
+                f"{post.stem}: {len(result['chunks'])} chunks, {len(result['headings'])} headings, "
+                f"{len(result['footnotes'])} footnotes"
+            )
+
+    if args.check and stale:
+        for path in stale:
+            print(f"{path}: out of date; run scripts/prerender_markdown.py", file=sys.stderr)
+        return 1
+    print(f"{args.output_dir}: {f'{len(stale)} file(s) written' if stale else 'up to date'}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Prerender every KaTeX math span in the posts at build time.
+
+`Markdown.svelte` renders `$...$` / `$$...$$` with `katex.renderToString` in the
+browser on every page load. This script does that work once:
+
+  - extracts all math spans (inline and display) from the posts, skipping fenced
+    code, with the same delimiters and trimming as the marked extensions;
+  - dedupes them by expression hash (KaTeX version + mode + tex);
+  - renders only the ones not already in the persistent cache
+    (.cache/katex/cache.json), through ONE long-lived node process running
+    node_modules/katex (scripts/katex_worker.js);
+  - writes src/lib/generated/katex-manifest.json: {"katex": version,
+    "display": {tex: html}, "inline": {tex: html}}.
+
+`Markdown.svelte` looks expressions up in that manifest first and only falls back
+to KaTeX for expressions that are missing (or when the KaTeX version differs).
+`npm run build` runs this first (prebuild), since katex_fonts.py --prune drops
+the fonts of faces that no manifest entry uses.
+
+Usage:
+  python scripts/prerender_math.py                 # src/maintext + src/projects
+  python scripts/prerender_math.py src/maintext/rl_excursions.md
+  python scripts/prerender_math.py --check         # exit 1 if the manifest is out of date
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import pathlib
+import subprocess
+import sys
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from build_content import DEFAULT_TARGETS, iter_sources
+from md_stream import CODE, FENCE, iter_math_spans, tokenize_text
+
+REPO_ROOT = pathlib.Path(__file__).resolve().parent.parent
+WORKER = pathlib.Path(__file__).resolve().parent / "katex_worker.js"
+DEFAULT_CACHE_DIR = REPO_ROOT / ".cache" / "katex"
+DEFAULT_MANIFEST = REPO_ROOT / "src" / "lib" / "generated" / "katex-manifest.json"
+CACHE_VERSION = 1
+
+
+@dataclass(frozen=True)
+class MathSpan:
+    tex: str
+    display: bool
+
+    def key(self, katex_version: str) -> str:
+        mode = "display" if self.display else "inline"
+        return hashlib.sha256(f"{katex_version}\0{mode}\0{self.tex}".encode("utf-8")).hexdigest()
+
+
+def iter_spans(text: str) -> Iterator[MathSpan]:
+    # Blank out fenced code (keeping line structure) so "$" in code never pairs with prose.
+    prose = "".join("\n" if ln.kind in (FENCE, CODE) else ln.text + ln.eol for ln in tokenize_text(text))
+    for m in iter_math_spans(prose):
+        display = m.group("display") is not None
+        # The marked tokenizers trim the captured tex before rendering.
+        tex = (m.group("display") if display else m.group("inline")).strip()
+        if tex:
+            yield MathSpan(tex, display)
+
+
+def error_html(span: MathSpan) -> str:
+    """What renderMath() emits when KaTeX throws."""
+    tag = "pre" if span.display else "code"
+    return f'<{tag} class="katex-error">{span.tex}</{tag}>'
+
+
+class KatexWorker:
+    """One node process; requests and replies are exchanged one JSON line at a time."""
+
+    def __init__(self, node: str = "node") -> None:
+        self.proc = subprocess.Popen(
+            [node, str(WORKER)],
+            cwd=REPO_ROOT,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            encoding="utf-8",
+            bufsize=1,
+        )
+        hello = self._read()
+        self.version: str = hello["version"]
+
+    def _read(self) -> dict:
+        assert self.proc.stdout is not None
+        line = self.proc.stdout.readline()
+        if not line:
+            raise RuntimeError(f"katex worker exited (code {self.proc.poll()})")
+        return json.loads(line)
+
+    def render(self, span: MathSpan) -> str:
+        assert self.proc.stdin is not None
+        self.proc.stdin.write(json.dumps({"tex": span.tex, "display": span.display}) + "\n")
+        self.proc.stdin.flush()
+        reply = self._read()
+        return reply["html"] if "html" in reply else error_html(span)
+
+    def close(self) -> None:
+        if self.proc.stdin is not None:
+            self.proc.stdin.close()
+        self.proc.wait()
+
+    def __enter__(self) -> "KatexWorker":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+
+def katex_version() -> Optional[str]:
+    try:
+        pkg = json.loads((REPO_ROOT / "node_modules" / "katex" / "package.json").read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    return pkg.get("version")
+
+
+def load_cache(path: pathlib.Path) -> Dict[str, str]:
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    if data.get("version") != CACHE_VERSION:
+        return {}
+    return data.get("entries", {})
+
+
+def write_json(path: pathlib.Path, payload: object, indent: Optional[int] = None) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.tmp")
+    tmp.write_text(json.dumps(payload, indent=indent, ensure_ascii=False, sort_keys=True) + "\n", encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def collect(paths: Iterable[pathlib.Path]) -> Tuple[List[MathSpan], int]:
+    """Unique spans in first-seen order, plus the total (non-unique) count."""
+    seen: Set[MathSpan] = set()
+    spans: List[MathSpan] = []
+    total = 0
+    for p in paths:
+        for span in iter_spans(p.read_text(encoding="utf-8")):
+            total += 1
+            if span not in seen:
+                seen.add(span)
+                spans.append(span)
+    return spans, total
+
+
+def missing_spans(manifest: dict, spans: Iterable[MathSpan], version: str) -> List[MathSpan]:
+    """The spans `manifest` has no HTML for (all of them if it is for another KaTeX version)."""
+    if manifest.get("katex") != version:
+        return list(spans)
+    return [s for s in spans if s.tex not in manifest.get("display" if s.display else "inline", {})]
+
+
+def load_manifest(path: pathlib.Path) -> dict:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def main(argv: List[str]) -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument(
+        "targets",
+        nargs="*",
+        type=pathlib.Path,
+        help=f"Markdown files or directories (default: {' '.join(DEFAULT_TARGETS)})",
+    )
+    ap.add_argument(
+        "--manifest",
+        type=pathlib.Path,
+        default=DEFAULT_MANIFEST,
+        help=f"Output manifest (default: {DEFAULT_MANIFEST.relative_to(REPO_ROOT)})",
+    )
+    ap.add_argument(
+        "--cache-dir",
+        type=pathlib.Path,
+        default=DEFAULT_CACHE_DIR,
+        help=f"Persistent render cache (default: {DEFAULT_CACHE_DIR.relative_to(REPO_ROOT)})",
+    )
+    ap.add_argument("--node", type=str, default="node", help="Node.js executable (default: node)")
+    ap.add_argument("--check", action="store_true", help="Don't render or write; exit 1 if the manifest is out of date")
+    args = ap.parse_args(argv)
+
+    targets = args.targets or [REPO_ROOT / t for t in DEFAULT_TARGETS]
+    missing = [t for t in targets if not t.exists()]
+    if missing:
+        print(f"ERROR: not found: {', '.join(map(str, missing))}", file=sys.stderr)
+        return 2
+    version = katex_version()
+    if version is None:
+        print("ERROR: node_modules/katex not found (run `npm install`)", file=sys.stderr)
+        return 2
+
+    spans, total = collect(iter_sources(targets))
+    if args.check:
+        manifest = load_manifest(args.manifest)
+        missing = missing_spans(manifest, spans, version)
+        extra = sum(len(manifest.get(mode, {})) for mode in ("display", "inline")) - (len(spans) - len(missing))
+        if missing or extra:
+            print(
+                f"{args.manifest}: out of date ({len(missing)} spans missing, {extra} unused); "
+                "run scripts/prerender_math.py",
+                file=sys.stderr,
+            )
+            return 1
+        print(f"{args.manifest}: up to date ({len(spans)} unique spans)")
+        return 0
+
+    cache_path = args.cache_dir / "cache.json"
+    cache = load_cache(cache_path)
+    todo = [s for s in spans if s.key(version) not in cache]
+
+    if todo:
+        with KatexWorker(args.node) as worker:
+            if worker.version != version:
+                print(f"ERROR: worker loaded KaTeX {worker.version}, expected {version}", file=sys.stderr)
+                return 2
+            for span in todo:
+                cache[span.key(version)] = worker.render(span)
+        write_json(cache_path, {"version": CACHE_VERSION, "entries": cache})
+
+    manifest: Dict[str, object] = {"katex": version, "display": {}, "inline": {}}
+    for span in spans:
+        manifest["display" if span.display else "inline"][span.tex] = cache[span.key(version)]  # type: ignore[index]
+    write_json(args.manifest, manifest)
+
+    print(
+        f"math spans: {total} total, {len(spans)} unique, {len(todo)} rendered, "
+        f"{len(spans) - len(todo)} from cache -> {args.manifest}"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
@@ -0,0 +1,426 @@
+#!/usr/bin/env python3
+"""
+Opt-in profiling for the content scripts (`--profile trace.json`).
+
+Every script that takes `--profile PATH` runs its work inside `profiling(PATH)`,
+which records:
+
+  - stages: wall time, calls and bytes per named stage. Scripts mark the coarse
+    phases with `span(...)` (read, transform, write; one trace event each) and
+    hot per-line work with `stage(...)` (normalize, lint, substitute; aggregated
+    only). Each streaming transform is timed line by line under its own name.
+  - regexes: calls, matches and time per compiled module-level pattern
+    (`IMAGE_LINE_RE`, `MD_LINK_RE`, `CAPTION_RE`, `DATA_URI_RE`, ...).
+    While profiling, the patterns bound in the loaded script modules are swapped
+    for counting proxies; aliases (`IMG_RE = IMAGE_LINE_RE`) share one entry.
+  - slowLines: the slowest individual (transform, line) feeds, with a preview.
+
+The trace is Chrome trace-event JSON ("traceEvents" plus the summaries above),
+so chrome://tracing, Perfetto or speedscope can load it as a flame chart, and it
+diffs cleanly: summary keys are sorted. This module also compares two traces.
+
+When profiling is off, `stage()` / `span()` return a shared no-op context
+manager and transforms run unwrapped, so the instrumentation costs one call per
+site.
+
+Usage:
+  python scripts/transform_md.py src/maintext --math --profile /tmp/trace.json
+  python scripts/profiling.py /tmp/before.json /tmp/after.json   # compare two traces
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import heapq
+import itertools
+import json
+import os
+import pathlib
+import platform
+import re
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from md_stream import Line, Transform
+
+SCRIPTS_DIR = pathlib.Path(__file__).resolve().parent
+REPO_ROOT = SCRIPTS_DIR.parent
+TRACE_VERSION = 1
+DEFAULT_SLOW_LINES = 20
+PREVIEW_CHARS = 120
+
+
+@dataclass
+class StageStats:
+    calls: int = 0
+    seconds: float = 0.0
+    bytes: int = 0
+
+
+@dataclass
+class RegexStats:
+    pattern: str
+    aliases: List[str] = field(default_factory=list)
+    calls: int = 0
+    matches: int = 0
+    seconds: float = 0.0
+
+
+class Span:
+    """Handed to the body of a stage so it can report bytes it only knows at the end."""
+
+    __slots__ = ("bytes",)
+
+    def __init__(self, nbytes: int = 0) -> None:
+        self.bytes = nbytes
+
+
+class _NullStage:
+    """Reusable no-op stage for when profiling is off."""
+
+    span = Span()
+
+    def __enter__(self) -> Span:
+        return self.span
+
+    def __exit__(self, *exc: object) -> None:
+        return None
+
+
+NULL_STAGE = _NullStage()
+
+
+class CountingPattern:
+    """Stands in for a compiled pattern and counts calls, matches and time."""
+
+    def __init__(self, pattern: re.Pattern, stats: RegexStats) -> None:
+        self._pattern = pattern
+        self._stats = stats
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._pattern, name)
+
+    def _timed(self, fn: Any, args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> Tuple[Any, float]:
+        t0 = time.perf_counter()
+        out = fn(*args, **kwargs)
+        return out, time.perf_counter() - t0
+
+    def _single(self, fn: Any, *args: Any, **kwargs: Any) -> Any:
+        out, dt = self._timed(fn, args, kwargs)
+        s = self._stats
+        s.calls += 1
+        s.seconds += dt
+        s.matches += out is not None
+        return out
+
+    def search(self, *args: Any, **kwargs: Any) -> Optional[re.Match]:
+        return self._single(self._pattern.search, *args, **kwargs)
+
+    def match(self, *args: Any, **kwargs: Any) -> Optional[re.Match]:
+        return self._single(self._pattern.match, *args, **kwargs)
+
+    def fullmatch(self, *args: Any, **kwargs: Any) -> Optional[re.Match]:
+        return self._single(self._pattern.fullmatch, *args, **kwargs)
+
+    def finditer(self, *args: Any, **kwargs: Any) -> Iterator[re.Match]:
+        s = self._stats
+        s.calls += 1
+        it = self._pattern.finditer(*args, **kwargs)
+        while True:
+            t0 = time.perf_counter()
+            m = next(it, None)
+            s.seconds += time.perf_counter() - t0
+            if m is None:
+                return
+            s.matches += 1
+            yield m
+
+    def findall(self, *args: Any, **kwargs: Any) -> List[Any]:
+        out, dt = self._timed(self._pattern.findall, args, kwargs)
+        self._stats.calls += 1
+        self._stats.seconds += dt
+        self._stats.matches += len(out)
+        return out
+
+    def subn(self, *args: Any, **kwargs: Any) -> Tuple[str, int]:
+        # Time spent in a callable replacement is included.
+        out, dt = self._timed(self._pattern.subn, args, kwargs)
+        self._stats.calls += 1
+        self._stats.seconds += dt
+        self._stats.matches += out[1]
+        return out
+
+    def sub(self, *args: Any, **kwargs: Any) -> str:
+        return self.subn(*args, **kwargs)[0]
+
+    def split(self, *args: Any, **kwargs: Any) -> List[str]:
+        out, dt = self._timed(self._pattern.split, args, kwargs)
+        self._stats.calls += 1
+        self._stats.seconds += dt
+        self._stats.matches += max(0, len(out) - 1) // (self._pattern.groups + 1)
+        return out
+
+
+class ProfiledTransform(Transform):
+    """Times each `feed` of the wrapped transform (its own work only, not downstream)."""
+
+    def __init__(self, inner: Transform, profiler: "Profiler", path: str) -> None:
+        self.inner = inner
+        self.name = inner.name
+        self.profiler = profiler
+        self.path = path
+
+    def feed(self, line: Line) -> Iterable[Line]:
+        t0 = time.perf_counter()
+        out = list(self.inner.feed(line))
+        dt = time.perf_counter() - t0
+        self.profiler.add(self.name, dt, len(line.text) + len(line.eol))
+        self.profiler.line(dt, self.name, self.path, line)
+        return out
+
+    def finish(self) -> Iterable[Line]:
+        t0 = time.perf_counter()
+        out = list(self.inner.finish())
+        self.profiler.add(f"{self.name}.finish", time.perf_counter() - t0)
+        return out
+
+
+class Profiler:
+    def __init__(self, slow_lines: int = DEFAULT_SLOW_LINES) -> None:
+        self.t0 = time.perf_counter()
+        self.stages: Dict[str, StageStats] = {}
+        self.regexes: Dict[str, RegexStats] = {}
+        self.events: List[dict] = []
+        self.slow_lines = slow_lines
+        self._slow: List[Tuple[float, int, dict]] = []
+        self._seq = itertools.count()
+        self._patched: List[Tuple[Any, str, re.Pattern]] = []
+        self._line_cutoff = 0.0
+
+    def add(self, name: str, seconds: float, nbytes: int = 0) -> None:
+        s = self.stages.get(name)
+        if s is None:
+            s = self.stages[name] = StageStats()
+        s.calls += 1
+        s.seconds += seconds
+        s.bytes += nbytes
+
+    @contextlib.contextmanager
+    def stage(self, name: str, nbytes: int = 0, trace: bool = False, **args: Any) -> Iterator[Span]:
+        sp = Span(nbytes)
+        t0 = time.perf_counter()
+        try:
+            yield sp
+        finally:
+            t1 = time.perf_counter()
+            self.add(name, t1 - t0, sp.bytes)
+            if trace:
+                self.events.append(
+                    {
+                        "name": name,
+                        "cat": "stage",
+                        "ph": "X",
+                        "ts": round((t0 - self.t0) * 1e6, 1),
+                        "dur": round((t1 - t0) * 1e6, 1),
+                        "pid": os.getpid(),
+                        "tid": 0,
+                        "args": {**args, "bytes": sp.bytes},
+                    }
+                )
+
+    def line(self, seconds: float, stage: str, path: str, line: Line) -> None:
+        if len(self._slow) >= self.slow_lines and seconds <= self._line_cutoff:
+            return
+        entry = {
+            "seconds": seconds,
+            "stage": stage,
+            "path": path,
+            "line": line.lineno,
+            "kind": line.kind,
+            "chars": len(line.text),
+            "preview": line.text[:PREVIEW_CHARS],
+        }
+        item = (seconds, next(self._seq), entry)
+        if len(self._slow) < self.slow_lines:
+            heapq.heappush(self._slow, item)
+        else:
+            heapq.heapreplace(self._slow, item)
+        self._line_cutoff = self._slow[0][0]
+
+    def transforms(self, transforms: Sequence[Transform], path: str) -> List[Transform]:
+        return [ProfiledTransform(t, self, path) for t in transforms]
+
+    def instrument(self, modules: Iterable[Any]) -> None:
+        """Swap every module-level compiled pattern in `modules` for a counting proxy."""
+        proxies: Dict[int, CountingPattern] = {}
+        bindings: List[Tuple[bool, str, str, Any, re.Pattern]] = []
+        for mod in modules:
+            # Named after the file, so a script run as __main__ reads like its imports.
+            stem = pathlib.Path(mod.__file__).stem
+            try:
+                source = pathlib.Path(mod.__file__).read_text(encoding="utf-8")
+            except OSError:
+                source = ""
+            for attr, value in vars(mod).items():
+                if isinstance(value, re.Pattern):
+                    defined = re.search(rf"^{re.escape(attr)}\s*=\s*re\.compile\b", source, re.M) is not None
+                    bindings.append((not defined, stem, attr, mod, value))
+        # The module that compiles a pattern names it; other bindings are aliases.
+        for _, stem, attr, mod, value in sorted(bindings, key=lambda b: b[:3]):
+            name = f"{stem}.{attr}"
+            if name in self.regexes and id(value) not in proxies:
+                name = f"{name}#{sum(n.split('#')[0] == name for n in self.regexes) + 1}"
+            proxy = proxies.get(id(value))
+            if proxy is None:
+                stats = self.regexes[name] = RegexStats(value.pattern if isinstance(value.pattern, str) else "")
+                proxy = proxies[id(value)] = CountingPattern(value, stats)
+            elif name not in proxy._stats.aliases:
+                proxy._stats.aliases.append(name)
+            setattr(mod, attr, proxy)
+            self._patched.append((mod, attr, value))
+
+    def restore(self) -> None:
+        for mod, attr, value in reversed(self._patched):
+            setattr(mod, attr, value)
+        self._patched.clear()
+
+    def to_json(self, argv: Sequence[str]) -> dict:
+        wall = time.perf_counter() - self.t0
+
+        def stage_json(s: StageStats) -> dict:
+            out = {"calls": s.calls, "seconds": round(s.seconds, 6), "bytes": s.bytes}
+            if s.bytes and s.seconds:
+                out["mbPerSecond"] = round(s.bytes / s.seconds / 1e6, 3)
+            return out
+
+        return {
+            "traceEvents": self.events,
+            "displayTimeUnit": "ms",
+            "otherData": {
+                "traceVersion": TRACE_VERSION,
+                "argv": list(argv),
+                "python": platform.python_version(),
+                "wallSeconds": round(wall, 6),
+            },
+            "stages": {name: stage_json(s) for name, s in sorted(self.stages.items())},
+            "regexes": {
+                name: {
+                    "calls": s.calls,
+                    "matches": s.matches,
+                    "seconds": round(s.seconds, 6),
+                    "aliases": s.aliases,
+                    "pattern": s.pattern[:200],
+                }
+                for name, s in sorted(self.regexes.items())
+                if s.calls
+            },
+            "slowLines": [
+                {**e, "seconds": round(e["seconds"], 6)} for _, _, e in sorted(self._slow, key=lambda t: (-t[0], t[1]))
+            ],
+        }
+
+    def summary(self, top: int = 8) -> str:
+        lines = [f"profile: {time.perf_counter() - self.t0:.3f}s wall"]
+        for name, s in sorted(self.stages.items(), key=lambda kv: -kv[1].seconds)[:top]:
+            lines.append(f"  stage {name:24} {s.seconds * 1e3:10.2f} ms  {s.calls:8d} calls  {s.bytes:10d} bytes")
+        for name, r in sorted(self.regexes.items(), key=lambda kv: -kv[1].seconds)[:top]:
+            if r.calls:
+                lines.append(f"  regex {name:40} {r.seconds * 1e3:10.2f} ms  {r.calls:8d} calls  {r.matches:8d} matches")
+        return "\n".join(lines)
+
+
+ACTIVE: Optional[Profiler] = None
+
+
+def stage(name: str, nbytes: int = 0) -> Any:
+    """Aggregate-only timer for hot per-line work; a no-op unless profiling."""
+    return NULL_STAGE if ACTIVE is None else ACTIVE.stage(name, nbytes)
+
+
+def span(name: str, nbytes: int = 0, **args: Any) -> Any:
+    """Like `stage`, plus one trace event (per-file phases: read, transform, write)."""
+    return NULL_STAGE if ACTIVE is None else ACTIVE.stage(name, nbytes, trace=True, **args)
+
+
+def profiled(transforms: Sequence[Transform], path: object = "") -> Sequence[Transform]:
+    """`transforms`, wrapped for per-line timing when profiling."""
+    return transforms if ACTIVE is None else ACTIVE.transforms(transforms, str(path))
+
+
+def script_modules() -> List[Any]:
+    """Loaded modules that live in scripts/ or at the repo root (replace_math.py)."""
+    out = []
+    for mod in list(sys.modules.values()):
+        f = getattr(mod, "__file__", None)
+        if f and pathlib.Path(f).resolve().parent in (SCRIPTS_DIR, REPO_ROOT):
+            out.append(mod)
+    return out
+
+
+def add_profile_arg(ap: argparse.ArgumentParser) -> None:
+    ap.add_argument(
+        "--profile",
+        type=pathlib.Path,
+        default=None,
+        metavar="TRACE.json",
+        help="Record per-stage, per-regex and slowest-line timings to a JSON trace (Chrome trace format)",
+    )
+
+
+@contextlib.contextmanager
+def profiling(path: Optional[pathlib.Path], slow_lines: int = DEFAULT_SLOW_LINES) -> Iterator[Optional[Profiler]]:
+    """Profile the block when `path` is set; the trace is written (and summarized on stderr) at exit."""
+    global ACTIVE
+    if path is None:
+        yield None
+        return
+    prof = Profiler(slow_lines)
+    prof.instrument(script_modules())
+    ACTIVE = prof
+    try:
+        yield prof
+    finally:
+        ACTIVE = None
+        prof.restore()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(prof.to_json(sys.argv), indent=1, ensure_ascii=False) + "\n", encoding="utf-8")
+        print(prof.summary(), file=sys.stderr)
+        print(f"profile: trace written to {path}", file=sys.stderr)
+
+
+def compare(old: dict, new: dict) -> List[str]:
+    """Per-stage and per-regex time / call deltas between two traces."""
+    out: List[str] = []
+    for section, metric in (("stages", "seconds"), ("regexes", "seconds")):
+        a, b = old.get(section, {}), new.get(section, {})
+        out.append(f"{section}:")
+        for name in sorted(set(a) | set(b), key=lambda n: -b.get(n, a.get(n, {})).get(metric, 0)):
+            x, y = a.get(name, {}), b.get(name, {})
+            t0, t1 = x.get(metric, 0.0), y.get(metric, 0.0)
+            change = f"{(t1 - t0) / t0:+7.1%}" if t0 else "    new"
+            calls = f"{x.get('calls', 0)} -> {y.get('calls', 0)} calls"
+            out.append(f"  {name:44} {t0 * 1e3:10.2f} -> {t1 * 1e3:10.2f} ms {change}  ({calls})")
+    return out
+
+
+def main(argv: List[str]) -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("old", type=pathlib.Path, help="Baseline trace")
+    ap.add_argument("new", type=pathlib.Path, help="Trace to compare with the baseline")
+    args = ap.parse_args(argv)
+    traces = []
+    for p in (args.old, args.new):
+        try:
+            traces.append(json.loads(p.read_text(encoding="utf-8")))
+        except (OSError, ValueError) as e:
+            print(f"ERROR: {p}: {e}", file=sys.stderr)
+            return 2
+    print("\n".join(compare(*traces)))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+"""
+Stress the content scripts' regexes with adversarial lines and check they stay linear.
+
+Each case pairs a pattern, called the way the scripts call it (`match`, `search`,
+`finditer`, `sub`), or a whole transform with a generator of hostile input:
+long bracket runs, image/link/tag openers that never close, whitespace runs
+inside captions, repeated `data:image/` prefixes, and so on. The case is timed
+(best of --repeat) at each of the --sizes (characters per line, or per
+document for transform cases), which gives:
+
+  - the time per line at the largest size;
+  - the growth exponent, the log-log slope of time over size between the
+    smallest and the largest size (1.0 = linear, 2.0 = quadratic).
+
+A case fails when its exponent is above --max-exponent or one line takes more
+than --budget-ms. Sizes are measured smallest first, and a case that is already
+over budget is not run at the larger sizes, so a regression shows up as a
+failure instead of a stalled run. Exits 1 if any case fails.
+
+Usage:
+  python scripts/regex_stress.py
+  python scripts/regex_stress.py --cases md_link_brackets,i_tag_unclosed --sizes 8000,128000
+  python scripts/regex_stress.py --output .cache/stress.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import math
+import pathlib
+import platform
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Callable, List, Optional, Sequence
+
+import external_links_to_references
+import figure_captions_to_image_titles as captions
+import md_stream
+import strip_image_paths_and_check_md as strip
+from md_stream import transform_text
+
+# replace_math.py lives at the repo root.
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+import replace_math  # noqa: E402
+
+RESULTS_VERSION = 1
+DEFAULT_SIZES = (4_000, 16_000, 64_000)
+DEFAULT_MAX_EXPONENT = 1.5
+DEFAULT_BUDGET_MS = 50.0
+# Below this a timing is mostly timer noise; the exponent is not computed from it.
+MIN_TIMING = 20e-6
+
+
+@dataclass(frozen=True)
+class Case:
+    name: str
+    target: str  # what runs, as the scripts call it
+    make: Callable[[int], str]  # hostile input of about n characters
+    run: Callable[[str], object]
+
+
+def repeat(unit: str, n: int, head: str = "", tail: str = "") -> str:
+    return head + unit * max(1, (n - len(head) - len(tail)) // len(unit)) + tail
+
+
+def lines(unit: str, n: int) -> str:
+    """A document of `unit` lines, about n characters in total."""
+    return repeat(unit + "\n", n)
+
+
+def _drain(it: object) -> None:
+    for _ in it:  # type: ignore[attr-defined]
+        pass
+
+
+CASES: List[Case] = [
+    # figure_captions_to_image_titles
+    Case(
+        "caption_ws_run",
+        "figure_captions_to_image_titles.match_caption",
+        lambda n: repeat(" ", n, "Figure 1: a", "b"),
+        captions.match_caption,
+    ),
+    Case(
+        "caption_bold_ws_run",
+        "figure_captions_to_image_titles.match_caption",
+        lambda n: repeat(" \t", n, "**Figure 1: a", "b*"),
+        captions.match_caption,
+    ),
+    Case(
+        "caption_near_bold",
+        "figure_captions_to_image_titles.match_caption",
+        lambda n: repeat("* x ", n, "**Figure 2: "),
+        captions.match_caption,
+    ),
+    Case(
+        "split_remainder_periods",
+        "figure_captions_to_image_titles.SPLIT_REMAINDER_RE.match",
+        lambda n: repeat(". Wee ", n, "Figure 1: a"),
+        captions.SPLIT_REMAINDER_RE.match,
+    ),
+    # md_stream
+    Case(
+        "image_line_quotes",
+        "md_stream.IMAGE_LINE_RE.match",
+        lambda n: repeat("x\" '", n, '![a](u "', ")x"),
+        md_stream.IMAGE_LINE_RE.match,
+    ),
+    Case(
+        "image_line_alt",
+        "md_stream.IMAGE_LINE_RE.match",
+        lambda n: repeat("![", n),
+        md_stream.IMAGE_LINE_RE.match,
+    ),
+    Case(
+        "md_link_brackets",
+        "md_stream.MD_LINK_RE.finditer",
+        lambda n: repeat("[", n),
+        lambda s: _drain(md_stream.MD_LINK_RE.finditer(s)),
+    ),
+    Case(
+        "md_link_bracket_run_no_url",
+        "md_stream.MD_LINK_RE.finditer",
+        lambda n: repeat("[a ", n, "", "](ftp://x)"),
+        lambda s: _drain(md_stream.MD_LINK_RE.finditer(s)),
+    ),
+    Case(
+        "md_link_unclosed_url",
+        "md_stream.MD_LINK_RE.finditer",
+        lambda n: repeat("[a](http://x", n),
+        lambda s: _drain(md_stream.MD_LINK_RE.finditer(s)),
+    ),
+    Case(
+        "md_link_unclosed_title",
+        "md_stream.MD_LINK_RE.finditer",
+        lambda n: repeat('[a](http://x "t', n),
+        lambda s: _drain(md_stream.MD_LINK_RE.finditer(s)),
+    ),
+    Case(
+        "math_unclosed_display",
+        "md_stream.MATH_SPAN_RE.finditer",
+        lambda n: repeat("a $ b \\\\ ", n, "$$"),
+        lambda s: _drain(md_stream.MATH_SPAN_RE.finditer(s)),
+    ),
+    Case(
+        "footnote_def_unclosed",
+        "md_stream.FOOTNOTE_DEF_RE.match",
+        lambda n: repeat("[^", n),
+        md_stream.FOOTNOTE_DEF_RE.match,
+    ),
+    Case(
+        "data_uri_line_unclosed",
+        "md_stream.DATA_URI_LINE_RE.match",
+        lambda n: repeat("QUJD", n, "[](data:image/png;base64,", ") x"),
+        md_stream.DATA_URI_LINE_RE.match,
+    ),
+    # strip_image_paths_and_check_md
+    Case(
+        "img_alt_openers",
+        "strip_image_paths_and_check_md.IMG_RE.sub",
+        lambda n: repeat("![", n),
+        lambda s: strip.IMG_RE.sub("", s),
+    ),
+    Case(
+        "img_url_openers",
+        "strip_image_paths_and_check_md.IMG_RE.sub",
+        lambda n: repeat("![a](", n),
+        lambda s: strip.IMG_RE.sub("", s),
+    ),
+    Case(
+        "img_unclosed_title",
+        "strip_image_paths_and_check_md.IMG_RE.sub",
+        lambda n: repeat('![a](u "t', n),
+        lambda s: strip.IMG_RE.sub("", s),
+    ),
+    Case(
+        "img_attr_tail_unclosed",
+        "strip_image_paths_and_check_md.IMG_ATTR_TAIL_RE.search",
+        lambda n: repeat("![a](u){w", n),
+        strip.IMG_ATTR_TAIL_RE.search,
+    ),
+    Case(
+        "data_uri_prefixes",
+        "strip_image_paths_and_check_md.DATA_URI_RE.search",
+        lambda n: repeat("data:image/", n),
+        strip.DATA_URI_RE.search,
+    ),
+    Case(
+        "data_uri_payloads",
+        "strip_image_paths_and_check_md.DATA_URI_RE.search",
+        lambda n: repeat("data:image/png;base64,QUJD", n),
+        strip.DATA_URI_RE.search,
+    ),
+    Case(
+        "lint_rules_mixed",
+        "strip_image_paths_and_check_md.line_issues",
+        lambda n: repeat('![a](u "x" [b](http://y <i> $  ', n),
+        lambda s: strip.line_issues(1, s),
+    ),
+    # replace_math
+    Case(
+        "i_tag_unclosed",
+        "replace_math.I_TAG_RE.sub",
+        lambda n: repeat("<i>a", n),
+        lambda s: replace_math.I_TAG_RE.sub("", s),
+    ),
+    Case(
+        "i_tag_open_attrs",
+        "replace_math.I_TAG_RE.sub",
+        lambda n: repeat("<i ", n),
+        lambda s: replace_math.I_TAG_RE.sub("", s),
+    ),
+    Case(
+        "i_open_attrs",
+        "replace_math.I_OPEN_RE.search",
+        lambda n: repeat("<i ", n),
+        replace_math.I_OPEN_RE.search,
+    ),
+    # Whole transforms: openers that carry over to the next line.
+    Case(
+        "transform_i_tag_reopened",
+        "replace_math.ITagsToMath",
+        lambda n: "<i>a\n" + lines("b</i> <i>c", n),
+        lambda s: transform_text(s, [replace_math.ITagsToMath()]),
+    ),
+    Case(
+        "transform_i_tag_never_closed",
+        "replace_math.ITagsToMath",
+        lambda n: lines("<i>open tag x", n),
+        lambda s: transform_text(s, [replace_math.ITagsToMath()]),
+    ),
+    Case(
+        "transform_alt_never_closed",
+        "strip_image_paths_and_check_md.StripImagePaths",
+        lambda n: lines("![alt that runs on", n),
+        lambda s: transform_text(s, [strip.StripImagePaths()]),
+    ),
+    Case(
+        "transform_links_brackets",
+        "external_links_to_references.ExternalLinksToFootnotes",
+        lambda n: lines(repeat("[", 2_000), n),
+        lambda s: transform_text(s, [external_links_to_references.ExternalLinksToFootnotes()]),
+    ),
+    Case(
+        "transform_captions_ws",
+        "figure_captions_to_image_titles.CaptionsToTitles",
+        lambda n: "![a](u.png)\n\n" + repeat(" ", n, "Figure 1: a", "b\n"),
+        lambda s: transform_text(s, [captions.CaptionsToTitles()]),
+    ),
+]
+
+
+@dataclass
+class Result:
+    case: str
+    target: str
+    sizes: List[int] = field(default_factory=list)
+    seconds: List[float] = field(default_factory=list)
+    exponent: Optional[float] = None
+    failed: List[str] = field(default_factory=list)
+
+
+def best_time(fn: Callable[[str], object], text: str, repeat_n: int) -> float:
+    best = float("inf")
+    for _ in range(repeat_n):
+        gc.collect()
+        t0 = time.perf_counter()
+        fn(text)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def growth_exponent(sizes: Sequence[int], seconds: Sequence[float]) -> Optional[float]:
+    points = [(n, t) for n, t in zip(sizes, seconds) if t >= MIN_TIMING]
+    if len(points) < 2 or points[0][0] == points[-1][0]:
+        return None
+    (n0, t0), (n1, t1) = points[0], points[-1]
+    return math.log(t1 / t0) / math.log(n1 / n0)
+
+
+def stress(case: Case, sizes: Sequence[int], repeat_n: int, budget: float, max_exponent: float) -> Result:
+    res = Result(case.name, case.target)
+    for n in sorted(sizes):
+        text = case.make(n)
+        t = best_time(case.run, text, repeat_n)
+        res.sizes.append(len(text))
+        res.seconds.append(t)
+        if t > budget:
+            res.failed.append(f"{t * 1000:.1f} ms at {len(text)} chars (budget {budget * 1000:.0f} ms)")
+            break
+    res.exponent = growth_exponent(res.sizes, res.seconds)
+    if res.exponent is not None and res.exponent > max_exponent:
+        res.failed.append(f"grows as n^{res.exponent:.2f} (max {max_exponent})")
+    return res
+
+
+def parse_sizes(spec: str) -> List[int]:
+    sizes = [int(s) for s in spec.split(",") if s.strip()]
+    if not sizes or min(sizes) <= 0:
+        raise ValueError(f"bad --sizes: {spec!r}")
+    return sizes
+
+
+def main(argv: List[str]) -> int:
+    names = [c.name for c in CASES]
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--cases", type=str, default=None, help="Comma-separated subset of the cases (default: all)")
+    ap.add_argument("--list", action="store_true", help="List the cases and exit")
+    ap.add_argument(
+        "--sizes",
+        type=str,
+        default=",".join(map(str, DEFAULT_SIZES)),
+        help=f"Comma-separated input sizes in characters (default: {','.join(map(str, DEFAULT_SIZES))})",
+    )
+    ap.add_argument("--repeat", type=int, default=3, help="Timed runs per size; the best is kept (default: 3)")
+    ap.add_argument(
+        "--budget-ms",
+        type=float,
+        default=DEFAULT_BUDGET_MS,
+        help=f"Most one input may take, in ms (default: {DEFAULT_BUDGET_MS:g})",
+    )
+    ap.add_argument(
+        "--max-exponent",
+        type=float,
+        default=DEFAULT_MAX_EXPONENT,
+        help=f"Largest allowed growth exponent (default: {DEFAULT_MAX_EXPONENT})",
+    )
+    ap.add_argument("--output", type=pathlib.Path, default=None, help="Write results as JSON")
+    args = ap.parse_args(argv)
+
+    if args.list:
+        for c in CASES:
+            print(f"{c.name:30s} {c.target}")
+        return 0
+    try:
+        sizes = parse_sizes(args.sizes)
+    except ValueError as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        return 2
+    cases = CASES
+    if args.cases:
+        wanted = [c.strip() for c in args.cases.split(",") if c.strip()]
+        unknown = [c for c in wanted if c not in names]
+        if unknown:
+            print(f"ERROR: unknown case(s): {', '.join(unknown)}", file=sys.stderr)
+            return 2
+        cases = [c for c in CASES if c.name in wanted]
+
+    results: List[Result] = []
+    for case in cases:
+        r = stress(case, sizes, args.repeat, args.budget_ms / 1000, args.max_exponent)
+        results.append(r)
+        exp = f"n^{r.exponent:.2f}" if r.exponent is not None else "n^?"
+        status = "FAIL" if r.failed else "ok"
+        print(
+            f"{r.case:<30} {r.seconds[-1] * 1000:9.3f} ms @ {r.sizes[-1]:>7} chars  {exp:>7}  {status}",
+            flush=True,
+        )
+        for msg in r.failed:
+            print(f"  {msg}", flush=True)
+
+    if args.output is not None:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        payload = {
+            "version": RESULTS_VERSION,
+            "python": platform.python_version(),
+            "budgetMs": args.budget_ms,
+            "maxExponent": args.max_exponent,
+            "results": [asdict(r) for r in results],
+        }
+        args.output.write_text(json.dumps(payload, indent=2) + "\n", encoding="utf-8")
+
+    failed = [r.case for r in results if r.failed]
+    if failed:
+        print(f"\n{len(failed)} of {len(results)} case(s) failed: {', '.join(failed)}", file=sys.stderr)
+        return 1
+    print(f"\nAll {len(results)} case(s) linear and within {args.budget_ms:g} ms per input")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
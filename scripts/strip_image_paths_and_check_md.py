@@ -16,56 +16,137 @@ Default behavior:
     ![alt](__IMAGE_PLACEHOLDER__ "title")
 - Prints a small report of likely markdown issues around image/link syntax.
 
+With --extract-images, inline base64 images (Notion's "[](data:image/...)" lines
+and ![alt](data:image/...) images) are decoded into static/assets/figures/ under
+their content hash instead of being dropped, and rewritten as normal references:
+    ![](/assets/figures/<hash>.png)
+Identical images pasted many times are stored once.
+
+Unicode KaTeX trips over is normalized on the way, in the same pass as the lint:
+every space separator becomes " " and format characters such as zero-width
+spaces are dropped (UNICODE_NORMALIZE_MAP); inside $...$ / $$...$$ fullwidth and
+odd hyphen/slash lookalikes also become ASCII (MATH_UNICODE_MAP).
+--normalize-math-only leaves prose alone and only normalizes math spans.
+
 This is NOT a full Markdown parser; it’s a pragmatic lint for our content.
 """
 
 from __future__ import annotations
 
 import argparse
+import base64
+import binascii
 import dataclasses
+import hashlib
+import itertools
+import os
 import pathlib
 import re
 import sys
-from typing import Dict, List, Tuple
+import tempfile
+import unicodedata
+from dataclasses import replace
+from typing import IO, Callable, Container, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from md_stream import (
+    CODE,
+    DATA_URI,
+    DATA_URI_LINE_RE,
+    FENCE,
+    MAX_SPAN_LINES,
+    READ_CHUNK,
+    Line,
+    RunSpool,
+    Transform,
+    atomic_output,
+    iter_bounded_lines,
+    run,
+    tokenize,
+    transform_text,
+)
+from profiling import add_profile_arg, profiled, profiling, span, stage
 
 
 PLACEHOLDER = "__IMAGE_PLACEHOLDER__"
 
+REPO_ROOT = pathlib.Path(__file__).resolve().parent.parent
+FIGURES_DIR = REPO_ROOT / "static" / "assets" / "figures"
+FIGURES_URL = "/assets/figures"
+
 
 # Match standard markdown image syntax on a single line:
 # ![alt](url "title")
 # Notes:
 # - url must not contain whitespace (consistent with our renderer assumptions)
 # - title is optional and must be a double-quoted string without internal double quotes
+# - alt has no "[" and url has no "](", so a run of unclosed "![" / "![a](" can't make
+#   every start rescan the rest of the line (linear time; see regex_stress.py)
 IMG_RE = re.compile(
-    r"!\[(?P<alt>[^\]]*)\]\((?P<url>[^)\s]+)(?P<title>\s+\"[^\"]*\")?\)"
+    r"!\[(?P<alt>[^\[\]]*)\]\((?P<url>(?=[^)\s])[^)\s\]]*(?:\](?!\()[^)\s\]]*)*)(?P<title>\s+\"[^\"]*\")?\)"
 )
 
+# The payload part of an inline image URL (either form above). The subtype has no
+# "/" and the payload no ";", so repeated "data:image/" prefixes scan once.
+DATA_URI_RE = re.compile(r"data:image/(?P<mime>[^;/]+);base64,(?P<payload>[^);]+)")
+
+# File extension per image subtype; anything else is stored as .bin.
+DATA_URI_EXT: Dict[str, str] = {
+    "png": "png",
+    "jpeg": "jpg",
+    "jpg": "jpg",
+    "gif": "gif",
+    "webp": "webp",
+    "svg+xml": "svg",
+}
+
 # Detect image-with-attrs syntax used elsewhere in this repo:
 # ![alt](url "title"){width=... id=...}
-IMG_ATTR_TAIL_RE = re.compile(r"!\[[^\]]*\]\([^)]*\)\{[^}]*\}")
-
-# Notion exports sometimes embed huge inline base64 payloads as links like:
-# [](data:image/png;base64,.....)
-DATA_URI_LINE_RE = re.compile(r"^\s*\[\]\(data:image\/[^;]+;base64,[^)]+\)\s*$")
-
-# KaTeX (strict warn) is unhappy with some Unicode whitespace/invisible chars that
-# appear in Notion exports (e.g. thin space/hair space/invisible separator).
-# We normalize them to plain ASCII equivalents.
-UNICODE_NORMALIZE_MAP: Dict[str, str] = {
-    "\u00A0": " ",  # NO-BREAK SPACE
-    "\u2005": " ",  # FOUR-PER-EM SPACE
-    "\u2009": " ",  # THIN SPACE
-    "\u200A": " ",  # HAIR SPACE
-    "\u200B": "",   # ZERO WIDTH SPACE
-    "\u2060": "",   # WORD JOINER
-    "\u2063": "",   # INVISIBLE SEPARATOR
-    "\uFEFF": "",   # ZERO WIDTH NO-BREAK SPACE (BOM)
+IMG_ATTR_TAIL_RE = re.compile(r"!\[[^\[\]]*\]\([^)\]]*(?:\](?!\()[^)\]]*)*\)\{[^{}]*\}")
+
+# KaTeX (strict warn) is unhappy with Unicode whitespace and invisible format
+# characters, which Notion exports are full of (thin/hair spaces, zero-width
+# spaces, word joiners, BOMs, bidi marks, ...). Every space separator (Zs, Zl, Zp)
+# becomes a plain space and every format character (Cf) is dropped, except the
+# joiners that hold emoji and Indic/Persian script sequences together.
+# Codepoints of those categories only occur in planes 0, 1 and 14.
+UNICODE_CATEGORY_MAP: Dict[str, str] = {"Zs": " ", "Zl": " ", "Zp": " ", "Cf": ""}
+UNICODE_KEEP: FrozenSet[str] = frozenset(
+    ["\u0020", "\u200C", "\u200D"]  # SPACE, ZERO WIDTH NON-JOINER, ZERO WIDTH JOINER
+    + [chr(cp) for cp in range(0xE0020, 0xE0080)]  # TAG characters (subdivision flag emoji)
+)
+
+# ASCII lookalikes that paste in from other editors and that KaTeX rejects (or
+# draws as something else) in math: unusual hyphens and slashes, and the
+# fullwidth forms of ASCII (U+FF01..U+FF5E) from CJK input methods. Folded inside
+# math spans only: in prose they are legitimate (CJK punctuation), and "＄［］（）＊"
+# folded to ASCII would turn into math delimiters, links and emphasis.
+UNICODE_LOOKALIKE_MAP: Dict[str, str] = {
+    "\u2010": "-",  # HYPHEN
+    "\u2011": "-",  # NON-BREAKING HYPHEN
+    "\u2044": "/",  # FRACTION SLASH
+    "\u2215": "/",  # DIVISION SLASH
+    "\u2236": ":",  # RATIO
+    **{chr(cp): chr(cp - 0xFEE0) for cp in range(0xFF01, 0xFF5F)},
 }
 
-UNICODE_NORMALIZE_RE = re.compile(
-    "[" + "".join(re.escape(k) for k in UNICODE_NORMALIZE_MAP.keys()) + "]"
-)
+
+def _unicode_category_map() -> Dict[str, str]:
+    out: Dict[str, str] = {}
+    for cp in itertools.chain(range(0x20000), range(0xE0000, 0xE1000)):
+        ch = chr(cp)
+        repl = UNICODE_CATEGORY_MAP.get(unicodedata.category(ch))
+        if repl is not None and ch not in UNICODE_KEEP:
+            out[ch] = repl
+    return out
+
+
+# Built once at import. The key sets answer "does this text need normalizing?"
+# without a regex. UNICODE_NORMALIZE_MAP applies everywhere, MATH_UNICODE_MAP
+# (the same plus the lookalikes) inside $...$ / $$...$$.
+UNICODE_NORMALIZE_MAP: Dict[str, str] = _unicode_category_map()
+UNICODE_NORMALIZE_CHARS: FrozenSet[str] = frozenset(UNICODE_NORMALIZE_MAP)
+MATH_UNICODE_MAP: Dict[str, str] = {**UNICODE_NORMALIZE_MAP, **UNICODE_LOOKALIKE_MAP}
+MATH_UNICODE_CHARS: FrozenSet[str] = frozenset(MATH_UNICODE_MAP)
 
 
 @dataclasses.dataclass(frozen=True)
@@ -75,106 +156,434 @@ class Issue:
     excerpt: str
 
 
+def has_katex_unicode(text: str) -> bool:
+    return not text.isascii() and not UNICODE_NORMALIZE_CHARS.isdisjoint(text)
+
+
+def _normalize(
+    text: str,
+    counts: Dict[str, int],
+    chars: FrozenSet[str] = UNICODE_NORMALIZE_CHARS,
+    table: Dict[str, str] = UNICODE_NORMALIZE_MAP,
+) -> str:
+    # ASCII text (nearly every line) is returned as is; otherwise set operations
+    # find the characters present and each is counted and replaced with one
+    # str.count/str.replace, all in C. (str.translate with this table is slower:
+    # it raises and clears a KeyError for every character that isn't in it.)
+    if text.isascii() or chars.isdisjoint(text):
+        return text
+    for ch in chars.intersection(text):
+        counts[ch] = counts.get(ch, 0) + text.count(ch)
+        text = text.replace(ch, table[ch])
+    return text
+
+
+def math_spans(text: str, in_display: bool = False) -> Tuple[List[Tuple[int, int]], bool]:
+    """
+    (start, end) of the math in `text`, and whether a `$$` block is still open at
+    its end. `in_display` says whether the text starts inside one. Follows
+    md_stream.MATH_SPAN_RE (inline math doesn't cross a newline), except that a
+    `$$` opens display math even when it is closed on a later line.
+    """
+    spans: List[Tuple[int, int]] = []
+    pos = start = 0
+    while True:
+        if in_display:
+            end = text.find("$$", pos)
+            if end == -1:
+                spans.append((start, len(text)))
+                return spans, True
+            spans.append((start, end))
+            pos, in_display = end + 2, False
+        i = text.find("$", pos)
+        if i == -1:
+            return spans, False
+        if text.startswith("$$", i):
+            pos = start = i + 2
+            in_display = True
+            continue
+        j = text.find("$", i + 1)
+        if j == -1:
+            return spans, False
+        if "\n" in text[i + 1 : j]:
+            pos = i + 1
+            continue
+        spans.append((i + 1, j))
+        pos = j + 1
+
+
+def normalize_unicode(
+    text: str, in_display: bool = False, math_only: bool = False
+) -> Tuple[str, Dict[str, int], bool]:
+    """
+    Replace/strip Unicode that breaks KaTeX: UNICODE_NORMALIZE_MAP everywhere
+    (or nowhere, with `math_only`), MATH_UNICODE_MAP inside math spans.
+    Returns (new_text, counts_by_codepoint_string, in_display), `in_display` as
+    for `math_spans`.
+    """
+    counts: Dict[str, int] = {}
+    if not math_only:
+        text = _normalize(text, counts)
+    if not in_display and "$" not in text:
+        return text, counts, False
+    if text.isascii():
+        # Nothing to fold; only a "$$" can open or close a display block.
+        return text, counts, math_spans(text, in_display)[1] if "$$" in text else in_display
+    spans, in_display_after = math_spans(text, in_display)
+    math_counts: Dict[str, int] = {}
+    parts: List[str] = []
+    pos = 0
+    for start, end in spans:
+        parts.append(text[pos:start])
+        parts.append(_normalize(text[start:end], math_counts, MATH_UNICODE_CHARS, MATH_UNICODE_MAP))
+        pos = end
+    if not math_counts:
+        return text, counts, in_display_after
+    parts.append(text[pos:])
+    for ch, n in math_counts.items():
+        counts[ch] = counts.get(ch, 0) + n
+    return "".join(parts), counts, in_display_after
+
+
 def normalize_katex_unicode(text: str) -> Tuple[str, Dict[str, int]]:
     """
-    Replace/strip problematic Unicode chars that often break KaTeX rendering.
+    Replace/strip problematic Unicode chars that often break KaTeX rendering:
+    whitespace and invisible characters everywhere, ASCII lookalikes in math.
     Returns (new_text, counts_by_codepoint_string).
     """
-    counts: Dict[str, int] = {}
+    if text.isascii():
+        return text, {}
+    text, counts, _ = normalize_unicode(text)
+    return text, counts
 
-    def repl(m: re.Match[str]) -> str:
-        ch = m.group(0)
-        counts[ch] = counts.get(ch, 0) + 1
-        return UNICODE_NORMALIZE_MAP.get(ch, "")
 
-    return UNICODE_NORMALIZE_RE.sub(repl, text), counts
+def normalize_math_unicode(text: str, in_display: bool = False) -> Tuple[str, Dict[str, int], bool]:
+    """
+    `normalize_katex_unicode` restricted to the math spans of one line, so prose
+    is left exactly as written. Returns (new_text, counts, in_display) with
+    `in_display` as for `math_spans`.
+    """
+    return normalize_unicode(text, in_display, math_only=True)
 
 
-def iter_issues(lines: List[str]) -> List[Issue]:
-    issues: List[Issue] = []
+def _unparsed_image_syntax(s: str) -> bool:
+    # "![...(" exists but our regex can't match any image on the line.
+    return "![" in s and "](" in s and not IMG_RE.search(s) and not IMG_ATTR_TAIL_RE.search(s)
 
-    for i, line in enumerate(lines, start=1):
-        s = line.rstrip("\n")
 
-        # 0) Huge inline base64 blobs (usually from exports) — should be removed.
-        if DATA_URI_LINE_RE.match(s):
-            issues.append(Issue(i, "inline_base64_data_uri", s[:220]))
-            continue
+def _unclosed_paren_after_link(s: str) -> bool:
+    # crude check: count of "](" should not exceed ")"
+    return "![" in s and s.count("](") > s.count(")")
 
-        # 0b) KaTeX-unfriendly Unicode that should be normalized.
-        if UNICODE_NORMALIZE_RE.search(s):
-            issues.append(Issue(i, "katex_unicode_whitespace", s[:220]))
-
-        # 1) Suspicious: "![...(" exists but our regex can't match any image on the line.
-        if (
-            "![" in s
-            and "](" in s
-            and not IMG_RE.search(s)
-            and not IMG_ATTR_TAIL_RE.search(s)
-        ):
-            issues.append(
-                Issue(
-                    line=i,
-                    kind="unparsed_image_syntax",
-                    excerpt=s[:220],
-                )
-            )
 
-        # 2) Unbalanced simple markers for image/link brackets/parens (heuristic).
-        if "![" in s:
-            # crude check: count of "](" should not exceed ")"
-            if s.count("](") > s.count(")"):
-                issues.append(Issue(i, "unclosed_paren_after_link", s[:220]))
-
-        # 3) Titles with extra double quotes inside parentheses: (... "..." "...") is suspicious.
-        # This is exactly what broke rendering earlier.
-        if "![" in s and "](" in s and '"' in s:
-            # Consider only the first "(...)" span after "](" if present.
-            j = s.find("](")
-            if j != -1:
-                k = s.find(")", j + 2)
-                if k != -1:
-                    inside = s[j + 2 : k]
-                    q = inside.count('"')
-                    if q not in (0, 2):
-                        issues.append(Issue(i, "suspicious_quote_count_in_image_parens", s[:220]))
-
-        # 4) Attr tail opened but not closed.
-        if "){" in s and "}" not in s:
-            issues.append(Issue(i, "unclosed_image_attrs_brace", s[:220]))
+def _suspicious_quote_count(s: str) -> bool:
+    # Titles with extra double quotes inside parentheses: (... "..." "...") is suspicious.
+    # This is exactly what broke rendering earlier.
+    if not ("![" in s and "](" in s and '"' in s):
+        return False
+    # Consider only the first "(...)" span after "](" if present.
+    j = s.find("](")
+    k = s.find(")", j + 2)
+    return k != -1 and s[j + 2 : k].count('"') not in (0, 2)
+
+
+@dataclasses.dataclass(frozen=True)
+class LintRule:
+    """A single-line check; `id` is also the `Issue.kind` it reports."""
+
+    id: str
+    description: str
+    check: Callable[[str], bool]
+
+
+# Rule registry, in report order. Every rule looks at one line only, so a line's
+# issues never depend on its neighbours (lint_md.py relies on this to re-lint just
+# the lines that changed).
+LINT_RULES: Dict[str, LintRule] = {
+    r.id: r
+    for r in (
+        # Huge inline base64 blobs (usually from exports) — should be removed.
+        # A line that matches gets no other checks.
+        LintRule(
+            "inline_base64_data_uri",
+            "Standalone inline base64 image line",
+            lambda s: DATA_URI_LINE_RE.match(s) is not None,
+        ),
+        LintRule(
+            "katex_unicode_whitespace",
+            "Unicode whitespace or invisible character KaTeX rejects",
+            has_katex_unicode,
+        ),
+        LintRule(
+            "unparsed_image_syntax",
+            "Image-like syntax the image regex cannot parse",
+            _unparsed_image_syntax,
+        ),
+        LintRule(
+            "unclosed_paren_after_link",
+            "More '](' than ')' on an image line",
+            _unclosed_paren_after_link,
+        ),
+        LintRule(
+            "suspicious_quote_count_in_image_parens",
+            "Image title with an odd number of double quotes",
+            _suspicious_quote_count,
+        ),
+        LintRule(
+            "unclosed_image_attrs_brace",
+            "Image attribute tail '){' without a closing '}'",
+            lambda s: "){" in s and "}" not in s,
+        ),
+    )
+}
+
+DATA_URI_RULE = "inline_base64_data_uri"
+KATEX_UNICODE_RULE = "katex_unicode_whitespace"
 
+
+def select_rules(enable: Optional[Iterable[str]] = None, disable: Iterable[str] = ()) -> List[str]:
+    """Rule ids to run: `enable` (default: all) minus `disable`. Raises ValueError on unknown ids."""
+    enable = list(LINT_RULES) if enable is None else list(enable)
+    disable = list(disable)
+    unknown = sorted(set(enable + disable) - set(LINT_RULES))
+    if unknown:
+        raise ValueError(f"unknown lint rule(s): {', '.join(unknown)} (known: {', '.join(LINT_RULES)})")
+    return [r for r in LINT_RULES if r in enable and r not in disable]
+
+
+def line_issues(i: int, s: str, rules: Optional[Container[str]] = None) -> List[Issue]:
+    """
+    Lint a single (already KaTeX-normalized) line without its trailing newline.
+    `rules` limits the checks to those rule ids (default: all of LINT_RULES).
+    """
+    excerpt = s[:220]
+    if LINT_RULES[DATA_URI_RULE].check(s):
+        return [Issue(i, DATA_URI_RULE, excerpt)] if rules is None or DATA_URI_RULE in rules else []
+    return [
+        Issue(i, rule.id, excerpt)
+        for rule in LINT_RULES.values()
+        if rule.id != DATA_URI_RULE and (rules is None or rule.id in rules) and rule.check(s)
+    ]
+
+
+def iter_issues(lines: List[str], rules: Optional[Container[str]] = None) -> List[Issue]:
+    issues: List[Issue] = []
+    for i, line in enumerate(lines, start=1):
+        issues.extend(line_issues(i, line.rstrip("\n"), rules))
     return issues
 
 
-def strip_image_paths(text: str, placeholder: str = PLACEHOLDER) -> Tuple[str, int]:
+class ImageExtractor:
     """
-    Replace markdown image URLs with a placeholder, preserving alt and optional title.
-    Returns (new_text, num_replaced).
+    Decode inline base64 images into `out_dir`, named by content hash.
+
+    Payloads are decoded incrementally (4-character-aligned slices) straight into
+    a temp file while being hashed, so a payload that `iter_bounded_lines` spooled
+    to disk is never materialized in memory.
     """
 
-    replaced = 0
+    def __init__(self, out_dir: pathlib.Path, url_prefix: str = FIGURES_URL, spool: Optional[RunSpool] = None) -> None:
+        self.out_dir = out_dir
+        self.url_prefix = url_prefix.rstrip("/")
+        self.spool = spool
+        self.files_written = 0
+        self.duplicates = 0
+        self.bytes_written = 0
+
+    def _pieces(self, payload: str) -> Iterable[str]:
+        if self.spool is None:
+            return (payload,)
+        return self.spool.iter_expanded(payload)
+
+    def extract(self, mime: str, payload: str) -> Optional[str]:
+        """Store the image and return its site URL, or None if the payload isn't valid base64."""
+        ext = DATA_URI_EXT.get(mime.lower(), "bin")
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        h = hashlib.sha256()
+        size = 0
+        fd, tmp_name = tempfile.mkstemp(prefix=".extract-", dir=self.out_dir)
+        try:
+            with os.fdopen(fd, "wb") as out:
+                buf = ""
+                for piece in self._pieces(payload):
+                    buf += "".join(piece.split())
+                    n = len(buf) - len(buf) % 4
+                    if not n:
+                        continue
+                    data = base64.b64decode(buf[:n], validate=True)
+                    buf = buf[n:]
+                    h.update(data)
+                    out.write(data)
+                    size += len(data)
+                if buf:
+                    data = base64.b64decode(buf + "=" * (-len(buf) % 4), validate=True)
+                    h.update(data)
+                    out.write(data)
+                    size += len(data)
+        except (binascii.Error, ValueError):
+            os.unlink(tmp_name)
+            return None
+        return self._commit(tmp_name, h.hexdigest(), ext, size)
+
+    def copy(self, f: IO[bytes], ext: str) -> str:
+        """Store an image read from a binary stream (e.g. a zip entry) and return its site URL."""
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        h = hashlib.sha256()
+        size = 0
+        fd, tmp_name = tempfile.mkstemp(prefix=".extract-", dir=self.out_dir)
+        try:
+            with os.fdopen(fd, "wb") as out:
+                for data in iter(lambda: f.read(READ_CHUNK), b""):
+                    h.update(data)
+                    out.write(data)
+                    size += len(data)
+        except BaseException:
+            os.unlink(tmp_name)
+            raise
+        return self._commit(tmp_name, h.hexdigest(), ext, size)
+
+    def _commit(self, tmp_name: str, digest: str, ext: str, size: int) -> str:
+        name = f"{digest[:16]}.{ext}"
+        target = self.out_dir / name
+        if target.exists():
+            os.unlink(tmp_name)
+            self.duplicates += 1
+        else:
+            os.chmod(tmp_name, 0o644)
+            os.replace(tmp_name, target)
+            self.files_written += 1
+            self.bytes_written += size
+        return f"{self.url_prefix}/{name}"
+
+
+class StripImagePaths(Transform):
+    """
+    Streaming form of `strip_image_paths`: drops data-uri lines, normalizes
+    KaTeX-unfriendly Unicode and swaps image URLs for the placeholder.
 
-    # First, drop any standalone data-uri link lines to avoid massive markdown bloat.
-    lines = text.splitlines(True)
-    kept: List[str] = []
-    for line in lines:
-        if DATA_URI_LINE_RE.match(line.rstrip("\n")):
-            replaced += 1
-            continue
-        kept.append(line)
-    text = "".join(kept)
+    With `lint=True` it also runs `line_issues` on each normalized source line
+    in the same pass, so `main` doesn't need a second scan for its report.
 
-    # Normalize problematic unicode (helps KaTeX warnings).
-    text, _counts = normalize_katex_unicode(text)
+    `resolve(url)`, if given, is asked first for every image URL that isn't a
+    data uri; a non-None result replaces the URL instead of the placeholder
+    (import_notion.py uses it to copy images out of the export).
 
-    def repl(m: re.Match[str]) -> str:
-        nonlocal replaced
-        replaced += 1
+    With `math_only=True` only `$...$` / `$$...$$` spans (outside code fences)
+    are normalized, prose and code are passed through untouched, and the lint
+    skips the KaTeX Unicode rule accordingly.
+    """
+
+    name = "strip_images"
+
+    def __init__(
+        self,
+        placeholder: str = PLACEHOLDER,
+        lint: bool = False,
+        extractor: Optional[ImageExtractor] = None,
+        resolve: Optional[Callable[[str], Optional[str]]] = None,
+        math_only: bool = False,
+    ) -> None:
+        self.placeholder = placeholder
+        self.lint = lint
+        self.extractor = extractor
+        self.resolve = resolve
+        self.math_only = math_only
+        self._lint_rules = [r for r in LINT_RULES if r != KATEX_UNICODE_RULE] if math_only else None
+        # Whether a "$$" display block is open at the end of the last line.
+        self._in_display = False
+        self.replaced = 0
+        self.extracted = 0
+        self.resolved = 0
+        self.norm_counts: Dict[str, int] = {}
+        self.issues: List[Issue] = []
+        # Lines held back while an image's alt text ("![...") runs onto the next line.
+        self._held: List[Line] = []
+        self._alt_open = False
+
+    def _extract(self, text: str) -> Optional[str]:
+        m = DATA_URI_RE.search(text)
+        if m is None or self.extractor is None:
+            return None
+        url = self.extractor.extract(m.group("mime"), m.group("payload"))
+        if url is not None:
+            self.extracted += 1
+        return url
+
+    def _repl(self, m: re.Match[str]) -> str:
         alt = m.group("alt") or ""
         title = m.group("title") or ""
-        return f"![{alt}]({placeholder}{title})"
+        if self.extractor is not None and m.group("url").startswith("data:image/"):
+            url = self._extract(m.group("url"))
+            if url is not None:
+                return f"![{alt}]({url}{title})"
+        elif self.resolve is not None:
+            url = self.resolve(m.group("url"))
+            if url is not None:
+                self.resolved += 1
+                return f"![{alt}]({url}{title})"
+        self.replaced += 1
+        return f"![{alt}]({self.placeholder}{title})"
+
+    def _release(self) -> List[Line]:
+        held, self._held, self._alt_open = self._held, [], False
+        if len(held) == 1:
+            line = held[0]
+            with stage("substitute", len(line.text)):
+                text = IMG_RE.sub(self._repl, line.text)
+            return [line if text == line.text else line.retext(text)]
+        joined = "".join(ln.text + ln.eol for ln in held[:-1]) + held[-1].text
+        with stage("substitute", len(joined)):
+            text = IMG_RE.sub(self._repl, joined)
+        if text == joined:
+            return held
+        return [replace(held[0].retext(text), eol=held[-1].eol)]
+
+    def feed(self, line: Line) -> Iterable[Line]:
+        with stage("normalize", len(line.text)):
+            if line.kind in (CODE, FENCE):
+                # No math in code; whitespace is still normalized unless math_only.
+                counts = {}
+                text = line.text if self.math_only else _normalize(line.text, counts)
+            else:
+                text, counts, self._in_display = normalize_unicode(line.text, self._in_display, self.math_only)
+        for ch, cnt in counts.items():
+            self.norm_counts[ch] = self.norm_counts.get(ch, 0) + cnt
+        if self.lint:
+            with stage("lint", len(text)):
+                self.issues.extend(line_issues(line.lineno, text, self._lint_rules))
+
+        # Drop standalone data-uri link lines to avoid massive markdown bloat
+        # (or, when extracting, turn them into normal image references).
+        if line.kind == DATA_URI:
+            url = self._extract(text)
+            if url is None:
+                self.replaced += 1
+                return
+            if self._held:
+                yield from self._release()
+            yield line.retext(f"![]({url})")
+            return
+
+        self._held.append(line if text == line.text else line.retext(text))
+        last_open, last_close = text.rfind("!["), text.rfind("]")
+        if last_open > last_close:
+            self._alt_open = True
+        elif last_close != -1:
+            self._alt_open = False
+        if not self._alt_open or len(self._held) >= MAX_SPAN_LINES:
+            yield from self._release()
+
+    def finish(self) -> Iterable[Line]:
+        return self._release() if self._held else ()
 
-    return IMG_RE.sub(repl, text), replaced
+
+def strip_image_paths(text: str, placeholder: str = PLACEHOLDER) -> Tuple[str, int]:
+    """
+    Replace markdown image URLs with a placeholder, preserving alt and optional title.
+    Returns (new_text, num_replaced).
+    """
+    t = StripImagePaths(placeholder=placeholder)
+    return transform_text(text, [t]), t.replaced
 
 
 def main(argv: List[str]) -> int:
@@ -197,6 +606,29 @@ def main(argv: List[str]) -> int:
         default=PLACEHOLDER,
         help=f"Placeholder URL to use (default: {PLACEHOLDER})",
     )
+    ap.add_argument(
+        "--extract-images",
+        action="store_true",
+        help="Decode inline base64 images into --figures-dir (named by content hash) instead of dropping them",
+    )
+    ap.add_argument(
+        "--figures-dir",
+        type=pathlib.Path,
+        default=FIGURES_DIR,
+        help=f"Where --extract-images writes files (default: {FIGURES_DIR.relative_to(REPO_ROOT)})",
+    )
+    ap.add_argument(
+        "--figures-url",
+        type=str,
+        default=FIGURES_URL,
+        help=f"URL prefix for extracted images (default: {FIGURES_URL})",
+    )
+    ap.add_argument(
+        "--normalize-math-only",
+        action="store_true",
+        help="Normalize KaTeX-unfriendly Unicode inside $...$ / $$...$$ only; leave prose as written",
+    )
+    add_profile_arg(ap)
     args = ap.parse_args(argv)
 
     in_path: pathlib.Path = args.input
@@ -204,26 +636,39 @@ def main(argv: List[str]) -> int:
         print(f"ERROR: input not found: {in_path}", file=sys.stderr)
         return 2
 
-    raw = in_path.read_text(encoding="utf-8")
-    out_text, n = strip_image_paths(raw, placeholder=args.placeholder)
-
     out_path: pathlib.Path
     if args.in_place:
         out_path = in_path
     else:
         out_path = args.output or in_path.with_suffix(in_path.suffix + ".noimg.md")
 
-    out_path.write_text(out_text, encoding="utf-8")
-
-    # Report issues on a KaTeX-normalized view of the source, since we auto-fix
-    # these characters for downstream rendering.
-    raw_norm, norm_counts = normalize_katex_unicode(raw)
-    lines = raw_norm.splitlines()
-    issues = iter_issues(lines)
+    # One streaming pass: the transform lints each KaTeX-normalized source line (we
+    # auto-fix these characters for downstream rendering) while it rewrites images,
+    # and output is written as it is produced. Long base64 payloads are spooled to
+    # disk by the reader, so memory stays flat however large the export is.
+    with profiling(args.profile), span("transform", in_path.stat().st_size, path=str(in_path)):
+        with RunSpool() as spool, in_path.open(encoding="utf-8") as f, atomic_output(out_path) as out:
+            extractor = ImageExtractor(args.figures_dir, args.figures_url, spool) if args.extract_images else None
+            t = StripImagePaths(
+                placeholder=args.placeholder,
+                lint=True,
+                extractor=extractor,
+                math_only=args.normalize_math_only,
+            )
+            for ln in run(tokenize(iter_bounded_lines(f, spool)), profiled([t], in_path)):
+                with stage("write", len(ln.text)):
+                    spool.write_expanded(ln.text + ln.eol, out)
+    n, norm_counts, issues = t.replaced, t.norm_counts, t.issues
 
     print(f"Input:  {in_path}")
     print(f"Output: {out_path}")
     print(f"Images rewritten: {n}")
+    if extractor is not None:
+        print(
+            f"Images extracted: {t.extracted} -> {extractor.out_dir} "
+            f"({extractor.files_written} new files, {extractor.bytes_written} bytes; "
+            f"{extractor.duplicates} duplicates)"
+        )
     if norm_counts:
         total = sum(norm_counts.values())
         parts = []
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Run any combination of the content transforms over markdown in ONE pass.
+
+The individual scripts still work on their own, but chaining them by hand
+(strip -> captions -> footnotes -> math) re-reads and re-scans every document
+once per script. This runner tokenizes each file once with `md_stream` and
+streams the lines through every enabled transform in the same order:
+
+  --strip-images  strip_image_paths_and_check_md.StripImagePaths
+  --captions      figure_captions_to_image_titles.CaptionsToTitles
+  --footnotes     external_links_to_references.ExternalLinksToFootnotes
+  --math          replace_math.ITagsToMath
+
+Without --in-place (or --output) it only prints what would change. --profile
+writes a timing trace (see profiling.py).
+
+Usage:
+  python scripts/transform_md.py src/maintext --captions --footnotes --math --in-place
+"""
+
+from __future__ import annotations
+
+import argparse
+import pathlib
+import sys
+from typing import List, Optional
+
+from external_links_to_references import ExternalLinksToFootnotes, iter_md_files
+from figure_captions_to_image_titles import CaptionsToTitles
+from footnote_registry import DEFAULT_REGISTRY, REPO_ROOT, FootnoteRegistry
+from md_stream import Transform, transform_text
+from profiling import add_profile_arg, profiled, profiling, span
+from strip_image_paths_and_check_md import PLACEHOLDER, StripImagePaths
+
+# replace_math.py lives at the repo root.
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+from replace_math import ITagsToMath  # noqa: E402
+
+
+def build_transforms(args: argparse.Namespace, registry: Optional[FootnoteRegistry] = None) -> List[Transform]:
+    transforms: List[Transform] = []
+    if args.strip_images:
+        transforms.append(StripImagePaths(placeholder=args.placeholder, math_only=args.normalize_math_only))
+    if args.captions:
+        transforms.append(
+            CaptionsToTitles(
+                normalize_asset_paths=args.normalize_asset_paths,
+                normalize_existing_titles=args.normalize_existing_titles,
+            )
+        )
+    if args.footnotes:
+        transforms.append(ExternalLinksToFootnotes(registry=registry))
+    if args.math:
+        transforms.append(ITagsToMath())
+    return transforms
+
+
+def summarize(transforms: List[Transform]) -> str:
+    parts: List[str] = []
+    for t in transforms:
+        if isinstance(t, StripImagePaths):
+            parts.append(f"images_rewritten={t.replaced}")
+        elif isinstance(t, CaptionsToTitles):
+            parts.append(f"images_titled={t.stats.images_titled}")
+            parts.append(f"captions_removed={t.stats.captions_removed}")
+        elif isinstance(t, ExternalLinksToFootnotes):
+            parts.append(f"new_footnotes={len(t.new_footnotes)}")
+        elif isinstance(t, ITagsToMath):
+            parts.append(f"i_tags_converted={t.converted}")
+            parts.append(f"math_rule_hits={t.rule_hits}")
+    return " ".join(parts)
+
+
+def add_transform_args(ap: argparse.ArgumentParser) -> None:
+    ap.add_argument("--strip-images", action="store_true", help="Replace image URLs with a placeholder")
+    ap.add_argument(
+        "--placeholder",
+        type=str,
+        default=PLACEHOLDER,
+        help=f"Placeholder URL to use with --strip-images (default: {PLACEHOLDER})",
+    )
+    ap.add_argument(
+        "--normalize-math-only",
+        action="store_true",
+        help="With --strip-images: normalize KaTeX-unfriendly Unicode inside math spans only",
+    )
+    ap.add_argument("--captions", action="store_true", help="Move figure captions into image titles")
+    ap.add_argument(
+        "--normalize-asset-paths",
+        action="store_true",
+        help='With --captions: prefix image urls like "assets/..." with "/assets/..."',
+    )
+    ap.add_argument(
+        "--normalize-existing-titles",
+        action="store_true",
+        help="With --captions: clean up existing image titles",
+    )
+    ap.add_argument("--footnotes", action="store_true", help="Turn external links into footnote references")
+    ap.add_argument(
+        "--registry",
+        type=pathlib.Path,
+        default=DEFAULT_REGISTRY,
+        help=f"With --footnotes: corpus-wide URL -> id registry (default: {DEFAULT_REGISTRY.relative_to(REPO_ROOT)})",
+    )
+    ap.add_argument("--no-registry", action="store_true", help="With --footnotes: pick footnote ids per file")
+    ap.add_argument("--math", action="store_true", help="Convert <i>...</i> to $...$")
+
+
+def main(argv: List[str]) -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("path", type=pathlib.Path, help="Path to a .md file or a directory to process")
+    add_transform_args(ap)
+    ap.add_argument("--in-place", action="store_true", help="Write changes back to the file(s)")
+    ap.add_argument(
+        "--output",
+        type=pathlib.Path,
+        default=None,
+        help="Output path (single-file input only)",
+    )
+    add_profile_arg(ap)
+    args = ap.parse_args(argv)
+
+    root: pathlib.Path = args.path
+    if not root.exists():
+        print(f"ERROR: not found: {root}", file=sys.stderr)
+        return 2
+    if args.output is not None and not root.is_file():
+        print("ERROR: --output requires a single input file", file=sys.stderr)
+        return 2
+
+    if not build_transforms(args):
+        print("ERROR: no transforms enabled (see --help)", file=sys.stderr)
+        return 2
+
+    registry = None
+    if args.footnotes and not args.no_registry:
+        # Dry runs look ids up but never write the registry.
+        registry = FootnoteRegistry(args.registry, readonly=not (args.in_place or args.output is not None))
+
+    changed_any = False
+    with profiling(args.profile):
+        for p in iter_md_files(root):
+            # Transforms carry per-document state, so build a fresh chain per file.
+            transforms = build_transforms(args, registry)
+            with span("read", path=str(p)) as sp:
+                raw = p.read_text(encoding="utf-8")
+                sp.bytes = len(raw)
+            with span("transform", len(raw), path=str(p)):
+                out = transform_text(raw, profiled(transforms, p))
+            changed = out != raw
+            changed_any = changed_any or changed
+
+            with span("write", len(out), path=str(p)):
+                if args.output is not None:
+                    args.output.write_text(out, encoding="utf-8")
+                elif changed and args.in_place:
+                    p.write_text(out, encoding="utf-8")
+
+            print(f"{p}: {'updated' if changed else 'no changes'}; {summarize(transforms)}")
+
+    if not args.in_place and args.output is None:
+        print("\n(dry-run) Re-run with --in-place to apply changes.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
@@ -1,5 +1,21 @@
+// KaTeX faces the posts' math uses, from scripts/katex_fonts.py. KaTeX's CSS lists
+// woff2, woff and ttf for each of its 20 faces; only woff2 files of used faces are
+// worth preloading (browsers that read woff2 never fetch the other formats).
+// Without the list, every KaTeX woff2 is preloaded.
+const katexFaces = Object.values(
+  import.meta.glob("./lib/generated/katex-fonts.json", { eager: true, import: "default" })
+)[0]?.faces;
+
+const KATEX_FONT_RE = /\/(KaTeX_[A-Za-z0-9]+-[A-Za-z]+)\.[^/]*$/;
+
+function preloadFont(path) {
+  const face = path.match(KATEX_FONT_RE)?.[1];
+  if (!face) return true;
+  return path.endsWith(".woff2") && (!katexFaces || face in katexFaces);
+}
+
 export const handle = async ({ event, resolve }) => {
   return resolve(event, {
-    preload: ({ type }) => type === "font" || type === "js" || type === "css",
+    preload: ({ type, path }) => (type === "font" ? preloadFont(path) : type === "js" || type === "css"),
   });
 };
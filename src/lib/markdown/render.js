@@ -0,0 +1,711 @@
+// Markdown rendering shared by Markdown.svelte and the build-time prerender
+// (scripts/prerender_markdown.py via scripts/markdown_worker.js): the marked
+// extensions and renderer, footnote collection/numbering and directive chunking.
+// Plain JS (typed with JSDoc) so node can run it without a compile step.
+import { marked } from "marked";
+import katex from "katex";
+
+/** @typedef {{ katex: string; display: Record<string, string>; inline: Record<string, string> }} MathManifest */
+/** @typedef {{ version: number; images: Record<string, [number, number]> }} ImageManifest */
+/**
+ * @typedef {| { type: "text"; content: string }
+ *   | { type: "jumpbox"; id: string }
+ *   | { type: "small"; content: string }
+ *   | { type: "callout"; variant: "note" | "tip" | "warning" | "info" | "takeaway"; title: string; content: string }
+ *   | { type: "fold"; title: string; open: boolean; content: string }
+ *   | { type: "h2"; id: string; text: string }
+ *   | { type: "h3"; id: string; text: string }} Chunk
+ */
+
+// Bump when anything here changes the generated HTML; prerendered output from
+// another version is ignored.
+export const RENDER_VERSION = 2;
+
+export function normalizeFootnoteId(id) {
+  // Keep in sync with the renderer/link ids; allow common id chars like '-' and '_'.
+  return String(id).replace(/[^a-zA-Z0-9\-_]/g, "");
+}
+
+/** @type {MathManifest | undefined} */
+let prerenderedMath = undefined;
+
+/**
+ * Use build-time KaTeX output (scripts/prerender_math.py) for matching expressions.
+ * Ignored when it was rendered with a different KaTeX version.
+ * @param {MathManifest | undefined} manifest
+ */
+export function useMathManifest(manifest) {
+  prerenderedMath = manifest?.katex === katex.version ? manifest : undefined;
+}
+
+const IMAGE_MANIFEST_VERSION = 1;
+
+/** @type {Record<string, [number, number]> | undefined} */
+let imageSizes = undefined;
+
+/**
+ * Use build-time image sizes (scripts/image_dims.py) for width/height attributes.
+ * @param {ImageManifest | undefined} manifest
+ */
+export function useImageManifest(manifest) {
+  imageSizes = manifest?.version === IMAGE_MANIFEST_VERSION ? manifest.images : undefined;
+}
+
+// Attributes for an <img>: its intrinsic width/height from the image manifest, so
+// the layout is reserved before it loads, and lazy, off-main-thread loading. Any
+// of these set explicitly with {attrs} wins (a lone width keeps the aspect ratio).
+/**
+ * @param {string} src
+ * @param {Record<string, string>} [attrs]
+ */
+function imageLoadAttrs(src, attrs = {}) {
+  const has = (k) => Object.prototype.hasOwnProperty.call(attrs, k);
+  let out = "";
+  const size = imageSizes && Object.prototype.hasOwnProperty.call(imageSizes, src) ? imageSizes[src] : undefined;
+  if (size && !has("width") && !has("height")) out += ` width="${size[0]}" height="${size[1]}"`;
+  if (!has("loading")) out += ` loading="lazy"`;
+  if (!has("decoding")) out += ` decoding="async"`;
+  return out;
+}
+
+function renderMath(tex, displayMode) {
+  const prerendered = (displayMode ? prerenderedMath?.display : prerenderedMath?.inline)?.[tex];
+  if (prerendered !== undefined) return prerendered;
+  try {
+    return katex.renderToString(tex, { throwOnError: false, displayMode });
+  } catch {
+    const tag = displayMode ? "pre" : "code";
+    return `<${tag} class="katex-error">${tex}</${tag}>`;
+  }
+}
+
+/** @param {string} md */
+export function renderMarkdown(md) {
+  return /** @type {string} */ (marked.parse(md, { smartypants: true }));
+}
+
+/** @param {string} text */
+export function renderHeadingInline(text) {
+  return /** @type {string} */ (marked.parseInline(text, { smartypants: true }));
+}
+
+// Prepend SvelteKit base path to absolute src/href attributes (e.g. /assets/...)
+// so images resolve correctly on GitHub Pages where the site lives under a subpath.
+/**
+ * @param {string} html
+ * @param {string} base
+ */
+export function withBase(html, base) {
+  if (!base) return html;
+  return html.replace(/(<(?:img|source|video)\b[^>]*\s(?:src|poster))="\/(?!\/)/g, `$1="${base}/`);
+}
+
+const mathBlock = {
+  name: "mathBlock",
+  level: "block",
+  start: (src) => src.match(/\$\$/)?.index,
+  tokenizer(src) {
+    const match = /^\$\$([\s\S]+?)\$\$/.exec(src);
+    if (match)
+      return { type: "mathBlock", raw: match[0], text: match[1].trim() };
+  },
+  renderer: (token) =>
+    `<div class="math math-block">${renderMath(token.text, true)}</div>`,
+};
+
+const mathInline = {
+  name: "mathInline",
+  level: "inline",
+  start: (src) => src.match(/\$/)?.index,
+  tokenizer(src) {
+    const match = /^\$([^\$\n]+?)\$/.exec(src);
+    if (match)
+      return { type: "mathInline", raw: match[0], text: match[1].trim() };
+  },
+  renderer: (token) =>
+    `<span class="math math-inline">${renderMath(token.text, false)}</span>`,
+};
+
+// Notion color text extension: ::color[text]::
+const colorText = {
+  name: "colorText",
+  level: "inline",
+  start: (src) => src.match(/::/)?.index,
+  tokenizer(src) {
+    const match = /^::(gray|brown|orange|yellow|green|blue|purple|pink|red)\[([^\]]+?)\]::/.exec(src);
+    if (match) {
+      return { 
+        type: "colorText", 
+        raw: match[0], 
+        color: match[1],
+        text: match[2]
+      };
+    }
+  },
+  renderer: (token) => {
+    // Notion's default text colors
+    const colors = {
+      gray: "#9B9A97",
+      brown: "#64473A",
+      orange: "#D9730D",
+      yellow: "#DFAB01",
+      green: "#0F7B6C",
+      blue: "#0B6E99",
+      purple: "#6940A5",
+      pink: "#AD1A72",
+      red: "#E03E3D",
+    };
+    const color = colors[token.color] || colors.gray;
+    // Parse inner Markdown (bold, italic, etc.)
+    const innerHtml = marked.parseInline(token.text);
+    return `<span style="color: ${color};">${innerHtml}</span>`;
+  },
+};
+
+const customRenderer = {
+  link(href, title, text) {
+    const isInternal = /^(\/|#|[A-Za-z0-9\-_]+(\.html?)?$)/.test(href);
+    let out = `<a href="${encodeURI(href)}" class="link"`;
+    if (!isInternal)
+      out += ` target="_blank" rel="external noopener noreferrer"`;
+    if (title) out += ` title="${title}"`;
+    out += `>${text}</a>`;
+    return out;
+  },
+  heading(text, level, raw, slugger) {
+    const id = slugger ? slugger.slug(raw) : slugify(raw || text);
+    // Keep plain heading text; the scroll meter will link to #id
+    return `<h${level} id="${id}">${text}</h${level}>`;
+  },
+  blockquote(quote) {
+    return `<blockquote class="inline-block bg-neutral-50 border-l-4 border-neutral-600 rounded px-3 py-2 align-middle my-2">${quote}</blockquote>`;
+  },
+  image(href, title, text) {
+    // Don't render images with placeholder or empty src (avoid 404s)
+    if (!href || href === '__IMAGE_PLACEHOLDER__' || href.trim() === '') {
+      if (text) {
+        // Render caption only if alt text exists
+        return `<div class="text-left text-gray-400 italic text-sm my-4">[Image: ${text}]</div>`;
+      }
+      return '<!-- image placeholder -->';
+    }
+    const id = text ? `fig-${slugify(text)}` : "";
+    const isVideoHref = /\.(mov|mp4|webm|ogg)(\?.*)?$/i.test(href);
+    let out = "";
+
+    if (isVideoHref) {
+      // .mov is supported in Safari but not Chrome; use GIF fallback for Chrome
+      const isMov = /\.mov(\?.*)?$/i.test(href);
+      const fallbackGif = isMov ? href.replace(/\.mov(\?.*)?$/i, ".gif$1") : null;
+      const baseForMp4 = href.replace(/\.(mov|mp4|webm|ogg)(\?.*)?$/i, ".mp4$2");
+      const sourceType =
+        href.toLowerCase().endsWith(".webm")
+          ? "video/webm"
+          : href.toLowerCase().endsWith(".ogg")
+            ? "video/ogg"
+            : href.toLowerCase().endsWith(".mov")
+              ? "video/quicktime"
+              : "video/mp4";
+      out += `<div class="md-video-wrapper${fallbackGif ? " md-video-with-fallback" : ""}">`;
+      out += `<video class="block mx-auto autoplay-on-fullview md-video unselectable" aria-label="${text || ""}" ${id ? `id="${id}" ` : ""}muted playsinline data-freeze-ms="10000">`;
+      // MP4 first for Chrome; MOV second for Safari (when no MP4 present)
+      if (isMov) {
+        out += `<source src="${baseForMp4}" type="video/mp4" />`;
+      }
+      out += `<source src="${href}#t=0.1" type="${sourceType}" />`;
+      out += `</video>`;
+      if (fallbackGif) {
+        out += `<img class="md-video-fallback block mx-auto unselectable" src="${fallbackGif}" alt="${text || ""}"${imageLoadAttrs(fallbackGif)} />`;
+      }
+      out += `</div>`;
+    } else {
+      out = `<img src="${href}" alt="${text || ''}" ${id ? `id="${id}" ` : ""}class="block mx-auto unselectable"${imageLoadAttrs(href)} />`;
+    }
+
+    // Render caption from image title (match imageAttrExtension behavior)
+    if (title) {
+      const m = /\bFigure\s+(\d+)\b/i.exec(String(title || ""));
+      const figNumAttr = m ? ` data-fig-num="${m[1]}"` : "";
+      const cap = boldFigurePrefix(String(title || ""));
+      out += `<div class='md-figcaption text-left text-gray-500 mb-4 md:px-8 lg:px-12 text-sm'${figNumAttr}>${marked.parse(cap, { smartypants: true })}</div>`;
+    }
+    return out;
+  },
+};
+
+export function boldFigurePrefix(rawTitle) {
+  const s = String(rawTitle || "").trim();
+  // Avoid double-bold if already styled.
+  if (/^(?:\*\*|<strong>|\s*<b>)/i.test(s)) return s;
+  // Bold leading "Figure 12:", "Figure 12.", "Figure 12(a):", etc.
+  return s.replace(
+    /^(Figure\s+\d+(?:\([a-z]\))?\s*(?:[:.]))(\s*)/i,
+    "**$1**$2",
+  );
+}
+
+export function slugify(s) {
+  return String(s || '')
+    .toLowerCase()
+    .replace(/[^a-z0-9]+/g, '-')
+    .replace(/^-+|-+$/g, '');
+}
+
+const imageAttrExtension = {
+  name: "imageAttr",
+  level: "inline",
+  start: (src) => src.indexOf("!["),
+  tokenizer(src) {
+    const re = /^!\[([^\]]*)\]\((\S+?)(?:\s+"([^"]*)")?\)\{([^}]+)\}/;
+    const match = re.exec(src);
+    if (match) {
+      const [raw, alt, srcUrl, title, attrStr] = match;
+      const attrs = {};
+      attrStr.split(/\s+/).forEach((tok) => {
+        if (!tok) return;
+        const eq = tok.indexOf("=");
+        if (eq === -1) {
+          attrs[tok] = "";
+        } else {
+          const k = tok.slice(0, eq);
+          const v = tok.slice(eq + 1).replace(/^["']|["']$/g, "");
+          if (k) attrs[k] = v;
+        }
+      });
+      return { type: "imageAttr", raw, alt, src: srcUrl, title, attrs };
+    }
+  },
+  renderer(token) {
+    const isVideoSrc = /\.(mov|mp4|webm|ogg)(\?.*)?$/i.test(token.src);
+    const declaresVideo =
+      token.attrs["type"] === "video" ||
+      Object.prototype.hasOwnProperty.call(token.attrs, "video");
+    let out = "";
+    if (isVideoSrc || declaresVideo) {
+      const lower = token.src.toLowerCase();
+      const sourceType =
+        token.attrs["source-type"] ||
+        (lower.endsWith(".webm")
+          ? "video/webm"
+          : lower.endsWith(".ogg")
+            ? "video/ogg"
+            : lower.endsWith(".mov")
+              ? "video/quicktime"
+              : "video/mp4");
+
+      // read optional freeze ms from markdown: {... freeze=10000}
+      const freezeMs = token.attrs["freeze"] || "10000";
+
+      const figId = token.attrs["id"] || `fig-${slugify(token.alt || "")}`;
+      out += `<video class="block mx-auto autoplay-on-fullview md-video unselectable" aria-label="${token.alt || ""}" id="${figId}"`;
+      const hasPlaysinline = Object.prototype.hasOwnProperty.call(
+        token.attrs,
+        "playsinline",
+      );
+
+      // forward arbitrary attrs except type/video/source-type/freeze/controls
+      for (const k in token.attrs) {
+        if (
+          k === "type" ||
+          k === "video" ||
+          k === "source-type" ||
+          k === "freeze" ||
+          k === "controls" ||
+          k === "id"
+        )
+          continue;
+        const val = token.attrs[k];
+        out += val === "" ? ` ${k}` : ` ${k}="${val}"`;
+      }
+
+      // autoplay reliability
+      out += " muted playsinline"; // keep muted for autoplay; playsinline for iOS
+      if (!hasPlaysinline) out += " playsinline";
+
+      // carry freeze config for runtime
+      out += ` data-freeze-ms="${freezeMs}"`;
+
+      out += `><source src="${token.src}#t=0.1" type="${sourceType}" /></video>`;
+    } else {
+      const figId = token.attrs["id"] || `fig-${slugify(token.alt)}`;
+      out += `<img src="${token.src}" alt="${token.alt}" id="${figId}" class="block mx-auto unselectable"`;
+      for (const k in token.attrs) {
+        if (k === "id") continue;
+        out += ` ${k}="${token.attrs[k]}"`;
+      }
+      out += `${imageLoadAttrs(token.src, token.attrs)} />`;
+    }
+    if (token.title) {
+      const m = /\bFigure\s+(\d+)\b/i.exec(String(token.title || ""));
+      const figNumAttr = m ? ` data-fig-num="${m[1]}"` : "";
+      const cap = boldFigurePrefix(String(token.title || ""));
+      out += `<div class='md-figcaption text-left text-gray-500 mb-4 md:px-8 lg:px-12 text-sm'${figNumAttr}>${marked.parse(cap, { smartypants: true })}</div>`;
+    }
+    return out;
+  },
+};
+
+marked.use({
+  gfm: true,
+  extensions: [imageAttrExtension, mathBlock, mathInline, colorText],
+  renderer: customRenderer,
+});
+
+const JUMP_RE = /:::jumpbox\s+id="([^"]+)"(?:\s+label="([^"]+)")?\s*:::/gm;
+const TAKE_BEGIN_RE = /:::takeaway_begin:::/gm;
+const TAKE_END_RE = /:::takeaway_end:::/gm;
+const SMALL_BEGIN_RE = /:::small_begin:::/gm;
+const SMALL_END_RE = /:::small_end:::/gm;
+const CALLOUT_BEGIN_RE =
+  /:::callout_begin(?:\s+type="([^"]+)")?(?:\s+title="([^"]+)")?\s*:::/gm;
+const CALLOUT_END_RE = /:::callout_end:::/gm;
+const FOLD_BEGIN_RE =
+  /:::fold_begin(?:\s+title="([^"]+)")?(?:\s+(open))?\s*:::/gm;
+const FOLD_END_RE = /:::fold_end:::/gm;
+const H2_RE = /^##(?!#)\s+(.+?)\s*$/gm;
+const H3_RE = /^###(?!#)\s+(.+?)\s*$/gm;
+
+// Heading ids from the manifest, in document order. Once a heading doesn't match
+// (stale manifest), replay the headings seen so far into a runtime slugger and
+// continue with it, so ids stay identical to a manifest-less render.
+export function createHeadingIds(manifest) {
+  const slugger = createSlugger();
+  const seen = [];
+  let useManifest = !!manifest;
+  return {
+    slug(text) {
+      const entry = useManifest ? manifest.headings[seen.length] : undefined;
+      seen.push(text);
+      if (entry && entry.text === text) return entry.id;
+      if (useManifest) {
+        useManifest = false;
+        for (const prev of seen.slice(0, -1)) slugger.slug(prev);
+      }
+      return slugger.slug(text);
+    },
+  };
+}
+
+export function createSlugger() {
+  const seen = new Map();
+  return {
+    slug(raw) {
+      const base = slugify(raw || "") || "section";
+      const prev = seen.get(base) ?? 0;
+      seen.set(base, prev + 1);
+      return prev === 0 ? base : `${base}-${prev}`;
+    },
+  };
+}
+
+/**
+ * Split footnote definitions out of `md`. `render` turns a note's markdown into
+ * HTML; pass `() => ""` when the HTML comes from a prerender.
+ * @param {string} md
+ * @param {(md: string) => string} [render]
+ */
+export function extractFootnotes(md, render = renderMarkdown) {
+  const lines = md.split("\n");
+  const mainLines = [];
+  const footnotes = [];
+  let current = null;
+
+  for (const line of lines) {
+    const match = line.match(/^\[\^([^\]]+)\]:\s*(.*)$/);
+    if (match) {
+      if (current) footnotes.push(current);
+      const id = match[1];
+      current = { id, safeId: normalizeFootnoteId(id), raw: [match[2]] };
+      continue;
+    }
+
+    if (current) {
+      if (/^\s{2,}|\t/.test(line)) {
+        current.raw.push(line.replace(/^\s+/, ""));
+        continue;
+      }
+      footnotes.push(current);
+      current = null;
+    }
+
+    mainLines.push(line);
+  }
+
+  if (current) footnotes.push(current);
+
+  const cleaned = mainLines.join("\n");
+  const notes = footnotes.map((fn) => ({
+    id: fn.id,
+    safeId: fn.safeId,
+    html: render(fn.raw.join("\n")),
+  }));
+
+  return { main: cleaned, notes };
+}
+
+export function computeFootnoteNumbering(main, notes) {
+  // Number by first appearance in the main text.
+  const order = [];
+  const seen = new Set();
+  const re = /\[\^([^\]]+)\]/g;
+  let m;
+  while ((m = re.exec(main)) !== null) {
+    const safeId = normalizeFootnoteId(m[1]);
+    if (!safeId || seen.has(safeId)) continue;
+    seen.add(safeId);
+    order.push(safeId);
+  }
+
+  const noteBySafeId = new Map(notes.map((n) => [n.safeId, n]));
+  const numbered = [];
+  const idToNum = new Map();
+  let next = 1;
+
+  for (const safeId of order) {
+    const n = noteBySafeId.get(safeId);
+    if (!n) continue;
+    idToNum.set(safeId, next);
+    numbered.push({ ...n, num: next });
+    next += 1;
+  }
+
+  // Append any defined-but-unreferenced notes at the end (rare, but keep deterministic).
+  for (const n of notes) {
+    if (idToNum.has(n.safeId)) continue;
+    idToNum.set(n.safeId, next);
+    numbered.push({ ...n, num: next });
+    next += 1;
+  }
+
+  return { idToNum, numbered };
+}
+
+export function replaceFootnoteRefs(md, idToNum) {
+  return md.replace(/\[\^([^\]]+)\]/g, (_m, id) => {
+    const safeId = normalizeFootnoteId(id);
+    const num = idToNum.get(safeId);
+    const label = num ? String(num) : String(id);
+    return `<sup class="footnote-ref"><a href="#fn-${safeId}" data-fn="${safeId}">${label}</a></sup>`;
+  });
+}
+
+/**
+ * Split a (footnote-processed) post into text / directive / heading chunks.
+ * `toc` is the build-time section manifest (src/lib/toc.ts) or null.
+ * @param {string} doc
+ * @param {import("../toc").TocPost | null} toc
+ * @returns {Chunk[]}
+ */
+export function chunkDocument(doc, toc) {
+  const out = [];
+  let pos = 0;
+  const slugger = createHeadingIds(toc);
+
+  while (pos < doc.length) {
+    // Find next possible jumpbox or takeaway-begin after pos
+    JUMP_RE.lastIndex = pos;
+    TAKE_BEGIN_RE.lastIndex = pos;
+    SMALL_BEGIN_RE.lastIndex = pos;
+    CALLOUT_BEGIN_RE.lastIndex = pos;
+    FOLD_BEGIN_RE.lastIndex = pos;
+    H2_RE.lastIndex = pos;
+    H3_RE.lastIndex = pos;
+
+    const j = JUMP_RE.exec(doc);
+    const t = TAKE_BEGIN_RE.exec(doc);
+    const s = SMALL_BEGIN_RE.exec(doc);
+    const c = CALLOUT_BEGIN_RE.exec(doc);
+    const f = FOLD_BEGIN_RE.exec(doc);
+    const h2 = H2_RE.exec(doc);
+    const h3 = H3_RE.exec(doc);
+
+    // No more markers → push rest as text and stop
+    if (!j && !t && !s && !c && !f && !h2 && !h3) {
+      if (pos < doc.length) out.push({ type: "text", content: doc.slice(pos) });
+      break;
+    }
+
+    // Choose the earliest marker by index
+    const j_idx = j ? j.index : Infinity;
+    const t_idx = t ? t.index : Infinity;
+    const s_idx = s ? s.index : Infinity;
+    const c_idx = c ? c.index : Infinity;
+    const f_idx = f ? f.index : Infinity;
+    const h2_idx = h2 ? h2.index : Infinity;
+    const h3_idx = h3 ? h3.index : Infinity;
+    const min_idx = Math.min(j_idx, t_idx, s_idx, c_idx, f_idx, h2_idx, h3_idx);
+
+    if (h2_idx === min_idx) {
+      const begin_idx = h2.index;
+      const begin_end = begin_idx + h2[0].length;
+      if (begin_idx > pos)
+        out.push({ type: "text", content: doc.slice(pos, begin_idx) });
+
+      const text = (h2[1] ?? "").trim();
+      const id = slugger.slug(text);
+      out.push({ type: "h2", id, text });
+
+      pos = begin_end;
+    } else if (h3_idx === min_idx) {
+      const begin_idx = h3.index;
+      const begin_end = begin_idx + h3[0].length;
+      if (begin_idx > pos)
+        out.push({ type: "text", content: doc.slice(pos, begin_idx) });
+
+      const text = (h3[1] ?? "").trim();
+      const id = slugger.slug(text);
+      out.push({ type: "h3", id, text });
+
+      pos = begin_end;
+    } else if (j_idx === min_idx) {
+      // Emit pre-text
+      if (j_idx > pos)
+        out.push({ type: "text", content: doc.slice(pos, j_idx) });
+
+      const id = j[1];
+      out.push({ type: "jumpbox", id });
+
+      // Advance past this jumpbox
+      pos = JUMP_RE.lastIndex;
+    } else if (t_idx === min_idx) {
+      // Takeaway begin comes first
+      const begin_idx = t.index;
+      const begin_end = begin_idx + t[0].length;
+
+      // Emit pre-text
+      if (begin_idx > pos)
+        out.push({ type: "text", content: doc.slice(pos, begin_idx) });
+
+      // Find matching end after the begin
+      TAKE_END_RE.lastIndex = begin_end;
+      const tend = TAKE_END_RE.exec(doc);
+
+      if (!tend) {
+        // No closing marker → treat the begin marker as plain text (no guessing)
+        out.push({
+          type: "text",
+          content: doc.slice(begin_idx, begin_end),
+        });
+        pos = begin_end;
+        continue;
+      }
+
+      const inner_md = doc.slice(begin_end, tend.index).trim();
+      out.push({ type: "callout", variant: "takeaway", title: "", content: inner_md });
+
+      // Advance past the end marker
+      pos = TAKE_END_RE.lastIndex;
+    } else if (s_idx === min_idx) {
+      // Small begin comes first
+      const begin_idx = s.index;
+      const begin_end = begin_idx + s[0].length;
+
+      // Emit pre-text
+      if (begin_idx > pos)
+        out.push({ type: "text", content: doc.slice(pos, begin_idx) });
+
+      // Find matching end after the begin
+      SMALL_END_RE.lastIndex = begin_end;
+      const send = SMALL_END_RE.exec(doc);
+
+      if (!send) {
+        // No closing marker → treat the begin marker as plain text
+        out.push({
+          type: "text",
+          content: doc.slice(begin_idx, begin_end),
+        });
+        pos = begin_end;
+        continue;
+      }
+
+      const inner_md = doc.slice(begin_end, send.index).trim();
+      out.push({ type: "small", content: inner_md });
+
+      // Advance past the end marker
+      pos = SMALL_END_RE.lastIndex;
+    } else if (c_idx === min_idx) {
+      // Callout block
+      const begin_idx = c.index;
+      const begin_end = begin_idx + c[0].length;
+
+      if (begin_idx > pos)
+        out.push({ type: "text", content: doc.slice(pos, begin_idx) });
+
+      CALLOUT_END_RE.lastIndex = begin_end;
+      const cend = CALLOUT_END_RE.exec(doc);
+      if (!cend) {
+        out.push({ type: "text", content: doc.slice(begin_idx, begin_end) });
+        pos = begin_end;
+        continue;
+      }
+
+      const variantRaw = (c[1] ?? "note").toLowerCase();
+      const variant =
+        (["note", "tip", "warning", "info", "takeaway"].includes(variantRaw)
+          ? variantRaw
+          : "note") ;
+      const title = c[2] ?? "";
+      const inner_md = doc.slice(begin_end, cend.index).trim();
+      out.push({ type: "callout", variant, title, content: inner_md });
+
+      pos = CALLOUT_END_RE.lastIndex;
+    } else {
+      // Fold block
+      const begin_idx = f.index;
+      const begin_end = begin_idx + f[0].length;
+
+      if (begin_idx > pos)
+        out.push({ type: "text", content: doc.slice(pos, begin_idx) });
+
+      FOLD_END_RE.lastIndex = begin_end;
+      const fend = FOLD_END_RE.exec(doc);
+      if (!fend) {
+        out.push({ type: "text", content: doc.slice(begin_idx, begin_end) });
+        pos = begin_end;
+        continue;
+      }
+
+      const title = f[1] ?? "Details";
+      const open = !!f[2];
+      const inner_md = doc.slice(begin_end, fend.index).trim();
+      out.push({ type: "fold", title, open, content: inner_md });
+
+      pos = FOLD_END_RE.lastIndex;
+    }
+  }
+
+  return out;
+}
+/**
+ * 32-bit FNV-1a of a string's UTF-16 code units, as hex. Identifies the source a
+ * prerender was made from; cheap enough to run on every load.
+ * @param {string} s
+ */
+export function sourceHash(s) {
+  let h = 0x811c9dc5;
+  for (let i = 0; i < s.length; i++) {
+    h ^= s.charCodeAt(i);
+    h = Math.imul(h, 0x01000193) >>> 0;
+  }
+  return h.toString(16).padStart(8, "0");
+}
+
+/**
+ * Everything Markdown.svelte renders with marked for `source`, keyed the way the
+ * component looks it up: chunk markdown -> HTML (before the base-path rewrite),
+ * heading text -> inline HTML, plus the numbered footnotes.
+ * @param {string} source
+ */
+export function prerender(source) {
+  const { main, notes } = extractFootnotes(source);
+  const { idToNum, numbered } = computeFootnoteNumbering(main, notes);
+  /** @type {Record<string, string>} */
+  const chunks = {};
+  /** @type {Record<string, string>} */
+  const headings = {};
+  for (const ch of chunkDocument(replaceFootnoteRefs(main, idToNum), null)) {
+    if (ch.type === "h2" || ch.type === "h3") headings[ch.text] ??= renderHeadingInline(ch.text);
+    else if ("content" in ch) chunks[ch.content] ??= renderMarkdown(ch.content);
+  }
+  return { version: RENDER_VERSION, katex: katex.version, source: sourceHash(source), chunks, headings, footnotes: numbered };
+}
@@ -0,0 +1,24 @@
+// Build-time marked output from scripts/prerender_markdown.py: <key>.json holds the
+// chunk and heading HTML, <key>.footnotes.json the numbered footnotes. The glob is
+// lazy, so each post's files are a separate chunk that only its route loads; a post
+// without a prerender gets [] and Markdown.svelte renders it at runtime.
+
+export type Footnote = { id: string; safeId: string; num: number; html: string };
+
+export type Prerender = {
+  version: number;
+  katex: string;
+  source: string;
+  chunks?: Record<string, string>;
+  headings?: Record<string, string>;
+  footnotes?: Footnote[];
+};
+
+const files = import.meta.glob("./generated/prerender/*.json", { import: "default" });
+
+/** Prerender files of a post, keyed by its file stem (e.g. "rl_excursions"). */
+export async function loadPrerender(key: string): Promise<Prerender[]> {
+  const paths = [`./generated/prerender/${key}.json`, `./generated/prerender/${key}.footnotes.json`];
+  const loaders = paths.map((p) => files[p]).filter(Boolean);
+  return (await Promise.all(loaders.map((load) => load()))) as Prerender[];
+}
@@ -0,0 +1,142 @@
+// Client for the prebuilt search index (scripts/build_search_index.py).
+// The index is fetched and decoded on first use; nothing here runs at page load.
+
+export type SearchDoc = { title: string; url: string };
+export type SearchSection = { doc: number; anchor: string; title: string; excerpt: string };
+export type SearchHit = { section: SearchSection; doc: SearchDoc; score: number };
+
+type Posting = { section: number; positions: number[] };
+
+const MAGIC = "RLSI";
+const VERSION = 1;
+
+// Must match fold()/tokenize() in build_search_index.py.
+export function tokenize(text: string): string[] {
+  return (
+    text
+      .normalize("NFKD")
+      .replace(/[\u0300-\u036f]/g, "")
+      .toLowerCase()
+      .match(/[0-9a-z]+/g) ?? []
+  );
+}
+
+export class SearchIndex {
+  private constructor(
+    readonly docs: SearchDoc[],
+    readonly sections: SearchSection[],
+    private readonly terms: string[],
+    private readonly postings: Posting[][],
+  ) {}
+
+  static async load(url: string): Promise<SearchIndex> {
+    const res = await fetch(url);
+    if (!res.ok) throw new Error(`search index: HTTP ${res.status}`);
+    return SearchIndex.decode(new Uint8Array(await res.arrayBuffer()));
+  }
+
+  static decode(buf: Uint8Array): SearchIndex {
+    if (String.fromCharCode(...buf.subarray(0, 4)) !== MAGIC || buf[4] !== VERSION) {
+      throw new Error("search index: unsupported format");
+    }
+    let pos = 5;
+    const varint = () => {
+      let n = 0;
+      let shift = 0;
+      let b: number;
+      do {
+        b = buf[pos++];
+        n += (b & 0x7f) * 2 ** shift;
+        shift += 7;
+      } while (b & 0x80);
+      return n;
+    };
+
+    const headerLen = varint();
+    const header = JSON.parse(new TextDecoder().decode(buf.subarray(pos, pos + headerLen)));
+    pos += headerLen;
+    const terms: string[] = header.terms ? header.terms.split("\n") : [];
+
+    const postings: Posting[][] = new Array(terms.length);
+    for (let t = 0; t < terms.length; t++) {
+      const df = varint();
+      const list: Posting[] = new Array(df);
+      let section = 0;
+      for (let i = 0; i < df; i++) {
+        section += varint();
+        const tf = varint();
+        const positions = new Array<number>(tf);
+        let p = 0;
+        for (let k = 0; k < tf; k++) {
+          p += varint();
+          positions[k] = p;
+        }
+        list[i] = { section, positions };
+      }
+      postings[t] = list;
+    }
+    return new SearchIndex(header.docs, header.sections, terms, postings);
+  }
+
+  // First index in the sorted term list that is >= term.
+  private lowerBound(term: string): number {
+    let lo = 0;
+    let hi = this.terms.length;
+    while (lo < hi) {
+      const mid = (lo + hi) >> 1;
+      if (this.terms[mid] < term) lo = mid + 1;
+      else hi = mid;
+    }
+    return lo;
+  }
+
+  // section -> positions of `term` (or, with `prefix`, of any term starting with it).
+  private lookup(term: string, prefix: boolean): Map<number, number[]> {
+    const out = new Map<number, number[]>();
+    for (let t = this.lowerBound(term); t < this.terms.length; t++) {
+      const cur = this.terms[t];
+      if (prefix ? !cur.startsWith(term) : cur !== term) break;
+      for (const { section, positions } of this.postings[t]) {
+        const prev = out.get(section);
+        out.set(section, prev ? prev.concat(positions).sort((a, b) => a - b) : positions);
+      }
+    }
+    return out;
+  }
+
+  /**
+   * Sections containing every query word (the last one as a prefix, for
+   * search-as-you-type), ranked by term frequency and rarity, with a bonus
+   * for words appearing next to each other in query order.
+   */
+  search(query: string, limit = 8): SearchHit[] {
+    const words = tokenize(query);
+    if (words.length === 0) return [];
+    const matches = words.map((w, i) => this.lookup(w, i === words.length - 1));
+    if (matches.some((m) => m.size === 0)) return [];
+
+    const n = this.sections.length;
+    const hits: SearchHit[] = [];
+    for (const [section, first] of matches[0]) {
+      const perWord = [first];
+      for (const m of matches.slice(1)) {
+        const positions = m.get(section);
+        if (!positions) break;
+        perWord.push(positions);
+      }
+      if (perWord.length < words.length) continue;
+
+      let score = 0;
+      perWord.forEach((positions, i) => {
+        const idf = Math.log(1 + n / matches[i].size);
+        score += Math.log(1 + positions.length) * idf;
+      });
+      for (let i = 1; i < perWord.length; i++) {
+        const next = new Set(perWord[i]);
+        if (perWord[i - 1].some((p) => next.has(p + 1))) score += 2;
+      }
+      hits.push({ section: this.sections[section], doc: this.docs[this.sections[section].doc], score });
+    }
+    return hits.sort((a, b) => b.score - a.score).slice(0, limit);
+  }
+}
@@ -0,0 +1,38 @@
+// Section manifest built by scripts/build_toc.py (src/lib/generated/toc-manifest.json).
+// The glob keeps the build working when the manifest hasn't been generated; callers
+// then get null and fall back to slugging/walking the DOM at runtime.
+
+export type TocHeading = {
+  id: string;
+  level: 2 | 3;
+  parent: string | null;
+  text: string;
+  label: string;
+  words: number;
+  readingMinutes: number;
+};
+
+export type TocJumpbox = { id: string; label: string | null; section: string | null };
+
+export type TocPost = {
+  title: string;
+  url: string;
+  words: number;
+  readingMinutes: number;
+  headings: TocHeading[];
+  jumpboxes: TocJumpbox[];
+};
+
+type TocManifest = { version: number; wordsPerMinute: number; posts: Record<string, TocPost> };
+
+const MANIFEST_VERSION = 1;
+
+const manifest = Object.values(
+  import.meta.glob("./generated/toc-manifest.json", { eager: true, import: "default" })
+)[0] as TocManifest | undefined;
+
+/** Manifest entry for a post, keyed by its file stem (e.g. "rl_excursions"). */
+export function tocFor(key: string): TocPost | null {
+  if (manifest?.version !== MANIFEST_VERSION) return null;
+  return manifest.posts[key] ?? null;
+}
@@ -0,0 +1,5 @@
+import { loadPrerender } from "$lib/prerender";
+
+export async function load() {
+  return { prerender: await loadPrerender("rl_excursions") };
+}
@@ -0,0 +1,49 @@
+"""Footnote labels carried across documents through the footnote registry."""
+
+from __future__ import annotations
+
+import pathlib
+import sys
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent / "scripts"))
+
+from external_links_to_references import ExternalLinksToFootnotes  # noqa: E402
+from footnote_registry import FootnoteRegistry  # noqa: E402
+from md_stream import transform_text  # noqa: E402
+
+URL = "https://proceedings.mlr.press/v202/biderman23a.html"
+
+SEED_DOC = f"""Pythia checkpoints[^biderman2023].
+
+[^biderman2023]: Biderman et al. (2023). [Pythia: A Suite for Analyzing Large Language Models]({URL}). ICML 2023.
+"""
+
+CITING_DOC = f"""We use [Pythia]({URL}) checkpoints.
+"""
+
+
+def test_markdown_link_definition_seeds_clean_label(tmp_path: pathlib.Path) -> None:
+    registry = FootnoteRegistry(tmp_path / "registry.jsonl")
+    transform_text(SEED_DOC, [ExternalLinksToFootnotes(registry=registry)])
+    entry = registry.get(URL)
+    assert entry is not None
+    assert entry.id == "biderman2023"
+    assert entry.label == "Biderman et al. (2023). Pythia: A Suite for Analyzing Large Language Models. ICML 2023"
+
+    out = transform_text(CITING_DOC, [ExternalLinksToFootnotes(registry=FootnoteRegistry(registry.path))])
+    assert "We use Pythia[^biderman2023] checkpoints." in out
+    assert (
+        "[^biderman2023]: Biderman et al. (2023). Pythia: A Suite for Analyzing Large Language Models. "
+        f"ICML 2023. {URL}\n"
+    ) in out
+    assert "](" not in out.split("[^biderman2023]:", 1)[1]
+
+
+def test_truncated_registry_label_is_not_reused(tmp_path: pathlib.Path) -> None:
+    path = tmp_path / "registry.jsonl"
+    path.write_text(
+        f'{{"url": "{URL}", "id": "biderman2023", "label": "Biderman et al. (2023). [Pythia: A Suite]("}}\n',
+        encoding="utf-8",
+    )
+    out = transform_text(CITING_DOC, [ExternalLinksToFootnotes(registry=FootnoteRegistry(path))])
+    assert f"[^biderman2023]: Pythia. {URL}\n" in out